@@ -0,0 +1,439 @@
+from typing import Awaitable, Callable, Dict, List, Tuple, Union
+from concurrent.futures import Executor, ProcessPoolExecutor
+import asyncio
+import gc
+import inspect
+import multiprocessing
+import time
+
+from fuzzy_search.fuzzy_match import PhraseMatch
+
+
+# the searcher of a worker process, installed once per process by init_worker_searcher
+worker_searcher = None
+
+
+def init_worker_searcher(searcher) -> None:
+    """Install a searcher in a worker process, so that tasks only need to send texts, not the searcher.
+
+    :param searcher: a searcher with an indexed phrase model
+    :type searcher: FuzzyPhraseSearcher
+    """
+    global worker_searcher
+    worker_searcher = searcher
+
+
+def make_process_executor(searcher, max_workers: Union[None, int] = None) -> ProcessPoolExecutor:
+    """Make a process pool executor of which each worker process holds its own copy of a searcher.
+    The searcher is sent to each worker process once, when the process starts.
+
+    :param searcher: a searcher with an indexed phrase model
+    :type searcher: FuzzyPhraseSearcher
+    :param max_workers: the maximum number of worker processes (defaults to the number of processors)
+    :type max_workers: Union[None, int]
+    :return: a process pool executor
+    :rtype: ProcessPoolExecutor
+    """
+    return ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker_searcher, initargs=(searcher,))
+
+
+def make_prefork_executor(searcher, max_workers: Union[None, int] = None) -> ProcessPoolExecutor:
+    """Make a process pool executor of which the worker processes are forked from the current process
+    and share a single copy of a searcher with it. The searcher is frozen with flat indexes, and
+    gc.freeze() moves all existing objects out of reach of the garbage collector, so that collections
+    in the workers don't write to the shared memory pages. Call gc.unfreeze() after shutting down the
+    executor to undo this.
+
+    The workers are only forked when tasks are submitted, so each executor passes its own searcher to
+    the initializer of its workers, which inherit it with the forked memory instead of a pickled copy.
+
+    This requires the 'fork' start method, which is not available on Windows.
+
+    :param searcher: a searcher with an indexed phrase model
+    :type searcher: FuzzyPhraseSearcher
+    :param max_workers: the maximum number of worker processes (defaults to the number of processors)
+    :type max_workers: Union[None, int]
+    :return: a process pool executor
+    :rtype: ProcessPoolExecutor
+    """
+    if "fork" not in multiprocessing.get_all_start_methods():
+        raise ValueError("make_prefork_executor requires the 'fork' start method, use make_process_executor")
+    if not searcher.flat_indexes:
+        searcher.freeze(flat=True)
+    gc.collect()
+    gc.freeze()
+    # the initializer arguments of forked workers are inherited, so the searcher is never pickled
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("fork"),
+                               initializer=init_worker_searcher, initargs=(searcher,))
+
+
+def accepts_time_budget(search_method: Callable) -> bool:
+    """Check whether a search method can be stopped with a time_budget argument.
+
+    :param search_method: a search method of a searcher
+    :type search_method: Callable
+    :return: True if the search method has a time_budget parameter
+    :rtype: bool
+    """
+    return "time_budget" in inspect.signature(search_method).parameters
+
+
+def get_deadline_kwargs(kwargs: Dict[str, any], deadline: Union[None, float]) -> Dict[str, any]:
+    """Add the time that is left until a deadline as time_budget to the keyword arguments of a search
+    method, so that the search stops when the caller stops waiting. An explicit time_budget that is
+    shorter than the time left is kept.
+
+    :param kwargs: the keyword arguments for the search method
+    :type kwargs: Dict[str, any]
+    :param deadline: the time (as returned by time.time) at which the caller stops waiting, or None
+    :type deadline: Union[None, float]
+    :return: the keyword arguments with a time_budget for the deadline
+    :rtype: Dict[str, any]
+    """
+    if deadline is None:
+        return kwargs
+    time_budget = max(deadline - time.time(), 0.0)
+    if kwargs.get("time_budget") is not None:
+        time_budget = min(time_budget, kwargs["time_budget"])
+    return {**kwargs, "time_budget": time_budget}
+
+
+def run_searcher_method(searcher, method_name: str, texts: List[Union[str, Dict[str, str]]],
+                        kwargs: Dict[str, any], deadlines: Union[None, List[Union[None, float]]] = None) -> List[any]:
+    """Run a search method of a searcher for a batch of texts. This is the unit of work that is sent
+    to an executor. The deadlines are wall clock times, so that they can be passed on to worker processes.
+
+    :param searcher: a searcher, or None to use the searcher installed in a worker process
+    :type searcher: Union[None, FuzzyPhraseSearcher]
+    :param method_name: the name of the search method, e.g. 'find_matches'
+    :type method_name: str
+    :param texts: a list of texts (strings or dictionaries with 'text' and 'id' properties)
+    :type texts: List[Union[str, Dict[str, str]]]
+    :param kwargs: the keyword arguments for the search method
+    :type kwargs: Dict[str, any]
+    :param deadlines: an optional deadline per text, which is passed to the search method as time_budget
+    :type deadlines: Union[None, List[Union[None, float]]]
+    :return: a list of search results, one per text
+    :rtype: List[any]
+    """
+    if searcher is None:
+        if worker_searcher is None:
+            raise ValueError("No searcher installed in this worker process, use make_process_executor "
+                             "or make_prefork_executor")
+        searcher = worker_searcher
+    search_method = getattr(searcher, method_name)
+    if deadlines is None:
+        return [search_method(text, **kwargs) for text in texts]
+    return [search_method(text, **get_deadline_kwargs(kwargs, deadline)) for text, deadline in zip(texts, deadlines)]
+
+
+async def dispatch_searcher_method(searcher, executor: Union[None, Executor], method_name: str,
+                                   texts: List[Union[str, Dict[str, str]]], kwargs: Dict[str, any],
+                                   deadlines: Union[None, List[Union[None, float]]] = None) -> List[any]:
+    """Run a search method for a batch of texts in an executor without blocking the event loop. With
+    a process pool executor, the searcher installed in the worker process is used.
+
+    :param searcher: a searcher with an indexed phrase model
+    :type searcher: FuzzyPhraseSearcher
+    :param executor: a thread or process pool executor, or None for the default executor of the event loop
+    :type executor: Union[None, Executor]
+    :param method_name: the name of the search method, e.g. 'find_matches'
+    :type method_name: str
+    :param texts: a list of texts (strings or dictionaries with 'text' and 'id' properties)
+    :type texts: List[Union[str, Dict[str, str]]]
+    :param kwargs: the keyword arguments for the search method
+    :type kwargs: Dict[str, any]
+    :param deadlines: an optional deadline per text, which is passed to the search method as time_budget
+    :type deadlines: Union[None, List[Union[None, float]]]
+    :return: a list of search results, one per text
+    :rtype: List[any]
+    """
+    if isinstance(executor, ProcessPoolExecutor):
+        # don't send the searcher with every task, the worker processes have their own copy
+        searcher = None
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, run_searcher_method, searcher, method_name, texts, kwargs, deadlines)
+
+
+def freeze_argument(value: any) -> any:
+    """Turn a keyword argument value into a hashable value that is equal for equal arguments, so that it
+    can be part of a batch key. Lists, sets and dictionaries are turned into tuples and frozensets, and
+    each value is tagged with its type, so that e.g. a list and a tuple with the same items differ.
+
+    :param value: a keyword argument value
+    :type value: any
+    :return: a hashable representation of the value
+    :rtype: any
+    """
+    if isinstance(value, (list, tuple)):
+        return type(value), tuple(freeze_argument(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return type(value), frozenset(freeze_argument(item) for item in value)
+    if isinstance(value, dict):
+        return type(value), frozenset((key, freeze_argument(item)) for key, item in value.items())
+    return type(value), value
+
+
+def make_batch_key(method_name: str, kwargs: Dict[str, any]) -> Union[None, Tuple[str, tuple]]:
+    """Make the key of the batch that a request belongs to, from its search method and keyword arguments.
+
+    :param method_name: the name of the search method, e.g. 'find_matches'
+    :type method_name: str
+    :param kwargs: the keyword arguments for the search method
+    :type kwargs: Dict[str, any]
+    :return: the batch key, or None if the keyword arguments can't be made hashable
+    :rtype: Union[None, Tuple[str, tuple]]
+    """
+    key = (method_name, tuple(sorted((name, freeze_argument(value)) for name, value in kwargs.items())))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+class MicroBatcher:
+
+    def __init__(self, dispatch: Callable[[str, List[any], Dict[str, any], List[Union[None, float]]],
+                                          Awaitable[List[any]]],
+                 max_batch_size: int = 32, max_delay: float = 0.002):
+        """Collect concurrent single-text search requests and dispatch them to a worker as one batch.
+        A batch is dispatched when it reaches max_batch_size texts or when its first request has waited
+        max_delay seconds. Only requests for the same search method and arguments are batched together,
+        requests with arguments that can't be compared are dispatched on their own.
+
+        :param dispatch: a coroutine function that runs a search method for a list of texts, given the
+            method name, the texts, the keyword arguments and a deadline per text
+        :type dispatch: Callable[[str, List[any], Dict[str, any], List[Union[None, float]]], Awaitable[List[any]]]
+        :param max_batch_size: the maximum number of texts per batch
+        :type max_batch_size: int
+        :param max_delay: the maximum number of seconds that a request waits for other requests
+        :type max_delay: float
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be a positive integer")
+        self.dispatch = dispatch
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.pending: Dict[Tuple[str, tuple], Tuple[List[Tuple[any, Union[None, float], asyncio.Future]],
+                                                    Dict[str, any], asyncio.TimerHandle]] = {}
+
+    async def submit(self, method_name: str, text: Union[str, Dict[str, str]], kwargs: Dict[str, any],
+                     deadline: Union[None, float] = None) -> any:
+        """Submit a single text for searching and wait for its result.
+
+        :param method_name: the name of the search method, e.g. 'find_matches'
+        :type method_name: str
+        :param text: a text (string or dictionary with 'text' and 'id' properties)
+        :type text: Union[str, Dict[str, str]]
+        :param kwargs: the keyword arguments for the search method
+        :type kwargs: Dict[str, any]
+        :param deadline: the time (as returned by time.time) at which the search of the text should stop
+        :type deadline: Union[None, float]
+        :return: the search result for the text
+        :rtype: any
+        """
+        key = make_batch_key(method_name, kwargs)
+        if key is None:
+            results = await self.dispatch(method_name, [text], kwargs, [deadline])
+            return results[0]
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if key not in self.pending:
+            timer = loop.call_later(self.max_delay, self.flush, key)
+            self.pending[key] = ([], kwargs, timer)
+        batch, _, _ = self.pending[key]
+        batch.append((text, deadline, future))
+        if len(batch) >= self.max_batch_size:
+            self.flush(key)
+        return await future
+
+    def flush(self, key: Tuple[str, tuple]) -> None:
+        """Dispatch the pending batch of requests for a search method and its arguments.
+
+        :param key: the search method name and the frozen keyword arguments of the batch
+        :type key: Tuple[str, tuple]
+        """
+        if key not in self.pending:
+            return None
+        batch, kwargs, timer = self.pending.pop(key)
+        timer.cancel()
+        # requests that were cancelled or timed out while waiting are not dispatched
+        batch = [(text, deadline, future) for text, deadline, future in batch if not future.done()]
+        if len(batch) == 0:
+            return None
+        task = asyncio.ensure_future(self.dispatch(key[0], [text for text, _, _ in batch], kwargs,
+                                                   [deadline for _, deadline, _ in batch]))
+        task.add_done_callback(lambda done_task: resolve_batch(done_task, [future for _, _, future in batch]))
+
+
+def resolve_batch(task: asyncio.Future, futures: List[asyncio.Future]) -> None:
+    """Pass the results (or the exception) of a dispatched batch on to the futures of its requests.
+
+    :param task: the finished dispatch task of a batch
+    :type task: asyncio.Future
+    :param futures: the futures of the requests in the batch, in the order of the texts
+    :type futures: List[asyncio.Future]
+    """
+    if task.cancelled():
+        for future in futures:
+            if not future.done():
+                future.cancel()
+        return None
+    if task.exception() is not None:
+        for future in futures:
+            if not future.done():
+                future.set_exception(task.exception())
+        return None
+    for future, result in zip(futures, task.result()):
+        if not future.done():
+            future.set_result(result)
+
+
+class AsyncSearcher:
+
+    def __init__(self, searcher, executor: Union[None, Executor] = None):
+        """Search with a searcher from asyncio without blocking the event loop. The searches run in an
+        executor: a ThreadPoolExecutor for a frozen searcher that is shared between threads, or a process
+        pool made with make_process_executor or make_prefork_executor, of which each worker process holds
+        a copy of the searcher. With None, the default executor of the event loop is used.
+
+        :param searcher: a searcher with an indexed phrase model, e.g. a FuzzyPhraseSearcher or a
+            FuzzyTemplateSearcher
+        :type searcher: FuzzyPhraseSearcher
+        :param executor: a thread or process pool executor
+        :type executor: Union[None, Executor]
+        """
+        self.searcher = searcher
+        self.executor = executor
+        self.micro_batcher: Union[None, MicroBatcher] = None
+
+    def set_executor(self, executor: Union[None, Executor]) -> None:
+        """Set the executor that runs the searches.
+
+        :param executor: a thread or process pool executor
+        :type executor: Union[None, Executor]
+        """
+        self.executor = executor
+
+    def enable_micro_batching(self, max_batch_size: int = 32, max_delay: float = 0.002) -> None:
+        """Let concurrent calls of the single-text search methods be collected into batches that are
+        dispatched to the executor together, which reduces the dispatch overhead for many small texts.
+
+        :param max_batch_size: the maximum number of texts per batch
+        :type max_batch_size: int
+        :param max_delay: the maximum number of seconds that a request waits for other requests
+        :type max_delay: float
+        """
+        self.micro_batcher = MicroBatcher(self.dispatch_search, max_batch_size=max_batch_size, max_delay=max_delay)
+
+    def disable_micro_batching(self) -> None:
+        """Dispatch each call of the single-text search methods to the executor separately."""
+        self.micro_batcher = None
+
+    async def dispatch_search(self, method_name: str, texts: List[Union[str, Dict[str, str]]],
+                              kwargs: Dict[str, any],
+                              deadlines: Union[None, List[Union[None, float]]] = None) -> List[any]:
+        """Run a search method of the searcher for a batch of texts in the executor.
+
+        :param method_name: the name of the search method, e.g. 'find_matches'
+        :type method_name: str
+        :param texts: a list of texts (strings or dictionaries with 'text' and 'id' properties)
+        :type texts: List[Union[str, Dict[str, str]]]
+        :param kwargs: the keyword arguments for the search method
+        :type kwargs: Dict[str, any]
+        :param deadlines: an optional deadline per text (as returned by time.time), which is passed to the
+            search method as time_budget
+        :type deadlines: Union[None, List[Union[None, float]]]
+        :return: a list of search results, one per text
+        :rtype: List[any]
+        """
+        return await dispatch_searcher_method(self.searcher, self.executor, method_name, texts, kwargs, deadlines)
+
+    def get_deadline(self, method_name: str, timeout: Union[None, float]) -> Union[None, float]:
+        """Get the wall clock time at which a search with a timeout should stop, if the search method
+        can be stopped with a time_budget.
+
+        :param method_name: the name of the search method, e.g. 'find_matches'
+        :type method_name: str
+        :param timeout: the maximum number of seconds to wait for the result
+        :type timeout: Union[None, float]
+        :return: the deadline, or None if there is no timeout or the method can't be stopped
+        :rtype: Union[None, float]
+        """
+        if timeout is None or not accepts_time_budget(getattr(self.searcher, method_name)):
+            return None
+        return time.time() + timeout
+
+    async def asearch(self, method_name: str, text: Union[str, Dict[str, str]],
+                      timeout: Union[None, float] = None, **kwargs) -> any:
+        """Run a search method for a single text in the executor, via the micro-batcher if it is enabled.
+
+        :param method_name: the name of the search method, e.g. 'find_matches'
+        :type method_name: str
+        :param text: a text (string or dictionary with 'text' and 'id' properties)
+        :type text: Union[str, Dict[str, str]]
+        :param timeout: the maximum number of seconds to wait for the result, raises asyncio.TimeoutError.
+            If the search method has a time_budget, the time that is left of the timeout when the search
+            starts is passed on as time_budget, so that the search itself also stops.
+        :type timeout: Union[None, float]
+        :return: the search result
+        :rtype: any
+        """
+        deadline = self.get_deadline(method_name, timeout)
+        if self.micro_batcher is not None:
+            request = self.micro_batcher.submit(method_name, text, kwargs, deadline)
+        else:
+            request = self.dispatch_single_search(method_name, text, kwargs, deadline)
+        return await asyncio.wait_for(request, timeout=timeout)
+
+    async def dispatch_single_search(self, method_name: str, text: Union[str, Dict[str, str]],
+                                     kwargs: Dict[str, any], deadline: Union[None, float] = None) -> any:
+        """Run a search method for a single text in the executor."""
+        results = await self.dispatch_search(method_name, [text], kwargs, [deadline])
+        return results[0]
+
+    async def afind_matches(self, text: Union[str, Dict[str, str]], timeout: Union[None, float] = None,
+                            **kwargs) -> List[PhraseMatch]:
+        """Find all fuzzy matching phrases for a given text without blocking the event loop. Cancelling the
+        call or exceeding the timeout stops waiting for the result, and a search that hasn't started yet is
+        not run at all. A search that has started stops when its timeout has passed. Keyword arguments are
+        passed on to the find_matches method of the searcher.
+
+        :param text: the text (string or dictionary with 'text' property) to find fuzzy matching phrases in.
+        :type text: Union[str, Dict[str, str]]
+        :param timeout: the maximum number of seconds to wait for the result, raises asyncio.TimeoutError
+        :type timeout: Union[None, float]
+        :return: a list of phrases matches
+        :rtype: List[PhraseMatch]
+        """
+        return await self.asearch("find_matches", text, timeout=timeout, **kwargs)
+
+    async def afind_matches_batch(self, texts: List[Union[str, Dict[str, str]]], timeout: Union[None, float] = None,
+                                  **kwargs) -> List[List[PhraseMatch]]:
+        """Find all fuzzy matching phrases for a batch of texts in a single dispatch to the executor, without
+        blocking the event loop. Keyword arguments are passed on to the find_matches method of the searcher.
+
+        :param texts: a list of texts (strings or dictionaries with 'text' and 'id' properties)
+        :type texts: List[Union[str, Dict[str, str]]]
+        :param timeout: the maximum number of seconds to wait for the results, raises asyncio.TimeoutError
+        :type timeout: Union[None, float]
+        :return: a list of phrase matches per text
+        :rtype: List[List[PhraseMatch]]
+        """
+        deadline = self.get_deadline("find_matches", timeout)
+        request = self.dispatch_search("find_matches", texts, kwargs, [deadline] * len(texts))
+        return await asyncio.wait_for(request, timeout=timeout)
+
+    async def asearch_text(self, text: Union[str, Dict[str, str]], timeout: Union[None, float] = None) -> List[any]:
+        """Search the text for template matches without blocking the event loop, using the search_text
+        method of a template searcher.
+
+        :param text: a text to search in, either as a string or a dictionary with text and an identifier
+        :type text: Union[str, Dict[str, str]]
+        :param timeout: the maximum number of seconds to wait for the result, raises asyncio.TimeoutError
+        :type timeout: Union[None, float]
+        :return: a list of template matches
+        :rtype: List[TemplateMatch]
+        """
+        return await self.asearch("search_text", text, timeout=timeout)
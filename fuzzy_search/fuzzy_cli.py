@@ -0,0 +1,513 @@
+from typing import Dict, Generator, List, Set, Tuple, Union
+import argparse
+import json
+import lzma
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+import zlib
+
+from fuzzy_search.fuzzy_file import get_file_format, read_jsonl_file_records
+from fuzzy_search.fuzzy_match_writer import MatchWriter, encode_matches, get_compression, open_match_file
+from fuzzy_search.fuzzy_phrase_model import PhraseModel
+from fuzzy_search.fuzzy_phrase_searcher import FuzzyPhraseSearcher
+
+
+input_extensions = {".txt", ".jsonl", ".ndjson"}
+
+
+def get_input_files(input_paths: List[str]) -> List[str]:
+    """Return the list of input files for a list of file and directory paths. Directories are walked
+    recursively for plain text (.txt) and JSON lines (.jsonl, .ndjson) files.
+
+    :param input_paths: a list of file and directory paths
+    :type input_paths: List[str]
+    :return: a sorted list of input files
+    :rtype: List[str]
+    """
+    input_files: List[str] = []
+    for input_path in input_paths:
+        if os.path.isdir(input_path):
+            for dir_path, dir_names, file_names in os.walk(input_path):
+                for file_name in file_names:
+                    if os.path.splitext(file_name)[1].lower() in input_extensions:
+                        input_files.append(os.path.join(dir_path, file_name))
+        elif os.path.isfile(input_path):
+            input_files.append(input_path)
+        else:
+            raise FileNotFoundError(f"input path does not exist: {input_path}")
+    return sorted(input_files)
+
+
+def in_shard(text_id: str, num_shards: int, shard_index: int) -> bool:
+    """Check if a text belongs to a given shard, based on a stable hash of its identifier.
+
+    :param text_id: the identifier of a text
+    :type text_id: str
+    :param num_shards: the total number of shards
+    :type num_shards: int
+    :param shard_index: the index of the shard to check (starting at 0)
+    :type shard_index: int
+    :return: a boolean whether the text belongs to the shard
+    :rtype: bool
+    """
+    if num_shards == 1:
+        return True
+    return zlib.crc32(str(text_id).encode("utf-8")) % num_shards == shard_index
+
+
+def read_done_records(done_file: str) -> List[Tuple[str, int]]:
+    """Read the identifiers of texts that were completely annotated in a previous run, with the number of
+    output lines of each text, in the order in which they were written. An incomplete last record of an
+    interrupted run is ignored.
+
+    :param done_file: the path of the file with a tab separated text identifier and number of output lines
+        per annotated text
+    :type done_file: str
+    :return: a list of tuples of text identifier and number of output lines
+    :rtype: List[Tuple[str, int]]
+    """
+    if not os.path.isfile(done_file):
+        return []
+    done_records: List[Tuple[str, int]] = []
+    with open(done_file, "rt", encoding="utf-8") as fh:
+        for line in fh:
+            if not line.endswith("\n") or "\t" not in line:
+                break
+            text_id, num_lines = line[:-1].rsplit("\t", 1)
+            done_records.append((text_id, int(num_lines)))
+    return done_records
+
+
+def read_done_ids(done_file: str) -> Set[str]:
+    """Read the identifiers of texts that were completely annotated in a previous run.
+
+    :param done_file: the path of the file with a tab separated text identifier and number of output lines
+        per annotated text
+    :type done_file: str
+    :return: the set of identifiers of annotated texts
+    :rtype: Set[str]
+    """
+    return {text_id for text_id, _ in read_done_records(done_file)}
+
+
+def count_output_lines(output_file: str) -> int:
+    """Count the complete lines in an output file, stopping at the end of the readable data of a
+    compressed file that was cut off by an interrupted run.
+
+    :param output_file: the path of the output file
+    :type output_file: str
+    :return: the number of complete lines
+    :rtype: int
+    """
+    num_lines = 0
+    try:
+        with open_match_file(output_file, "rt") as fh:
+            for line in fh:
+                if line.endswith("\n"):
+                    num_lines += 1
+    except (EOFError, OSError, lzma.LZMAError, zlib.error):
+        pass
+    return num_lines
+
+
+def truncate_output_lines(output_file: str, num_lines: int) -> None:
+    """Cut an output file off after its first num_lines lines. Uncompressed files are truncated in place,
+    compressed files are rewritten.
+
+    :param output_file: the path of the output file
+    :type output_file: str
+    :param num_lines: the number of lines to keep
+    :type num_lines: int
+    """
+    if get_compression(output_file) is None:
+        with open(output_file, "r+b") as fh:
+            for _ in range(num_lines):
+                fh.readline()
+            fh.truncate(fh.tell())
+        return None
+    tmp_file = f"{output_file}.tmp"
+    with open_match_file(output_file, "rt") as in_fh, open_match_file(tmp_file, "wt") as out_fh:
+        for _ in range(num_lines):
+            out_fh.write(in_fh.readline())
+    os.replace(tmp_file, output_file)
+
+
+def repair_output(output_file: str, done_file: str) -> Set[str]:
+    """Make the output and the done file of an interrupted run consistent before resuming it. The output
+    lines of each text are written before its done record, so the output can have lines of texts that
+    are not done, which are removed, and done records can refer to output lines that were not written,
+    which are dropped so that their texts are annotated again.
+
+    :param output_file: the path of the output file
+    :type output_file: str
+    :param done_file: the path of the done file
+    :type done_file: str
+    :return: the identifiers of the texts that are done
+    :rtype: Set[str]
+    """
+    done_records = read_done_records(done_file)
+    num_output_lines = count_output_lines(output_file) if os.path.isfile(output_file) else 0
+    num_done_lines = 0
+    num_done_records = 0
+    for _, num_lines in done_records:
+        if num_done_lines + num_lines > num_output_lines:
+            break
+        num_done_lines += num_lines
+        num_done_records += 1
+    if os.path.isfile(output_file):
+        # also removes an incomplete last line, which is not counted as an output line
+        truncate_output_lines(output_file, num_done_lines)
+    done_records = done_records[:num_done_records]
+    with open(done_file, "wt", encoding="utf-8") as fh:
+        for text_id, num_lines in done_records:
+            fh.write(f"{text_id}\t{num_lines}\n")
+    return {text_id for text_id, _ in done_records}
+
+
+def generate_tasks(input_files: List[str], num_shards: int = 1, shard_index: int = 0,
+                   done_ids: Union[None, Set[str]] = None) -> Generator[Tuple[str, str, Union[None, dict]], None, None]:
+    """Generate annotation tasks for a list of input files. A plain text file is a single task that is
+    identified by its path, a JSON lines file has a task per record. Tasks for texts that are not in the
+    shard or that are already done are skipped.
+
+    :param input_files: a list of plain text and JSON lines files
+    :type input_files: List[str]
+    :param num_shards: the total number of shards
+    :type num_shards: int
+    :param shard_index: the index of the shard to annotate
+    :type shard_index: int
+    :param done_ids: the identifiers of texts that have already been annotated
+    :type done_ids: Union[None, Set[str]]
+    :return: a generator of tasks as tuples of text identifier, file path and text dictionary (None for text files)
+    :rtype: Generator[Tuple[str, str, Union[None, dict]], None, None]
+    """
+    if done_ids is None:
+        done_ids = set()
+    for input_file in input_files:
+        if get_file_format(input_file) == "jsonl":
+            for line_number, text in read_jsonl_file_records(input_file):
+                text_id = str(text["id"])
+                if in_shard(text_id, num_shards, shard_index) and text_id not in done_ids:
+                    yield text_id, input_file, text
+        elif in_shard(input_file, num_shards, shard_index) and input_file not in done_ids:
+            yield input_file, input_file, None
+
+
+def make_searcher(phrase_model_json: List[Dict[str, any]], config: Dict[str, any]) -> FuzzyPhraseSearcher:
+    """Make a fuzzy phrase searcher for a phrase model and a searcher configuration.
+
+    :param phrase_model_json: a phrase model as a list of phrase dictionaries
+    :type phrase_model_json: List[Dict[str, any]]
+    :param config: a searcher configuration dictionary
+    :type config: Dict[str, any]
+    :return: a fuzzy phrase searcher with the phrase model indexed
+    :rtype: FuzzyPhraseSearcher
+    """
+    searcher = FuzzyPhraseSearcher(config)
+    searcher.index_phrase_model(PhraseModel(model=phrase_model_json, config=config))
+    return searcher
+
+
+def annotate_task(searcher: FuzzyPhraseSearcher, task: Tuple[str, str, Union[None, dict]],
+                  output_format: str = "json") -> List[str]:
+    """Search a single task text and serialise its matches as JSON lines.
+
+    :param searcher: a fuzzy phrase searcher with an indexed phrase model
+    :type searcher: FuzzyPhraseSearcher
+    :param task: a task as tuple of text identifier, file path and text dictionary (None for text files)
+    :type task: Tuple[str, str, Union[None, dict]]
+    :param output_format: the output format of matches, either 'json' or 'web_anno'
+    :type output_format: str
+    :return: a list of JSON strings, one per match
+    :rtype: List[str]
+    """
+    text_id, file_path, text = task
+    if text is None:
+        matches = searcher.iter_file_matches(file_path, file_format="text")
+    else:
+        matches = searcher.iter_matches_chunked(text)
+    return encode_matches(matches, output_format=output_format)
+
+
+def run_annotate_task(searcher: FuzzyPhraseSearcher, task: Tuple[str, str, Union[None, dict]],
+                      output_format: str = "json") -> Tuple[str, List[str], Union[None, str]]:
+    """Annotate a single task and catch any error, so that a failing text doesn't stop the other texts.
+
+    :param searcher: a fuzzy phrase searcher with an indexed phrase model
+    :type searcher: FuzzyPhraseSearcher
+    :param task: a task as tuple of text identifier, file path and text dictionary (None for text files)
+    :type task: Tuple[str, str, Union[None, dict]]
+    :param output_format: the output format of matches, either 'json' or 'web_anno'
+    :type output_format: str
+    :return: a tuple of the text identifier, the JSON strings of the matches and an error message (None if
+        annotating the text succeeded)
+    :rtype: Tuple[str, List[str], Union[None, str]]
+    """
+    try:
+        return task[0], annotate_task(searcher, task, output_format), None
+    except Exception as err:
+        return task[0], [], f"{err.__class__.__name__}: {err}"
+
+
+def annotate_worker(phrase_model_json: List[Dict[str, any]], config: Dict[str, any], output_format: str,
+                    task_queue: multiprocessing.Queue, result_queue: multiprocessing.Queue) -> None:
+    """Worker process that builds its own searcher and annotates tasks until it receives None.
+
+    :param phrase_model_json: a phrase model as a list of phrase dictionaries
+    :type phrase_model_json: List[Dict[str, any]]
+    :param config: a searcher configuration dictionary
+    :type config: Dict[str, any]
+    :param output_format: the output format of matches, either 'json' or 'web_anno'
+    :type output_format: str
+    :param task_queue: the bounded queue to receive tasks from
+    :type task_queue: multiprocessing.Queue
+    :param result_queue: the bounded queue to send results to
+    :type result_queue: multiprocessing.Queue
+    """
+    try:
+        searcher = make_searcher(phrase_model_json, config)
+    except Exception as err:
+        # signal that this worker could not start, without a text identifier
+        result_queue.put((None, [], f"{err.__class__.__name__}: {err}"))
+        result_queue.put(None)
+        return None
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        result_queue.put(run_annotate_task(searcher, task, output_format))
+    result_queue.put(None)
+
+
+class ThroughputReporter:
+
+    def __init__(self, report_interval: float = 10.0, stream=None):
+        """Keep track of the number of annotated texts and matches and report the throughput
+        at regular intervals.
+
+        :param report_interval: the minimum number of seconds between reports (0 or less disables reporting)
+        :type report_interval: float
+        :param stream: the stream to write reports to (defaults to stderr)
+        """
+        self.report_interval = report_interval
+        self.stream = stream if stream is not None else sys.stderr
+        self.start_time = time.time()
+        self.last_report = self.start_time
+        self.num_texts = 0
+        self.num_matches = 0
+        self.num_errors = 0
+
+    def update(self, num_matches: int, error: Union[None, str] = None) -> None:
+        """Register an annotated text and report the throughput if the report interval has passed.
+
+        :param num_matches: the number of matches in the text
+        :type num_matches: int
+        :param error: an error message if annotating the text failed
+        :type error: Union[None, str]
+        """
+        self.num_texts += 1
+        self.num_matches += num_matches
+        if error is not None:
+            self.num_errors += 1
+        now = time.time()
+        if 0 < self.report_interval <= now - self.last_report:
+            self.report()
+            self.last_report = now
+
+    def report(self) -> None:
+        """Write the current throughput to the report stream."""
+        elapsed = max(time.time() - self.start_time, 1e-9)
+        print(f"texts: {self.num_texts} ({self.num_texts / elapsed:.1f}/s)\t"
+              f"matches: {self.num_matches} ({self.num_matches / elapsed:.1f}/s)\t"
+              f"errors: {self.num_errors}\telapsed: {elapsed:.1f}s", file=self.stream)
+
+
+def annotate(phrase_model_json: List[Dict[str, any]], config: Dict[str, any], input_paths: List[str],
+             output_file: str, output_format: str = "json", num_workers: int = 1, queue_size: int = 100,
+             num_shards: int = 1, shard_index: int = 0, resume: bool = False,
+             report_interval: float = 10.0, poll_interval: float = 1.0) -> ThroughputReporter:
+    """Annotate all texts in a list of input files and directories with phrase matches, and write the
+    matches as JSON lines to an output file. Output files ending in .gz, .bz2 or .xz are compressed.
+    The identifiers of completely annotated texts are written to a separate file next to the output file
+    ('<output_file>.done'), so that an interrupted run can be resumed. A text that fails is reported and
+    skipped, in the same way with and without worker processes. If a worker process dies, the run stops
+    with a RuntimeError.
+
+    :param phrase_model_json: a phrase model as a list of phrase dictionaries
+    :type phrase_model_json: List[Dict[str, any]]
+    :param config: a searcher configuration dictionary
+    :type config: Dict[str, any]
+    :param input_paths: a list of input file and directory paths
+    :type input_paths: List[str]
+    :param output_file: the path of the JSON lines output file
+    :type output_file: str
+    :param output_format: the output format of matches, either 'json' or 'web_anno'
+    :type output_format: str
+    :param num_workers: the number of worker processes (0 to annotate in the main process)
+    :type num_workers: int
+    :param queue_size: the maximum number of tasks and results waiting in the queues
+    :type queue_size: int
+    :param num_shards: the total number of shards
+    :type num_shards: int
+    :param shard_index: the index of the shard to annotate
+    :type shard_index: int
+    :param resume: whether to skip texts that were annotated by a previous run and append to the output
+    :type resume: bool
+    :param report_interval: the minimum number of seconds between throughput reports
+    :type report_interval: float
+    :param poll_interval: the number of seconds to wait for a result before checking that the worker
+        processes are still alive
+    :type poll_interval: float
+    :return: the throughput reporter with the final counts
+    :rtype: ThroughputReporter
+    """
+    if output_format not in {"json", "web_anno"}:
+        raise ValueError("output_format must be 'json' or 'web_anno'")
+    if not 0 <= shard_index < num_shards:
+        raise ValueError("shard_index must be between 0 and num_shards")
+    done_file = f"{output_file}.done"
+    done_ids = repair_output(output_file, done_file) if resume else set()
+    tasks = generate_tasks(get_input_files(input_paths), num_shards=num_shards, shard_index=shard_index,
+                           done_ids=done_ids)
+    reporter = ThroughputReporter(report_interval=report_interval)
+    mode = "at" if resume else "wt"
+    with MatchWriter(output_file, output_format=output_format, append=resume) as writer, \
+            open(done_file, mode, encoding="utf-8") as done_fh:
+
+        def write_result(text_id: str, lines: List[str], error: Union[None, str]) -> None:
+            writer.write_lines(lines)
+            if error is None:
+                # the number of lines lets a resumed run remove the lines of texts that are not done
+                done_fh.write(f"{text_id}\t{len(lines)}\n")
+            else:
+                print(f"error annotating {text_id}: {error}", file=sys.stderr)
+            reporter.update(len(lines), error)
+
+        if num_workers < 1:
+            searcher = make_searcher(phrase_model_json, config)
+            for task in tasks:
+                write_result(*run_annotate_task(searcher, task, output_format))
+        else:
+            task_queue = multiprocessing.Queue(maxsize=queue_size)
+            result_queue = multiprocessing.Queue(maxsize=queue_size)
+            workers = [multiprocessing.Process(target=annotate_worker,
+                                               args=(phrase_model_json, config, output_format,
+                                                     task_queue, result_queue), daemon=True)
+                       for _ in range(num_workers)]
+            for worker in workers:
+                worker.start()
+
+            def feed_tasks():
+                for feed_task in tasks:
+                    task_queue.put(feed_task)
+                for _ in workers:
+                    task_queue.put(None)
+
+            feeder = threading.Thread(target=feed_tasks, daemon=True)
+            feeder.start()
+            num_finished = 0
+            worker_errors: List[str] = []
+            while num_finished < len(workers):
+                try:
+                    result = result_queue.get(timeout=poll_interval)
+                except queue.Empty:
+                    # a worker that is killed, e.g. by the OOM killer, never sends its results
+                    crashed = [worker for worker in workers if worker.exitcode not in {None, 0}]
+                    if len(crashed) > 0:
+                        for worker in workers:
+                            worker.terminate()
+                        raise RuntimeError(f"{len(crashed)} worker(s) stopped unexpectedly, the first with "
+                                           f"exit code {crashed[0].exitcode}, rerun with resume to annotate "
+                                           f"the remaining texts")
+                    continue
+                if result is None:
+                    num_finished += 1
+                elif result[0] is None:
+                    worker_errors.append(result[2])
+                else:
+                    write_result(*result)
+            for worker in workers:
+                worker.join()
+            if len(worker_errors) > 0:
+                raise RuntimeError(f"{len(worker_errors)} worker(s) failed to start: {worker_errors[0]}")
+            feeder.join()
+    if report_interval > 0:
+        reporter.report()
+    return reporter
+
+
+def read_json_file(json_file: str) -> any:
+    """Read a JSON file.
+
+    :param json_file: the path of a JSON file
+    :type json_file: str
+    :return: the JSON content
+    :rtype: any
+    """
+    with open(json_file, "rt", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def make_arg_parser() -> argparse.ArgumentParser:
+    """Make the argument parser for the fuzzy-search command line interface.
+
+    :return: the argument parser
+    :rtype: argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(prog="fuzzy-search", description="Fuzzy search phrases in texts")
+    subparsers = parser.add_subparsers(dest="command")
+    annotate_parser = subparsers.add_parser("annotate", help="annotate texts with phrase matches")
+    annotate_parser.add_argument("inputs", nargs="+",
+                                 help="input files or directories with plain text (.txt) and JSON lines "
+                                      "(.jsonl, .ndjson) files")
+    annotate_parser.add_argument("-m", "--phrase-model", required=True,
+                                 help="JSON file with the phrase model as a list of phrase dictionaries")
+    annotate_parser.add_argument("-c", "--config", help="JSON file with the searcher configuration")
+    annotate_parser.add_argument("-o", "--output", required=True,
+                                 help="JSON lines output file for the matches, compressed if it ends in "
+                                      ".gz, .bz2 or .xz")
+    annotate_parser.add_argument("-f", "--format", choices=["json", "web_anno"], default="json",
+                                 help="output matches as match JSON or as W3C Web Annotations (default: json)")
+    annotate_parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                                 help="number of worker processes, 0 to run in the main process "
+                                      "(default: number of CPUs)")
+    annotate_parser.add_argument("--queue-size", type=int, default=100,
+                                 help="maximum number of tasks and results waiting in the queues (default: 100)")
+    annotate_parser.add_argument("--num-shards", type=int, default=1,
+                                 help="split the input texts in this number of shards (default: 1)")
+    annotate_parser.add_argument("--shard-index", type=int, default=0,
+                                 help="index of the shard to annotate, starting at 0 (default: 0)")
+    annotate_parser.add_argument("--resume", action="store_true",
+                                 help="skip texts annotated by a previous run and append to the output")
+    annotate_parser.add_argument("--report-interval", type=float, default=10.0,
+                                 help="seconds between throughput reports on stderr, 0 to disable (default: 10)")
+    return parser
+
+
+def main(argv: Union[None, List[str]] = None) -> int:
+    """Run the fuzzy-search command line interface.
+
+    :param argv: the command line arguments (defaults to sys.argv)
+    :type argv: Union[None, List[str]]
+    :return: the exit code
+    :rtype: int
+    """
+    parser = make_arg_parser()
+    args = parser.parse_args(argv)
+    if args.command != "annotate":
+        parser.print_help()
+        return 1
+    phrase_model_json = read_json_file(args.phrase_model)
+    config = read_json_file(args.config) if args.config else {}
+    annotate(phrase_model_json, config, args.inputs, args.output, output_format=args.format,
+             num_workers=args.workers, queue_size=args.queue_size, num_shards=args.num_shards,
+             shard_index=args.shard_index, resume=args.resume, report_interval=args.report_interval)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,8 @@
-from typing import List, Union
+from typing import Generator, Iterable, List, Union
 
 from fuzzy_search.fuzzy_match import PhraseMatch, PhraseMatchInContext
-from fuzzy_search.fuzzy_phrase_searcher import FuzzyPhraseSearcher
+from fuzzy_search.fuzzy_phrase import Phrase
+from fuzzy_search.fuzzy_phrase_searcher import FuzzyPhraseSearcher, IndexedText, SearchResult, get_text_dict
 
 
 class FuzzyContextSearcher(FuzzyPhraseSearcher):
@@ -9,6 +10,7 @@ class FuzzyContextSearcher(FuzzyPhraseSearcher):
     def __init__(self, config: Union[dict, None] = None):
         super().__init__(config)
         self.context_size = 100
+        self.lazy_context = False
         if config is not None:
             self.configure_context(config)
 
@@ -21,10 +23,13 @@ class FuzzyContextSearcher(FuzzyPhraseSearcher):
         super().configure(config)
         if "context_size" in config:
             self.context_size = config["context_size"]
+        if "lazy_context" in config:
+            self.lazy_context = config["lazy_context"]
 
     def add_match_context(self, match: PhraseMatch, text: Union[str, dict], context_size: Union[None, int] = None,
                           prefix_size: Union[None, int] = None,
-                          suffix_size: Union[None, int] = None) -> PhraseMatchInContext:
+                          suffix_size: Union[None, int] = None,
+                          lazy_context: Union[None, bool] = None) -> PhraseMatchInContext:
         """Add context to a given match and its corresponding text document.
 
         :param match: a phrase match object
@@ -37,23 +42,33 @@ class FuzzyContextSearcher(FuzzyPhraseSearcher):
         :type prefix_size: Union[None, int]
         :param suffix_size: size of the suffix context
         :type suffix_size: Union[None, int]
+        :param lazy_context: store only the context offsets and a reference to the text, instead of
+            copies of the context strings (defaults to the configured lazy_context)
+        :type lazy_context: Union[None, bool]
         :return: the phrase match object with context
         :rtype: PhraseMatchInContext
         """
         if context_size is None:
             context_size = self.context_size
+        if lazy_context is None:
+            lazy_context = self.lazy_context
         prefix_size = prefix_size if prefix_size is not None else context_size
         suffix_size = suffix_size if suffix_size is not None else context_size
-        return PhraseMatchInContext(match, text, prefix_size=prefix_size, suffix_size=suffix_size)
+        return PhraseMatchInContext(match, text, prefix_size=prefix_size, suffix_size=suffix_size,
+                                    lazy_context=lazy_context)
 
     def find_matches(self, text: Union[str, dict],
                      use_word_boundaries: Union[None, bool] = None,
-                     allow_overlapping_matches: bool = True,
+                     allow_overlapping_matches: Union[None, bool] = None,
                      include_variants: bool = None,
                      filter_distractors: bool = None,
                      prefix_size: Union[None, int] = None,
                      suffix_size: Union[None, int] = None,
-                     skip_exact_matching: bool = None) -> List[PhraseMatchInContext]:
+                     skip_exact_matching: bool = None,
+                     time_budget: Union[None, float] = None,
+                     max_candidates: Union[None, int] = None,
+                     max_levenshtein: Union[None, int] = None,
+                     phrases: Union[None, Iterable[Union[str, Phrase]]] = None) -> SearchResult:
         """Find fuzzy matches for registered phrases and add context around match string. This extends
         the find_matches function of the FuzzyPhraseSearcher by adding local context to each match.
 
@@ -62,7 +77,7 @@ class FuzzyContextSearcher(FuzzyPhraseSearcher):
         :param use_word_boundaries: use word boundaries in determining match boundaries
         :type use_word_boundaries: bool
         :param allow_overlapping_matches: boolean flag for whether to allow matches to overlap in their text ranges
-        :type allow_overlapping_matches: bool
+        :type allow_overlapping_matches: Union[None, bool]
         :param include_variants: boolean flag for whether to include phrase variants for finding matches
         :type include_variants: bool
         :param filter_distractors: boolean flag for whether to remove phrase matches that better match distractors
@@ -73,21 +88,75 @@ class FuzzyContextSearcher(FuzzyPhraseSearcher):
         :type suffix_size: Union[None, int]
         :param skip_exact_matching: boolean flag whether to skip the exact matching step
         :type skip_exact_matching: Union[None, bool]
-        :return: a list of phrases matches with text surrounding the match string
-        :rtype: PhraseMatchInContext
+        :param time_budget: the maximum number of seconds to search the text
+        :type time_budget: Union[None, float]
+        :param max_candidates: the maximum number of candidate matches to generate for the text
+        :type max_candidates: Union[None, int]
+        :param max_levenshtein: the maximum number of Levenshtein computations for the text
+        :type max_levenshtein: Union[None, int]
+        :param phrases: an optional list of registered phrases to restrict the search to
+        :type phrases: Union[None, Iterable[Union[str, Phrase]]]
+        :return: a list of phrases matches with text surrounding the match string, flagged as truncated
+            if a search budget ran out
+        :rtype: SearchResult
         """
         matches = super().find_matches(text, use_word_boundaries=use_word_boundaries,
                                        allow_overlapping_matches=allow_overlapping_matches,
                                        include_variants=include_variants, filter_distractors=filter_distractors,
-                                       skip_exact_matching=skip_exact_matching)
-        return [self.add_match_context(match, text, prefix_size=prefix_size,
-                                       suffix_size=suffix_size) for match in matches]
+                                       skip_exact_matching=skip_exact_matching, time_budget=time_budget,
+                                       max_candidates=max_candidates, max_levenshtein=max_levenshtein,
+                                       phrases=phrases)
+        return SearchResult([self.add_match_context(match, text, prefix_size=prefix_size,
+                                                    suffix_size=suffix_size) for match in matches],
+                            truncated=matches.truncated)
+
+    def iter_matches_chunked(self, text: Union[str, dict],
+                             chunk_size: Union[None, int] = None,
+                             use_word_boundaries: Union[None, bool] = None,
+                             include_variants: Union[None, bool] = None,
+                             filter_distractors: Union[None, bool] = None,
+                             skip_exact_matching: bool = None,
+                             prefix_size: Union[None, int] = None,
+                             suffix_size: Union[None, int] = None) -> Generator[PhraseMatchInContext, None, None]:
+        """Find fuzzy matches in a long text by searching it in overlapping windows and add context around
+        each match string. The context is taken from the text as a whole, so it is not cut off at
+        window boundaries.
+
+        :param text: the text (string or dictionary with 'text' property) to find fuzzy matching phrases in.
+        :type text: Union[str, dict]
+        :param chunk_size: the number of characters per window (defaults to the configured chunk_size)
+        :type chunk_size: Union[None, int]
+        :param use_word_boundaries: use word boundaries in determining match boundaries
+        :type use_word_boundaries: Union[None, bool]
+        :param include_variants: boolean flag for whether to include phrase variants for finding matches
+        :type include_variants: Union[None, bool]
+        :param filter_distractors: boolean flag for whether to remove phrase matches that better match distractors
+        :type filter_distractors: Union[None, bool]
+        :param skip_exact_matching: boolean flag whether to skip the exact matching step
+        :type skip_exact_matching: Union[None, bool]
+        :param prefix_size: the size of the prefix context window
+        :type prefix_size: Union[None, int]
+        :param suffix_size: the size of the suffix context window
+        :type suffix_size: Union[None, int]
+        :return: a generator of phrase matches with text surrounding the match string
+        :rtype: Generator[PhraseMatchInContext, None, None]
+        """
+        text = get_text_dict(text)
+        for match in super().iter_matches_chunked(text, chunk_size=chunk_size,
+                                                  use_word_boundaries=use_word_boundaries,
+                                                  include_variants=include_variants,
+                                                  filter_distractors=filter_distractors,
+                                                  skip_exact_matching=skip_exact_matching):
+            yield self.add_match_context(match, text, prefix_size=prefix_size, suffix_size=suffix_size)
 
     def find_matches_in_context(self, match_in_context: PhraseMatchInContext,
                                 use_word_boundaries: Union[None, bool] = None,
                                 include_variants: Union[None, bool] = None,
-                                filter_distractors: Union[None, bool] = None) -> List[PhraseMatch]:
-        """Use a MatchInContext object to find other phrases in the context of that match.
+                                filter_distractors: Union[None, bool] = None,
+                                indexed_text: Union[None, IndexedText] = None) -> List[PhraseMatch]:
+        """Use a MatchInContext object to find other phrases in the context of that match. If the text
+        of the match is passed as indexed_text (see index_text), the cached skipgram matches of the text
+        are used for the window of the context, instead of searching the context string from scratch.
 
         :param match_in_context: a match phrase with context from the text that the match was taken from
         :type match_in_context: PhraseMatchInContext
@@ -97,9 +166,16 @@ class FuzzyContextSearcher(FuzzyPhraseSearcher):
         :type include_variants: bool
         :param filter_distractors: boolean whether to remove matches that are closer to distractors
         :type filter_distractors: bool
+        :param indexed_text: the text of the match indexed with index_text. The word boundary and variant
+            settings of the indexed text are used.
+        :type indexed_text: Union[None, IndexedText]
         :return: a list of match objects
         :rtype: List[PhraseMatch]
         """
+        if indexed_text is not None:
+            return self.find_matches_in_window(indexed_text, match_in_context.context_start,
+                                               match_in_context.context_end,
+                                               filter_distractors=filter_distractors)
         # override searcher configuration if a boolean is passed
         use_word_boundaries = self.use_word_boundaries if use_word_boundaries is None else use_word_boundaries
         include_variants = self.include_variants if include_variants is None else include_variants
@@ -0,0 +1,142 @@
+from typing import Dict, Generator, Iterable, Tuple, Union
+import codecs
+import json
+import mmap
+import os
+
+
+def get_file_format(file_path: str) -> str:
+    """Determine the format of an input file based on its extension. Files ending in .jsonl or .ndjson
+    are read as JSON lines, all other files as plain text.
+
+    :param file_path: the path of an input file
+    :type file_path: str
+    :return: the file format, either 'jsonl' or 'text'
+    :rtype: str
+    """
+    _, extension = os.path.splitext(file_path)
+    return "jsonl" if extension.lower() in {".jsonl", ".ndjson"} else "text"
+
+
+def get_byte_offset(window_string: str, char_offset: int, window_byte_start: int = 0,
+                    encoding: str = "utf-8") -> int:
+    """Translate a character offset in a window of a text to a byte offset in the encoded text.
+
+    :param window_string: the string of the window that contains the character offset
+    :type window_string: str
+    :param char_offset: the character offset relative to the start of the window
+    :type char_offset: int
+    :param window_byte_start: the byte offset of the start of the window in the encoded text
+    :type window_byte_start: int
+    :param encoding: the encoding of the text
+    :type encoding: str
+    :return: the byte offset in the encoded text
+    :rtype: int
+    """
+    return window_byte_start + len(window_string[:char_offset].encode(encoding))
+
+
+def add_byte_offsets(matches: Iterable[any], window_string: str, window_char_start: int = 0,
+                     window_byte_start: int = 0, encoding: str = "utf-8") -> None:
+    """Add the byte offsets in the encoded text to the matches in a window of the text. The match
+    boundaries are visited in order and a running byte count is advanced by encoding only the text
+    between consecutive boundaries, so each character of the window is encoded at most once.
+
+    :param matches: the matches in the window, with character offsets relative to the start of the text
+    :type matches: Iterable[PhraseMatch]
+    :param window_string: the string of the window that contains the matches
+    :type window_string: str
+    :param window_char_start: the character offset of the start of the window in the text
+    :type window_char_start: int
+    :param window_byte_start: the byte offset of the start of the window in the encoded text
+    :type window_byte_start: int
+    :param encoding: the encoding of the text
+    :type encoding: str
+    """
+    boundaries = sorted({boundary for match in matches for boundary in (match.offset, match.end)})
+    char_offset = window_char_start
+    byte_offset = window_byte_start
+    boundary_byte_offset = {}
+    for boundary in boundaries:
+        byte_offset += len(window_string[char_offset - window_char_start:boundary - window_char_start].encode(encoding))
+        char_offset = boundary
+        boundary_byte_offset[boundary] = byte_offset
+    for match in matches:
+        match.byte_offset = boundary_byte_offset[match.offset]
+        match.byte_end = boundary_byte_offset[match.end]
+
+
+def read_text_file_chunks(file_path: str, chunk_size: int, chunk_overlap: int,
+                          encoding: str = "utf-8") -> Generator[Tuple[int, int, str], None, None]:
+    """Read a text file through a memory map in overlapping windows of chunk_size characters plus an overlap.
+    The bytes are decoded incrementally, so at most one window of the text is held in memory as a string.
+
+    :param file_path: the path of a plain text file
+    :type file_path: str
+    :param chunk_size: the number of characters between the starts of consecutive windows
+    :type chunk_size: int
+    :param chunk_overlap: the number of characters that a window extends into the next window
+    :type chunk_overlap: int
+    :param encoding: the encoding of the text file
+    :type encoding: str
+    :return: a generator of tuples of the window character offset, window byte offset and window string
+    :rtype: Generator[Tuple[int, int, str], None, None]
+    """
+    if not isinstance(chunk_size, int) or chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer")
+    if os.path.getsize(file_path) == 0:
+        return None
+    window_size = chunk_size + chunk_overlap
+    decoder = codecs.getincrementaldecoder(encoding)()
+    with open(file_path, "rb") as fh:
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            read_offset = 0
+            char_start = 0
+            byte_start = 0
+            buffer = ""
+            eof = False
+            while True:
+                while not eof and len(buffer) < window_size:
+                    # a block of window_size bytes decodes to at most window_size characters
+                    block = mm[read_offset:read_offset + window_size]
+                    read_offset += len(block)
+                    eof = read_offset >= len(mm)
+                    buffer += decoder.decode(block, final=eof)
+                if len(buffer) == 0:
+                    break
+                yield char_start, byte_start, buffer[:window_size]
+                if len(buffer) <= chunk_size:
+                    # the buffer is only smaller than a window at the end of the file
+                    break
+                byte_start += len(buffer[:chunk_size].encode(encoding))
+                char_start += chunk_size
+                buffer = buffer[chunk_size:]
+
+
+def read_jsonl_file_records(file_path: str) -> Generator[Tuple[int, Dict[str, any]], None, None]:
+    """Read a JSON lines file through a memory map, one record at a time. Each line should contain
+    either a text string or a text dictionary with a 'text' property and optionally an 'id' property.
+    Records without an identifier get the file path and line number as identifier.
+
+    :param file_path: the path of a JSON lines file
+    :type file_path: str
+    :return: a generator of tuples of the line number and the text dictionary
+    :rtype: Generator[Tuple[int, Dict[str, any]], None, None]
+    """
+    if os.path.getsize(file_path) == 0:
+        return None
+    with open(file_path, "rb") as fh:
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            line_number = 0
+            for line in iter(mm.readline, b""):
+                line_number += 1
+                if line.strip() == b"":
+                    continue
+                record: Union[str, Dict[str, any]] = json.loads(line)
+                if isinstance(record, str):
+                    record = {"text": record}
+                if "text" not in record:
+                    raise KeyError(f"record on line {line_number} of {file_path} has no 'text' property")
+                if "id" not in record:
+                    record["id"] = f"{file_path}:{line_number}"
+                yield line_number, record
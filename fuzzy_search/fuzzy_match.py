@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import Dict, List, Union
+from typing import Dict, Iterable, List, NamedTuple, Union
 from datetime import datetime
 from collections import Counter
 import uuid
@@ -7,7 +7,8 @@ import string
 
 import fuzzy_search.fuzzy_string as fuzzy_string
 from fuzzy_search.fuzzy_string import SkipGram
-from fuzzy_search.fuzzy_phrase import Phrase
+from fuzzy_search.fuzzy_phrase import Phrase, PhraseStub
+from fuzzy_search.fuzzy_phrase_model import PhraseModel
 
 
 def validate_match_props(match_phrase: Phrase, match_variant: Phrase,
@@ -534,19 +535,123 @@ class Candidate:
             return True
 
 
+class MatchRow(NamedTuple):
+    """A scored match of a phrase (via one of its variants) in a text, as a plain tuple. The search
+    passes produce match rows, which are only turned into PhraseMatch objects when those are requested,
+    see make_row_match."""
+    phrase: Phrase
+    variant: Phrase
+    string: str
+    offset: int
+    end: int
+    character_overlap: float
+    ngram_overlap: float
+    skipgram_overlap: Union[None, float]
+    levenshtein_similarity: float
+
+
+def make_exact_match_row(match_phrase: Phrase, match_variant: Phrase, match_offset: int) -> MatchRow:
+    """Make the match row of an exact match of a phrase variant, which has perfect scores.
+
+    :param match_phrase: the phrase that has been matched
+    :type match_phrase: Phrase
+    :param match_variant: the variant of the phrase that the match is based on
+    :type match_variant: Phrase
+    :param match_offset: the offset of the match string in the text
+    :type match_offset: int
+    :return: the match row
+    :rtype: MatchRow
+    """
+    match_string = match_variant.phrase_string
+    return MatchRow(match_phrase, match_variant, match_string, match_offset, match_offset + len(match_string),
+                    1.0, 1.0, None, 1.0)
+
+
+def make_scored_match_row(match_phrase: Phrase, match_variant: Phrase, match_string: str, match_offset: int,
+                          skipgram_overlap: Union[None, float] = None) -> MatchRow:
+    """Make the match row of a fuzzy match, with the same scores as PhraseMatch.add_scores.
+
+    :param match_phrase: the phrase that has been matched
+    :type match_phrase: Phrase
+    :param match_variant: the variant of the phrase that the match is based on
+    :type match_variant: Phrase
+    :param match_string: the text string that matches the variant phrase
+    :type match_string: str
+    :param match_offset: the offset of the match string in the text
+    :type match_offset: int
+    :param skipgram_overlap: the overlap in skipgrams between match string and match variant
+    :type skipgram_overlap: Union[None, float]
+    :return: the match row
+    :rtype: MatchRow
+    """
+    variant_string = match_variant.phrase_string
+    return MatchRow(match_phrase, match_variant, match_string, match_offset, match_offset + len(match_string),
+                    fuzzy_string.score_char_overlap_ratio(variant_string, match_string),
+                    fuzzy_string.score_ngram_overlap_ratio(variant_string, match_string, match_phrase.ngram_size),
+                    skipgram_overlap,
+                    fuzzy_string.score_levenshtein_similarity_ratio(variant_string, match_string))
+
+
+def make_row_match(match_row: MatchRow, text_id: Union[None, str] = None) -> PhraseMatch:
+    """Turn a match row into a phrase match object.
+
+    :param match_row: a match row
+    :type match_row: MatchRow
+    :param text_id: the identifier of the text that contains the match
+    :type text_id: Union[None, str]
+    :return: the phrase match
+    :rtype: PhraseMatch
+    """
+    match = PhraseMatch(match_row.phrase, match_row.variant, match_row.string, match_row.offset,
+                        text_id=text_id, validate=False)
+    match.character_overlap = match_row.character_overlap
+    match.ngram_overlap = match_row.ngram_overlap
+    match.skipgram_overlap = match_row.skipgram_overlap
+    match.levenshtein_similarity = match_row.levenshtein_similarity
+    return match
+
+
 ###############
 # Match class #
 ###############
 
 class PhraseMatch:
 
+    __slots__ = ["_id", "_created", "phrase", "label", "variant", "string", "offset", "end", "text_id",
+                 "byte_offset", "byte_end", "character_overlap", "ngram_overlap", "skipgram_overlap",
+                 "levenshtein_similarity", "model_version"]
+
     def __init__(self, match_phrase: Phrase, match_variant: Phrase, match_string: str,
                  match_offset: int, text_id: Union[None, str] = None,
                  match_scores: dict = None, match_label: Union[str, List[str]] = None,
-                 match_id: str = None):
-        # print("Match class match_phrase:", match_phrase)
-        validate_match_props(match_phrase, match_variant, match_string, match_offset)
-        self.id = match_id if match_id else str(uuid.uuid4())
+                 match_id: str = None, validate: bool = True):
+        """A match of a phrase (via one of its variants) in a text. The match identifier and creation
+        timestamp are only generated when they are first accessed, e.g. when making a Web Annotation.
+
+        :param match_phrase: the phrase that has been matched
+        :type match_phrase: Phrase
+        :param match_variant: the variant of the phrase that the match is based on
+        :type match_variant: Phrase
+        :param match_string: the text string that matches the variant phrase
+        :type match_string: str
+        :param match_offset: the offset of the match string in the text
+        :type match_offset: int
+        :param text_id: the identifier of the text that contains the match
+        :type text_id: Union[None, str]
+        :param match_scores: a dictionary with char_match, ngram_match and levenshtein_similarity scores
+        :type match_scores: dict
+        :param match_label: an optional label that overrides the label of the match phrase
+        :type match_label: Union[str, List[str]]
+        :param match_id: an optional identifier of the match
+        :type match_id: str
+        :param validate: whether to validate the match properties (internal callers that construct
+            matches from validated phrases and text offsets skip this)
+        :type validate: bool
+        """
+        if validate:
+            validate_match_props(match_phrase, match_variant, match_string, match_offset)
+        self._id = match_id
+        self._created: Union[None, datetime] = None
         self.phrase = match_phrase
         self.label = match_phrase.label
         if match_label:
@@ -556,15 +661,40 @@ class PhraseMatch:
         self.offset = match_offset
         self.end = self.offset + len(self.string)
         self.text_id = text_id
+        self.byte_offset: Union[None, int] = None
+        self.byte_end: Union[None, int] = None
         self.character_overlap: Union[None, float] = None
         self.ngram_overlap: Union[None, float] = None
         self.skipgram_overlap: Union[None, float] = None
         self.levenshtein_similarity: Union[None, float] = None
+        # the version of the phrase model that produced the match, if the searcher is versioned
+        self.model_version: Union[None, int, str] = None
         if match_scores:
             self.character_overlap = match_scores['char_match']
             self.ngram_overlap = match_scores['ngram_match']
             self.levenshtein_similarity = match_scores['levenshtein_similarity']
-        self.created = datetime.now()
+
+    @property
+    def id(self) -> str:
+        """The identifier of the match, generated on first access."""
+        if self._id is None:
+            self._id = str(uuid.uuid4())
+        return self._id
+
+    @id.setter
+    def id(self, match_id: str) -> None:
+        self._id = match_id
+
+    @property
+    def created(self) -> datetime:
+        """The creation timestamp of the match, set on first access."""
+        if self._created is None:
+            self._created = datetime.now()
+        return self._created
+
+    @created.setter
+    def created(self, created: datetime) -> None:
+        self._created = created
 
     def __repr__(self):
         return f'PhraseMatch(' + \
@@ -602,6 +732,11 @@ class PhraseMatch:
         }
         if "label" in self.phrase.metadata:
             data["label"] = self.phrase.metadata["label"]
+        if self.byte_offset is not None:
+            data["byte_offset"] = self.byte_offset
+            data["byte_end"] = self.byte_end
+        if self.model_version is not None:
+            data["model_version"] = self.model_version
         return data
 
     def add_scores(self, skipgram_overlap: Union[None, float] = None) -> None:
@@ -726,13 +861,16 @@ class PhraseMatch:
 
 class PhraseMatchInContext(PhraseMatch):
 
+    __slots__ = ["prefix_size", "suffix_size", "context_start", "context_end", "_text", "_context",
+                 "_prefix", "_suffix"]
+
     def __init__(self, match: PhraseMatch, text: Union[str, dict] = None, context: str = None,
                  context_start: int = None, context_end: int = None,
-                 prefix_size: int = 20, suffix_size: int = 20):
-        super().__init__(match_phrase=match.phrase, match_variant=match.variant, match_string=match.string,
-                         match_offset=match.offset, text_id=match.text_id)
+                 prefix_size: int = 20, suffix_size: int = 20, lazy_context: bool = False):
         """MatchInContext extends a Match object with surrounding context from the text document that the match
-        phrase was taken from. Alternatively, the context can be submitted.
+        phrase was taken from. Alternatively, the context can be submitted. With lazy_context, only a reference
+        to the text string and the context offsets are stored, and the context, prefix and suffix strings
+        are sliced from the text when they are accessed.
 
         :param text: the text (string or dictionary with 'text' and 'id' properties) that the match phrase was taken from
         :type text: Union[str, dict]
@@ -747,25 +885,65 @@ class PhraseMatchInContext(PhraseMatch):
         :param prefix_size: the size of the prefix window
         :type prefix_size: int
         :param suffix_size: the size of the suffix window
-        :type suffix_size: int 
+        :type suffix_size: int
+        :param lazy_context: whether to store only the context offsets instead of the context strings
+        :type lazy_context: bool
         """
+        # the match has already been validated, so its properties are copied without validating them again
+        super().__init__(match_phrase=match.phrase, match_variant=match.variant, match_string=match.string,
+                         match_offset=match.offset, text_id=match.text_id, match_label=match.label,
+                         match_id=match._id, validate=False)
+        self._created = match._created
+        self.byte_offset = match.byte_offset
+        self.byte_end = match.byte_end
         self.character_overlap = match.character_overlap
         self.ngram_overlap = match.ngram_overlap
+        self.skipgram_overlap = match.skipgram_overlap
         self.levenshtein_similarity = match.levenshtein_similarity
+        self.model_version = match.model_version
         self.prefix_size = prefix_size
         self.suffix_size = suffix_size
+        self._text = None
         if text:
-            if isinstance(text, str):
-                text = {"text": text, "id": match.text_id}
+            text_string = text if isinstance(text, str) else text["text"]
             self.context_start = match.offset - prefix_size if match.offset >= prefix_size else 0
-            self.context_end = match.end + suffix_size if len(text["text"]) > match.end + suffix_size else len(text["text"])
-            self.context = text["text"][self.context_start:self.context_end]
-        elif context:
-            self.context = context
+            self.context_end = match.end + suffix_size if len(text_string) > match.end + suffix_size else len(text_string)
+            if lazy_context:
+                # the text string is shared with the caller, not copied
+                self._text = text_string
+                self._context, self._prefix, self._suffix = None, None, None
+            else:
+                self._context = text_string[self.context_start:self.context_end]
+                self._prefix = text_string[self.context_start:match.offset]
+                self._suffix = text_string[match.end:self.context_end]
+        else:
+            self._context = context
             self.context_start = context_start
             self.context_end = context_end
-        self.prefix = text["text"][self.context_start:match.offset]
-        self.suffix = text["text"][match.end:self.context_end]
+            # without the text, the prefix and suffix are taken from the context itself
+            self._prefix = context[:match.offset - context_start] if context else None
+            self._suffix = context[match.end - context_start:] if context else None
+
+    @property
+    def context(self) -> str:
+        """The text surrounding the match string, including the match string."""
+        if self._text is None:
+            return self._context
+        return self._text[self.context_start:self.context_end]
+
+    @property
+    def prefix(self) -> str:
+        """The text preceding the match string within the context."""
+        if self._text is None:
+            return self._prefix
+        return self._text[self.context_start:self.offset]
+
+    @property
+    def suffix(self) -> str:
+        """The text following the match string within the context."""
+        if self._text is None:
+            return self._suffix
+        return self._text[self.end:self.context_end]
 
     def __repr__(self):
         return f'PhraseMatchInContext(' + \
@@ -796,13 +974,126 @@ class PhraseMatchInContext(PhraseMatch):
         return match_anno
 
 
-def phrase_match_from_json(match_json: dict) -> PhraseMatch:
-    match_phrase = Phrase(match_json['phrase'])
-    match_variant = Phrase(match_json['variant'])
+class ProximityMatch:
+
+    __slots__ = ["anchor", "target", "distance", "direction"]
+
+    def __init__(self, anchor: PhraseMatch, target: PhraseMatch, distance: int, direction: str):
+        """A pair of an anchor match and a target match that was found near the anchor.
+
+        :param anchor: the match of the anchor phrase
+        :type anchor: PhraseMatch
+        :param target: the match of the target phrase
+        :type target: PhraseMatch
+        :param distance: the number of characters between the anchor and the target
+        :type distance: int
+        :param direction: whether the target is 'after' or 'before' the anchor
+        :type direction: str
+        """
+        self.anchor = anchor
+        self.target = target
+        self.distance = distance
+        self.direction = direction
+
+    def __repr__(self):
+        return f'ProximityMatch(anchor: "{self.anchor.string}", target: "{self.target.string}", ' + \
+               f'distance: {self.distance}, direction: "{self.direction}")'
+
+    def json(self) -> dict:
+        return {
+            "type": "ProximityMatch",
+            "anchor": self.anchor.json(),
+            "target": self.target.json(),
+            "distance": self.distance,
+            "direction": self.direction
+        }
+
+
+def set_match_ids(matches: List[PhraseMatch], created: Union[None, datetime] = None) -> None:
+    """Generate identifiers for a batch of matches and give them a shared creation timestamp, so that
+    the timestamp is taken once per batch instead of once per match.
+
+    :param matches: a list of phrase matches
+    :type matches: List[PhraseMatch]
+    :param created: the creation timestamp to use (defaults to the current time)
+    :type created: Union[None, datetime]
+    """
+    if created is None:
+        created = datetime.now()
+    for match in matches:
+        if match._id is None:
+            match._id = str(uuid.uuid4())
+        if match._created is None:
+            match._created = created
+
+
+def get_interned_phrase(phrase_string: str, phrase_cache: Dict[str, Phrase],
+                        phrase_model: Union[None, PhraseModel] = None) -> Phrase:
+    """Return the phrase object for a phrase string, creating it only once per string. A phrase string
+    is resolved against the phrases, variants and distractors of the phrase model, if given. Otherwise
+    a lightweight phrase stub is made, without generating skipgrams.
+
+    :param phrase_string: the phrase string of a stored match
+    :type phrase_string: str
+    :param phrase_cache: a dictionary of phrase strings and phrase objects that are already resolved
+    :type phrase_cache: Dict[str, Phrase]
+    :param phrase_model: an optional phrase model to resolve phrase strings against
+    :type phrase_model: Union[None, PhraseModel]
+    :return: the phrase object
+    :rtype: Phrase
+    """
+    if phrase_string in phrase_cache:
+        return phrase_cache[phrase_string]
+    phrase = None
+    if phrase_model is not None:
+        for phrase_index in [phrase_model.phrase_index, phrase_model.variant_index, phrase_model.distractor_index]:
+            if phrase_string in phrase_index:
+                phrase = phrase_index[phrase_string]
+                break
+    if phrase is None:
+        if phrase_model is not None:
+            phrase = PhraseStub(phrase_string, ngram_size=phrase_model.ngram_size, skip_size=phrase_model.skip_size)
+        else:
+            phrase = PhraseStub(phrase_string)
+    phrase_cache[phrase_string] = phrase
+    return phrase
+
+
+def phrase_match_from_json(match_json: dict, phrase_model: Union[None, PhraseModel] = None,
+                           phrase_cache: Union[None, Dict[str, Phrase]] = None) -> PhraseMatch:
+    """Rebuild a phrase match from its json() representation. Without a phrase model or phrase cache,
+    new phrase objects are made for the phrase and variant of the match. Otherwise, the phrase
+    strings are resolved with get_interned_phrase, so that matches of the same phrase share a
+    phrase object.
+
+    :param match_json: the json() representation of a phrase match
+    :type match_json: dict
+    :param phrase_model: an optional phrase model to resolve phrase strings against
+    :type phrase_model: Union[None, PhraseModel]
+    :param phrase_cache: an optional dictionary of phrase strings and phrase objects that are already resolved
+    :type phrase_cache: Union[None, Dict[str, Phrase]]
+    :return: the phrase match
+    :rtype: PhraseMatch
+    """
+    intern_phrases = phrase_model is not None or phrase_cache is not None
+    if not intern_phrases:
+        match_phrase = Phrase(match_json['phrase'])
+        match_variant = Phrase(match_json['variant'])
+    else:
+        if phrase_cache is None:
+            phrase_cache = {}
+        match_phrase = get_interned_phrase(match_json['phrase'], phrase_cache, phrase_model=phrase_model)
+        match_variant = get_interned_phrase(match_json['variant'], phrase_cache, phrase_model=phrase_model)
     phrase_match = PhraseMatch(match_phrase, match_variant, match_json['string'],
                                match_offset=match_json['offset'],
+                               text_id=match_json.get('text_id'),
                                match_scores=match_json['match_scores'],
-                               match_label=match_json['label'])
+                               match_label=match_json['label'], validate=not intern_phrases)
+    if 'byte_offset' in match_json:
+        phrase_match.byte_offset = match_json['byte_offset']
+        phrase_match.byte_end = match_json['byte_end']
+    if 'model_version' in match_json:
+        phrase_match.model_version = match_json['model_version']
     if 'context' in match_json:
         phrase_match = PhraseMatchInContext(phrase_match, context=match_json['context'],
                                             prefix_size=match_json['prefix_size'],
@@ -810,3 +1101,24 @@ def phrase_match_from_json(match_json: dict) -> PhraseMatch:
                                             context_start=match_json['context_start'],
                                             context_end=match_json['context_end'])
     return phrase_match
+
+
+def phrase_matches_from_json(match_jsons: Iterable[dict], phrase_model: Union[None, PhraseModel] = None,
+                             phrase_cache: Union[None, Dict[str, Phrase]] = None) -> List[PhraseMatch]:
+    """Rebuild a batch of phrase matches from their json() representations. Each distinct phrase string is
+    resolved once, against the phrase model if given or as a lightweight phrase stub, so no skipgrams
+    are computed for loading the matches.
+
+    :param match_jsons: an iterable of json() representations of phrase matches
+    :type match_jsons: Iterable[dict]
+    :param phrase_model: an optional phrase model to resolve phrase strings against
+    :type phrase_model: Union[None, PhraseModel]
+    :param phrase_cache: an optional dictionary of resolved phrases to share between batches
+    :type phrase_cache: Union[None, Dict[str, Phrase]]
+    :return: the list of phrase matches
+    :rtype: List[PhraseMatch]
+    """
+    if phrase_cache is None:
+        phrase_cache = {}
+    return [phrase_match_from_json(match_json, phrase_model=phrase_model, phrase_cache=phrase_cache)
+            for match_json in match_jsons]
@@ -0,0 +1,266 @@
+from typing import Dict, Generator, Iterable, List, Union
+from array import array
+import math
+
+from fuzzy_search.fuzzy_match import MatchRow, PhraseMatch
+from fuzzy_search.fuzzy_phrase import Phrase
+
+
+score_columns = ["character_overlap", "ngram_overlap", "skipgram_overlap", "levenshtein_similarity"]
+byte_columns = ["byte_offset", "byte_end"]
+
+
+def import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("numpy is required for converting a match table to arrays, "
+                          "install it with 'pip install numpy'")
+    return numpy
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("pyarrow is required for writing a match table to Arrow or Parquet, "
+                          "install it with 'pip install pyarrow'")
+    return pyarrow
+
+
+def to_optional_strings(values: Iterable[Union[None, int, str]]) -> List[Union[None, str]]:
+    """Convert a list of identifiers to strings, leaving missing values as None.
+
+    :param values: an iterable of identifiers
+    :type values: Iterable[Union[None, int, str]]
+    :return: a list of identifier strings
+    :rtype: List[Union[None, str]]
+    """
+    return [None if value is None else str(value) for value in values]
+
+
+class PhraseMatchTable:
+
+    def __init__(self, matches: Union[None, Iterable[PhraseMatch]] = None):
+        """A columnar representation of a batch of phrase matches. Each match is stored as a row in a set of
+        parallel columns: text id, phrase id, variant id, offset, end, match string, scores, byte offsets and
+        model version. Phrases and variants are stored once in a vocabulary and referenced by their position
+        in it. PhraseMatch objects are only rebuilt on request.
+
+        :param matches: an optional iterable of phrase matches to add to the table
+        :type matches: Union[None, Iterable[PhraseMatch]]
+        """
+        self.phrases: List[Phrase] = []
+        # phrases and variants are keyed by object identity, as a variant can have the same string as a phrase
+        self.phrase_id: Dict[int, int] = {}
+        self.text_id: List[Union[None, int, str]] = []
+        self.phrase: array = array("l")
+        self.variant: array = array("l")
+        self.offset: array = array("q")
+        self.end: array = array("q")
+        self.string: List[str] = []
+        # scores that are not computed are stored as NaN
+        self.character_overlap: array = array("d")
+        self.ngram_overlap: array = array("d")
+        self.skipgram_overlap: array = array("d")
+        self.levenshtein_similarity: array = array("d")
+        # byte offsets that are not known are stored as -1
+        self.byte_offset: array = array("q")
+        self.byte_end: array = array("q")
+        self.model_version: List[Union[None, int, str]] = []
+        if matches is not None:
+            self.add_matches(matches)
+
+    def __len__(self):
+        return len(self.offset)
+
+    def __repr__(self):
+        return f"PhraseMatchTable(num_matches: {len(self)}, num_phrases: {len(self.phrases)})"
+
+    def get_phrase_id(self, phrase: Phrase) -> int:
+        """Return the position of a phrase in the vocabulary of the table, adding it if it is not yet known.
+
+        :param phrase: a phrase object
+        :type phrase: Phrase
+        :return: the phrase identifier in the table
+        :rtype: int
+        """
+        if id(phrase) not in self.phrase_id:
+            self.phrase_id[id(phrase)] = len(self.phrases)
+            self.phrases.append(phrase)
+        return self.phrase_id[id(phrase)]
+
+    def add_match_row(self, match_row: Union[MatchRow, PhraseMatch], text_id: Union[None, int, str] = None,
+                      byte_offset: Union[None, int] = None, byte_end: Union[None, int] = None,
+                      model_version: Union[None, int, str] = None) -> None:
+        """Add a match row as a row to the table, without making a PhraseMatch object.
+
+        :param match_row: a match row, or a phrase match
+        :type match_row: Union[MatchRow, PhraseMatch]
+        :param text_id: the identifier of the text that contains the match
+        :type text_id: Union[None, int, str]
+        :param byte_offset: the byte offset of the match in the text file, if known
+        :type byte_offset: Union[None, int]
+        :param byte_end: the byte offset of the end of the match in the text file, if known
+        :type byte_end: Union[None, int]
+        :param model_version: the version of the phrase model that produced the match, if known
+        :type model_version: Union[None, int, str]
+        """
+        self.text_id.append(text_id)
+        self.phrase.append(self.get_phrase_id(match_row.phrase))
+        self.variant.append(self.get_phrase_id(match_row.variant))
+        self.offset.append(match_row.offset)
+        self.end.append(match_row.end)
+        self.string.append(match_row.string)
+        for column in score_columns:
+            score = getattr(match_row, column)
+            getattr(self, column).append(math.nan if score is None else score)
+        self.byte_offset.append(-1 if byte_offset is None else byte_offset)
+        self.byte_end.append(-1 if byte_end is None else byte_end)
+        self.model_version.append(model_version)
+
+    def add_match(self, match: PhraseMatch) -> None:
+        """Add a phrase match as a row to the table.
+
+        :param match: a phrase match
+        :type match: PhraseMatch
+        """
+        self.add_match_row(match, text_id=match.text_id, byte_offset=match.byte_offset, byte_end=match.byte_end,
+                           model_version=match.model_version)
+
+    def add_matches(self, matches: Iterable[PhraseMatch]) -> None:
+        """Add a list of phrase matches as rows to the table.
+
+        :param matches: an iterable of phrase matches
+        :type matches: Iterable[PhraseMatch]
+        """
+        for match in matches:
+            self.add_match(match)
+
+    def get_match(self, row: int) -> PhraseMatch:
+        """Rebuild the phrase match object of a row in the table.
+
+        :param row: the row number of the match
+        :type row: int
+        :return: the phrase match
+        :rtype: PhraseMatch
+        """
+        match = PhraseMatch(self.phrases[self.phrase[row]], self.phrases[self.variant[row]], self.string[row],
+                            self.offset[row], text_id=self.text_id[row], validate=False)
+        for column in score_columns:
+            score = getattr(self, column)[row]
+            setattr(match, column, None if math.isnan(score) else score)
+        for column in byte_columns:
+            byte_offset = getattr(self, column)[row]
+            setattr(match, column, None if byte_offset < 0 else byte_offset)
+        match.model_version = self.model_version[row]
+        return match
+
+    def iter_matches(self) -> Generator[PhraseMatch, None, None]:
+        """Rebuild the phrase match objects of all rows in the table.
+
+        :return: a generator of phrase matches
+        :rtype: Generator[PhraseMatch, None, None]
+        """
+        for row in range(len(self)):
+            yield self.get_match(row)
+
+    def columns(self) -> Dict[str, list]:
+        """Return the columns of the table as plain lists, with phrase and variant strings resolved.
+
+        :return: a dictionary of column names and column values
+        :rtype: Dict[str, list]
+        """
+        phrase_strings = [phrase.phrase_string for phrase in self.phrases]
+        columns = {
+            "text_id": list(self.text_id),
+            "phrase_id": self.phrase.tolist(),
+            "variant_id": self.variant.tolist(),
+            "phrase": [phrase_strings[phrase_id] for phrase_id in self.phrase],
+            "variant": [phrase_strings[variant_id] for variant_id in self.variant],
+            "offset": self.offset.tolist(),
+            "end": self.end.tolist(),
+            "string": list(self.string),
+        }
+        for column in score_columns:
+            columns[column] = getattr(self, column).tolist()
+        for column in byte_columns:
+            columns[column] = [None if byte_offset < 0 else byte_offset for byte_offset in getattr(self, column)]
+        columns["model_version"] = list(self.model_version)
+        return columns
+
+    def to_numpy(self) -> Dict[str, any]:
+        """Return the numeric columns of the table as numpy arrays. The arrays share memory with the
+        table columns where possible. Requires numpy.
+
+        :return: a dictionary of column names and numpy arrays
+        :rtype: Dict[str, numpy.ndarray]
+        """
+        np = import_numpy()
+        columns = {
+            "text_id": np.array(self.text_id, dtype=object),
+            "phrase_id": np.frombuffer(self.phrase, dtype=f"i{self.phrase.itemsize}"),
+            "variant_id": np.frombuffer(self.variant, dtype=f"i{self.variant.itemsize}"),
+            "offset": np.frombuffer(self.offset, dtype="i8"),
+            "end": np.frombuffer(self.end, dtype="i8"),
+            "string": np.array(self.string, dtype=object),
+        }
+        for column in score_columns:
+            columns[column] = np.frombuffer(getattr(self, column), dtype="f8")
+        for column in byte_columns:
+            columns[column] = np.frombuffer(getattr(self, column), dtype="i8")
+        columns["model_version"] = np.array(self.model_version, dtype=object)
+        return columns
+
+    def to_arrow(self):
+        """Return the table as a pyarrow Table, with the phrase and variant strings as dictionary encoded
+        columns. Text ids and model versions are stored as strings, as they can be strings or integers.
+        Unknown byte offsets are stored as nulls. Requires pyarrow.
+
+        :return: the match table as Arrow table
+        :rtype: pyarrow.Table
+        """
+        pa = import_pyarrow()
+        phrase_strings = pa.array([phrase.phrase_string for phrase in self.phrases], type=pa.string())
+        phrase_ids = pa.array(self.phrase.tolist(), type=pa.int32())
+        variant_ids = pa.array(self.variant.tolist(), type=pa.int32())
+        columns = {
+            "text_id": pa.array(to_optional_strings(self.text_id), type=pa.string()),
+            "phrase_id": phrase_ids,
+            "variant_id": variant_ids,
+            "phrase": pa.DictionaryArray.from_arrays(phrase_ids, phrase_strings),
+            "variant": pa.DictionaryArray.from_arrays(variant_ids, phrase_strings),
+            "offset": pa.array(self.offset.tolist(), type=pa.int64()),
+            "end": pa.array(self.end.tolist(), type=pa.int64()),
+            "string": pa.array(self.string, type=pa.string()),
+        }
+        for column in score_columns:
+            columns[column] = pa.array(getattr(self, column).tolist(), type=pa.float64(), from_pandas=True)
+        for column in byte_columns:
+            columns[column] = pa.array([None if byte_offset < 0 else byte_offset
+                                        for byte_offset in getattr(self, column)], type=pa.int64())
+        columns["model_version"] = pa.array(to_optional_strings(self.model_version), type=pa.string())
+        return pa.table(columns)
+
+    def write_parquet(self, file_path: str, **kwargs) -> None:
+        """Write the table to a Parquet file. Requires pyarrow.
+
+        :param file_path: the path of the Parquet file
+        :type file_path: str
+        :param kwargs: additional keyword arguments for pyarrow.parquet.write_table
+        """
+        import_pyarrow()
+        import pyarrow.parquet as pq
+        pq.write_table(self.to_arrow(), file_path, **kwargs)
+
+    def write_ipc(self, file_path: str) -> None:
+        """Write the table to an Arrow IPC (Feather version 2) file. Requires pyarrow.
+
+        :param file_path: the path of the Arrow IPC file
+        :type file_path: str
+        """
+        pa = import_pyarrow()
+        table = self.to_arrow()
+        with pa.OSFile(file_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
@@ -0,0 +1,278 @@
+from typing import IO, Iterable, List, Union
+from json.encoder import encode_basestring_ascii
+import bz2
+import gzip
+import json
+import lzma
+import math
+import os
+
+from fuzzy_search.fuzzy_match import PhraseMatch, PhraseMatchInContext, set_match_ids
+
+
+compression_openers = {
+    "gzip": gzip.open,
+    "bz2": bz2.open,
+    "lzma": lzma.open
+}
+
+compression_extensions = {
+    ".gz": "gzip",
+    ".bz2": "bz2",
+    ".xz": "lzma",
+    ".lzma": "lzma"
+}
+
+# constant fragments of a Web Annotation, in the order of the keys of PhraseMatch.as_web_anno
+web_anno_start = '{"@context": "http://www.w3.org/ns/anno.jsonld", "id": '
+web_anno_created = ', "type": "Annotation", "motivation": "classifying", "created": '
+web_anno_target = ', "generator": {"id": "https://github.com/marijnkoolen/fuzzy-search", "type": "Software", ' \
+                  '"name": "fuzzy-search"}, "target": {"source": '
+web_anno_body_start = '{"type": "TextualBody", "purpose": '
+web_anno_body_purposes = {purpose: f'{web_anno_body_start}"{purpose}", "format": "text", "value": '
+                          for purpose in ["tagging", "highlighting", "correcting", "classifying"]}
+
+
+def get_compression(file_path: str) -> Union[None, str]:
+    """Determine the compression of an output file based on its extension: gzip for .gz, bz2 for .bz2
+    and lzma for .xz and .lzma. Other files are not compressed.
+
+    :param file_path: the path of an output file
+    :type file_path: str
+    :return: the compression, or None for uncompressed files
+    :rtype: Union[None, str]
+    """
+    _, extension = os.path.splitext(file_path)
+    return compression_extensions.get(extension.lower())
+
+
+def open_match_file(file_path: str, mode: str = "wt", compression: Union[None, str] = None) -> IO[str]:
+    """Open a text file for writing matches, optionally with compression.
+
+    :param file_path: the path of the output file
+    :type file_path: str
+    :param mode: the text mode to open the file in, 'wt' to write or 'at' to append
+    :type mode: str
+    :param compression: the compression to use, 'gzip', 'bz2', 'lzma' or None (defaults to the
+        compression that matches the file extension)
+    :type compression: Union[None, str]
+    :return: a text file handle
+    :rtype: IO[str]
+    """
+    if compression is None:
+        compression = get_compression(file_path)
+    if compression is None:
+        return open(file_path, mode, encoding="utf-8")
+    if compression not in compression_openers:
+        raise ValueError(f"unknown compression '{compression}', must be one of {list(compression_openers)}")
+    return compression_openers[compression](file_path, mode, encoding="utf-8")
+
+
+def encode_json_value(value: any) -> str:
+    """Encode a value as JSON in exactly the same way as json.dumps with its default settings. Strings,
+    numbers, booleans and None are encoded directly, other values are passed on to json.dumps.
+
+    :param value: the value to encode
+    :type value: any
+    :return: the JSON string of the value
+    :rtype: str
+    """
+    if isinstance(value, str):
+        return encode_basestring_ascii(value)
+    if value is None:
+        return "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, int):
+        return int.__repr__(value)
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "Infinity" if value > 0 else "-Infinity"
+        return float.__repr__(value)
+    return json.dumps(value)
+
+
+def match_to_json_line(match: PhraseMatch) -> str:
+    """Serialise a match to the JSON string of its json() representation, without building the
+    dictionary. The string is identical to json.dumps(match.json()).
+
+    :param match: a phrase match
+    :type match: PhraseMatch
+    :return: the JSON string of the match
+    :rtype: str
+    """
+    if type(match) not in {PhraseMatch, PhraseMatchInContext}:
+        # subclasses can change the representation, so they are serialised via their dictionary
+        return json.dumps(match.json())
+    if "label" in match.phrase.metadata:
+        label = match.phrase.metadata["label"]
+    else:
+        label = match.label
+    parts = [
+        '{"type": "PhraseMatch", "phrase": ', encode_json_value(match.phrase.phrase_string),
+        ', "variant": ', encode_json_value(match.variant.phrase_string),
+        ', "string": ', encode_json_value(match.string),
+        ', "offset": ', encode_json_value(match.offset),
+        ', "label": ', encode_json_value(label),
+        ', "text_id": ', encode_json_value(match.text_id),
+        ', "match_scores": {"char_match": ', encode_json_value(match.character_overlap),
+        ', "ngram_match": ', encode_json_value(match.ngram_overlap),
+        ', "levenshtein_similarity": ', encode_json_value(match.levenshtein_similarity), '}'
+    ]
+    if match.byte_offset is not None:
+        parts.extend([', "byte_offset": ', encode_json_value(match.byte_offset),
+                      ', "byte_end": ', encode_json_value(match.byte_end)])
+    if match.model_version is not None:
+        parts.extend([', "model_version": ', encode_json_value(match.model_version)])
+    if isinstance(match, PhraseMatchInContext):
+        parts.extend([', "context_start": ', encode_json_value(match.context_start),
+                      ', "context_end": ', encode_json_value(match.context_end),
+                      ', "context": ', encode_json_value(match.context),
+                      ', "prefix_size": ', encode_json_value(match.prefix_size),
+                      ', "suffix_size": ', encode_json_value(match.suffix_size),
+                      ', "prefix": ', encode_json_value(match.prefix),
+                      ', "suffix": ', encode_json_value(match.suffix)])
+    parts.append('}')
+    return "".join(parts)
+
+
+def match_to_web_anno_line(match: PhraseMatch, created: Union[None, str] = None) -> str:
+    """Serialise a match to the JSON string of its W3C Web Annotation representation, without building
+    the dictionary. The string is identical to json.dumps(match.as_web_anno()).
+
+    :param match: a phrase match
+    :type match: PhraseMatch
+    :param created: the ISO formatted creation timestamp of the match, if it is already known
+    :type created: Union[None, str]
+    :return: the JSON string of the Web Annotation of the match
+    :rtype: str
+    """
+    if type(match) not in {PhraseMatch, PhraseMatchInContext}:
+        return json.dumps(match.as_web_anno())
+    if not match.text_id:
+        raise ValueError('Cannot make target: match object has no text_id')
+    if created is None:
+        created = match.created.isoformat()
+    position_selector = ''.join(['{"type": "TextPositionSelector", "start": ', encode_json_value(match.offset),
+                                 ', "end": ', encode_json_value(match.end), '}'])
+    if isinstance(match, PhraseMatchInContext):
+        selector = ''.join(['[', position_selector,
+                            ', {"type": "TextQuoteSelector", "prefix": ', encode_json_value(match.prefix),
+                            ', "exact": ', encode_json_value(match.string),
+                            ', "suffix": ', encode_json_value(match.suffix), '}]'])
+    else:
+        selector = position_selector
+    body = [web_anno_body_purposes["tagging"], encode_json_value(match.phrase.phrase_string), '}, ',
+            web_anno_body_purposes["highlighting"], encode_json_value(match.string), '}']
+    if match.variant.phrase_string != match.string:
+        body.extend([', ', web_anno_body_purposes["correcting"], encode_json_value(match.variant.phrase_string), '}'])
+    if match.label:
+        body.extend([', ', web_anno_body_purposes["classifying"], encode_json_value(match.label), '}'])
+    return ''.join([web_anno_start, encode_json_value(match.id),
+                    web_anno_created, encode_json_value(created),
+                    web_anno_target, encode_json_value(match.text_id),
+                    ', "selector": ', selector, '}, "body": [', *body, ']}'])
+
+
+def encode_matches(matches: Iterable[PhraseMatch], output_format: str = "json") -> List[str]:
+    """Serialise a batch of matches to JSON strings. For Web Annotations, the matches of the batch get
+    identifiers and a shared creation timestamp, which is formatted once for the whole batch.
+
+    :param matches: an iterable of phrase matches
+    :type matches: Iterable[PhraseMatch]
+    :param output_format: the output format of matches, either 'json' or 'web_anno'
+    :type output_format: str
+    :return: a list of JSON strings, one per match
+    :rtype: List[str]
+    """
+    if output_format == "json":
+        return [match_to_json_line(match) for match in matches]
+    if output_format != "web_anno":
+        raise ValueError("output_format must be 'json' or 'web_anno'")
+    matches = list(matches)
+    set_match_ids(matches)
+    lines = []
+    last_created, last_created_string = None, None
+    for match in matches:
+        if match.created is not last_created:
+            last_created, last_created_string = match.created, match.created.isoformat()
+        lines.append(match_to_web_anno_line(match, created=last_created_string))
+    return lines
+
+
+class MatchWriter:
+
+    def __init__(self, output: Union[str, IO[str]], output_format: str = "json",
+                 compression: Union[None, str] = None, append: bool = False):
+        """A streaming writer of matches as JSON lines, either in their json() representation or as W3C Web
+        Annotations. Matches are serialised directly to strings, and each batch is written to the file
+        in one call. The output is identical to writing json.dumps of the match dictionaries per line.
+
+        :param output: the path of the output file, or a text file handle to write to
+        :type output: Union[str, IO[str]]
+        :param output_format: the output format of matches, either 'json' or 'web_anno'
+        :type output_format: str
+        :param compression: the compression of an output path, 'gzip', 'bz2', 'lzma' or None (defaults to
+            the compression that matches the file extension)
+        :type compression: Union[None, str]
+        :param append: whether to append to an existing output file instead of overwriting it
+        :type append: bool
+        """
+        if output_format not in {"json", "web_anno"}:
+            raise ValueError("output_format must be 'json' or 'web_anno'")
+        self.output_format = output_format
+        if isinstance(output, str):
+            self.fh = open_match_file(output, "at" if append else "wt", compression=compression)
+            self.owns_fh = True
+        else:
+            self.fh = output
+            self.owns_fh = False
+        self.num_matches = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write_lines(self, lines: List[str]) -> None:
+        """Write a batch of serialised matches, one per line.
+
+        :param lines: a list of JSON strings, one per match
+        :type lines: List[str]
+        """
+        if len(lines) == 0:
+            return None
+        self.fh.write("\n".join(lines) + "\n")
+        self.num_matches += len(lines)
+
+    def write_matches(self, matches: Iterable[PhraseMatch]) -> int:
+        """Serialise and write a batch of matches.
+
+        :param matches: an iterable of phrase matches
+        :type matches: Iterable[PhraseMatch]
+        :return: the number of matches written
+        :rtype: int
+        """
+        lines = encode_matches(matches, output_format=self.output_format)
+        self.write_lines(lines)
+        return len(lines)
+
+    def write_match(self, match: PhraseMatch) -> None:
+        """Serialise and write a single match.
+
+        :param match: a phrase match
+        :type match: PhraseMatch
+        """
+        self.write_matches([match])
+
+    def close(self) -> None:
+        """Close the output file, if the writer opened it."""
+        if self.owns_fh:
+            self.fh.close()
+        else:
+            self.fh.flush()
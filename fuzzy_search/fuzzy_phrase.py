@@ -1,4 +1,4 @@
-from typing import Dict, List, Set, Union
+from typing import Dict, List, Set, Tuple, Union
 from collections import defaultdict, Counter
 import re
 
@@ -44,63 +44,136 @@ class Phrase(object):
         self.late_threshold = len(self.name) - late_threshold - ngram_size
         self.within_range_threshold = within_range_threshold
         self.ignore_case = ignore_case
-        self.skipgrams = [skipgram for skipgram in text2skipgrams(self.phrase_string,
-                                                                  ngram_size=ngram_size, skip_size=skip_size)]
-        self.skipgram_set = set([skipgram.string for skipgram in self. skipgrams])
+        skipgrams = list(text2skipgrams(self.phrase_string, ngram_size=ngram_size, skip_size=skip_size))
+        # add lowercase version to allow both matching with and without ignore_case
+        if self.phrase_string.lower() == self.phrase_string:
+            skipgrams_lower = skipgrams
+        else:
+            skipgrams_lower = list(text2skipgrams(self.phrase_string.lower(),
+                                                  ngram_size=ngram_size, skip_size=skip_size))
+        self._set_skipgrams(skipgrams, skipgrams_lower)
+        self.metadata: dict = phrase
+        self._set_words()
+        if "label" in phrase:
+            self.set_label(phrase["label"])
+        if len(phrase.keys()) > 1:
+            self.add_metadata(phrase)
+
+    def __repr__(self):
+        return f"Phrase({self.phrase_string}, {self.label})"
+
+    def __getstate__(self):
+        # the skipgrams are pickled as plain tuples, the indexes are rebuilt from them when unpickling
+        skipgram_tuples = [(skipgram.string, skipgram.offset, skipgram.length) for skipgram in self.skipgrams]
+        if self.skipgrams_lower is self.skipgrams:
+            skipgram_tuples_lower = None
+        else:
+            skipgram_tuples_lower = [(skipgram.string, skipgram.offset, skipgram.length)
+                                     for skipgram in self.skipgrams_lower]
+        return {
+            "phrase": self.metadata,
+            "ngram_size": self.ngram_size,
+            "skip_size": self.skip_size,
+            "early_threshold": self.early_threshold,
+            "late_threshold": self.late_threshold,
+            "within_range_threshold": self.within_range_threshold,
+            "ignore_case": self.ignore_case,
+            "label": self.label,
+            "max_offset": self.max_offset,
+            "skipgrams": skipgram_tuples,
+            "skipgrams_lower": skipgram_tuples_lower
+        }
+
+    def __setstate__(self, state):
+        phrase = state["phrase"]
+        self.name = phrase["phrase"]
+        self.phrase_string = self.name if not state["ignore_case"] else self.name.lower()
+        self.exact_string = re.escape(self.phrase_string)
+        self.extact_word_boundary_string = re.compile(rf"\b{self.exact_string}\b")
+        self.label = None
+        self.max_offset = -1
+        self.max_end = -1
+        self.label_set = set()
+        self.label_list = []
+        self.properties = phrase
+        self.metadata = phrase
+        self.ngram_size = state["ngram_size"]
+        self.skip_size = state["skip_size"]
+        self.early_threshold = state["early_threshold"]
+        self.late_threshold = state["late_threshold"]
+        self.within_range_threshold = state["within_range_threshold"]
+        self.ignore_case = state["ignore_case"]
+        skipgrams = [SkipGram(*skipgram_tuple) for skipgram_tuple in state["skipgrams"]]
+        if state["skipgrams_lower"] is None:
+            skipgrams_lower = skipgrams
+        else:
+            skipgrams_lower = [SkipGram(*skipgram_tuple) for skipgram_tuple in state["skipgrams_lower"]]
+        self._set_skipgrams(skipgrams, skipgrams_lower)
+        self._set_words()
+        if state["label"] is not None:
+            self.set_label(state["label"])
+        if state["max_offset"] >= 0:
+            self.add_max_offset(state["max_offset"])
+
+    @property
+    def skipgram_distance(self) -> Dict[Tuple[SkipGram, SkipGram], int]:
+        """The minimum distance between pairs of skipgrams of the phrase that are within range."""
+        if self._skipgram_distance is None:
+            self._set_within_range()
+        return self._skipgram_distance
+
+    # internal methods
+
+    def _set_skipgrams(self, skipgrams: List[SkipGram], skipgrams_lower: List[SkipGram]) -> None:
+        """Set the skipgrams of the phrase and derive the skipgram indexes and distances from them."""
+        self.skipgrams = skipgrams
+        self.skipgram_set = set([skipgram.string for skipgram in self.skipgrams])
         self.skipgram_index: Dict[str, List[SkipGram]] = defaultdict(list)
         self.skipgram_index_lower: Dict[str, List[SkipGram]] = defaultdict(list)
         self.skipgram_freq = Counter([skipgram.string for skipgram in self.skipgrams])
         self.early_skipgram_index = {skipgram.string: skipgram for skipgram in
-                                     self.skipgrams if skipgram.offset < early_threshold}
+                                     self.skipgrams if skipgram.offset < self.early_threshold}
         self.late_skipgram_index = {skipgram.string: skipgram for skipgram in
                                     self.skipgrams if skipgram.offset > self.late_threshold}
-        # add lowercase version to allow both matching with and without ignore_case
-        self.skipgrams_lower = [skipgram for skipgram in text2skipgrams(self.phrase_string.lower(),
-                                                                        ngram_size=ngram_size, skip_size=skip_size)]
+        self.skipgrams_lower = skipgrams_lower
         self.early_skipgram_index_lower = {skipgram: skipgram for skipgram in self.skipgrams_lower
-                                           if skipgram.offset < early_threshold}
+                                           if skipgram.offset < self.early_threshold}
         self.late_skipgram_index_lower = {skipgram.string: skipgram for skipgram in self.skipgrams_lower
                                           if skipgram.offset > self.late_threshold}
         self.skipgram_freq_lower = Counter([skipgram.string for skipgram in self.skipgrams_lower])
         self.num_skipgrams = len(self.skipgrams)
-        self.skipgram_distance = {}
-        self.metadata: dict = phrase
+        self._index_skipgrams()
+        # the distances between skipgrams are only computed when they are first needed, or when the
+        # searcher that indexes the phrase is frozen
+        self._skipgram_distance: Union[None, Dict[Tuple[SkipGram, SkipGram], int]] = None
+
+    def _set_words(self) -> None:
+        """Split the phrase string into words."""
         self.words: List[str] = [word for word in re.split(r"\W+", self.phrase_string) if word != ""]
         self.word_set: Set[str] = set(self.words)
         self.first_word = None if len(self.words) == 0 else self.words[0]
         self.last_word = None if len(self.words) == 0 else self.words[-1]
         self.num_words = len(self.words)
-        if "label" in phrase:
-            self.set_label(phrase["label"])
-        if len(phrase.keys()) > 1:
-            self.add_metadata(phrase)
-        self._index_skipgrams()
-        self._set_within_range()
-
-    def __repr__(self):
-        return f"Phrase({self.phrase_string}, {self.label})"
-
-    # internal methods
 
     def _index_skipgrams(self) -> None:
         """Turn the phrase into a list of skipgrams and index them with their offset(s) as values."""
         for skipgram in self.skipgrams:
-            self.skipgram_index[skipgram.string] += [skipgram]
+            self.skipgram_index[skipgram.string].append(skipgram)
         for skipgram in self.skipgrams_lower:
-            self.skipgram_index_lower[skipgram.string] += [skipgram]
+            self.skipgram_index_lower[skipgram.string].append(skipgram)
 
     def _set_within_range(self):
-        self.skipgram_distance = {}
-        for index1 in range(0, len(self.skipgrams)-1):
-            skipgram1 = self.skipgrams[index1]
+        # skipgrams are ordered by offset, so the inner loop stops at the first skipgram out of range,
+        # and each pair of skipgrams is visited only once
+        skipgram_distance = {}
+        for index1, skipgram1 in enumerate(self.skipgrams):
             for index2 in range(index1+1, len(self.skipgrams)):
                 skipgram2 = self.skipgrams[index2]
-                if skipgram2.offset - skipgram1.offset > self.within_range_threshold:
-                    continue
-                if (skipgram1, skipgram2) not in self.skipgram_distance:
-                    self.skipgram_distance[(skipgram1, skipgram2)] = skipgram2.offset - skipgram1.offset
-                elif self.skipgram_distance[(skipgram1, skipgram2)] > skipgram2.offset - skipgram1.offset:
-                    self.skipgram_distance[(skipgram1, skipgram2)] = skipgram2.offset - skipgram1.offset
+                distance = skipgram2.offset - skipgram1.offset
+                if distance > self.within_range_threshold:
+                    break
+                skipgram_distance[(skipgram1, skipgram2)] = distance
+        self._skipgram_distance = skipgram_distance
 
     # external methods
 
@@ -199,3 +272,62 @@ class Phrase(object):
         :return: A boolean whether skipgram appears early in the phrase
         :rtype: bool"""
         return skipgram in self.early_skipgram_index
+
+    def get_skipgram_strings(self, ignorecase: bool = False) -> Tuple[Set[str], Set[str], Set[str]]:
+        """Return the skipgram strings under which the phrase is indexed in the full, early and late
+        skipgram indexes of a searcher.
+
+        :param ignorecase: whether to use the lowercased skipgrams of the phrase
+        :type ignorecase: bool
+        :return: the sets of skipgram strings for the full, early and late skipgram indexes
+        :rtype: Tuple[Set[str], Set[str], Set[str]]
+        """
+        if ignorecase:
+            return ({skipgram.string for skipgram in self.skipgrams_lower}, set(self.early_skipgram_index_lower),
+                    set(self.late_skipgram_index_lower))
+        else:
+            return ({skipgram.string for skipgram in self.skipgrams}, set(self.early_skipgram_index),
+                    set(self.late_skipgram_index))
+
+
+class PhraseStub(Phrase):
+
+    def __init__(self, phrase: Union[str, Dict[str, str]], ngram_size: int = 2, skip_size: int = 2,
+                 ignore_case: bool = False):
+        """A lightweight phrase that only holds the phrase string, label and metadata, for rehydrating
+        stored matches. No skipgrams are generated, so a stub cannot be used for searching or indexing.
+
+        :param phrase: the phrase string or a phrase dictionary with a 'phrase' property
+        :type phrase: Union[str, Dict[str, str]]
+        :param ngram_size: the ngram size of the phrase model that the phrase belongs to
+        :type ngram_size: int
+        :param skip_size: the skip size of the phrase model that the phrase belongs to
+        :type skip_size: int
+        :param ignore_case: whether the phrase string is lowercased
+        :type ignore_case: bool
+        """
+        if isinstance(phrase, str):
+            phrase = {"phrase": phrase}
+        self.name = phrase["phrase"]
+        self.phrase_string = self.name if not ignore_case else self.name.lower()
+        self.label = None
+        self.max_offset: int = -1
+        self.max_end: int = -1
+        self.label_set: Set[str] = set()
+        self.label_list: List[str] = []
+        self.properties = phrase
+        self.metadata: dict = phrase
+        self.ngram_size = ngram_size
+        self.skip_size = skip_size
+        self.ignore_case = ignore_case
+        if "label" in phrase:
+            self.set_label(phrase["label"])
+
+    def __repr__(self):
+        return f"PhraseStub({self.phrase_string}, {self.label})"
+
+    def __getstate__(self):
+        return self.__dict__
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
@@ -0,0 +1,283 @@
+from typing import Dict, Generator, Iterable, List, Set, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor
+import copyreg
+import functools
+import itertools
+import json
+import os
+import pickle
+import threading
+
+from fuzzy_search.fuzzy_phrase import Phrase
+from fuzzy_search.fuzzy_phrase_model import PhraseModel, is_phrase_dict
+
+
+# the attributes of a compiled phrase that are sent back to the main process as they are, because
+# registering the phrase with a phrase model or a searcher needs them
+eager_phrase_attributes = ("name", "phrase_string", "label", "label_set", "label_list", "max_offset",
+                           "max_end", "properties", "metadata", "ngram_size", "skip_size", "ignore_case")
+
+# loaded phrases are shared between threads like any other phrase, so their state is expanded under a lock
+compiled_phrase_lock = threading.Lock()
+
+
+class CompiledPhrase(Phrase):
+
+    def __init__(self, eager_state: Dict[str, any], compiled_state: bytes,
+                 skipgram_strings: Dict[bool, Tuple[Set[str], Set[str], Set[str]]]):
+        """A phrase that was compiled in a worker process. Only the attributes that are needed to
+        register the phrase with a phrase model and to index it in a searcher are set up front. The
+        skipgram objects and indexes are unpickled from the compiled state when one of them is first
+        used, e.g. when the phrase is a candidate match. Once expanded, it behaves exactly like the
+        phrase it was compiled as.
+
+        :param eager_state: the attributes that are set up front, see eager_phrase_attributes
+        :type eager_state: Dict[str, any]
+        :param compiled_state: the pickled phrase
+        :type compiled_state: bytes
+        :param skipgram_strings: the skipgram strings under which the phrase is indexed, with and
+            without ignoring case
+        :type skipgram_strings: Dict[bool, Tuple[Set[str], Set[str], Set[str]]]
+        """
+        self.__dict__.update(eager_state)
+        # the searcher checks the skipgram overlap of every phrase that shares a skipgram with a text,
+        # which shouldn't expand the phrase
+        self.skipgram_set = skipgram_strings[False][0]
+        self._skipgram_strings = skipgram_strings
+        self._compiled_state = compiled_state
+
+    def __getattr__(self, name: str):
+        # only called for attributes that are not set, i.e. before the phrase state is expanded or while
+        # another thread is expanding it
+        if name.startswith("__"):
+            raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{name}'")
+        if "_compiled_state" in self.__dict__:
+            with compiled_phrase_lock:
+                # another thread may have expanded the state while this one waited for the lock
+                if "_compiled_state" in self.__dict__:
+                    phrase = pickle.loads(self._compiled_state)
+                    # attributes that were changed after loading, e.g. a max_offset, are kept
+                    for attribute, value in phrase.__dict__.items():
+                        self.__dict__.setdefault(attribute, value)
+                    # the compiled state is removed only after the complete state is expanded
+                    del self.__dict__["_skipgram_strings"]
+                    del self.__dict__["_compiled_state"]
+        return object.__getattribute__(self, name)
+
+    def __reduce_ex__(self, protocol):
+        # pickled as a regular phrase, e.g. when a loaded phrase model is sent to a worker process
+        return copyreg._reconstructor, (Phrase, object, None), self.__getstate__()
+
+    def get_skipgram_strings(self, ignorecase: bool = False) -> Tuple[Set[str], Set[str], Set[str]]:
+        skipgram_strings = self.__dict__.get("_skipgram_strings")
+        if skipgram_strings is None:
+            return super().get_skipgram_strings(ignorecase=ignorecase)
+        return skipgram_strings[ignorecase]
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("pyarrow is required for reading phrases from Parquet, "
+                          "install it with 'pip install pyarrow'")
+    return pyarrow
+
+
+def get_phrase_file_format(file_path: str) -> str:
+    """Determine the format of a phrase file based on its extension. Files ending in .parquet are read
+    as Parquet, files ending in .json as a JSON list and all other files as JSON lines.
+
+    :param file_path: the path of a phrase file
+    :type file_path: str
+    :return: the file format, either 'parquet', 'json' or 'jsonl'
+    :rtype: str
+    """
+    _, extension = os.path.splitext(file_path)
+    if extension.lower() in {".parquet", ".pq"}:
+        return "parquet"
+    return "json" if extension.lower() == ".json" else "jsonl"
+
+
+def read_phrase_entries(file_path: str, batch_size: int = 10000) -> Generator[Union[str, Dict[str, any]], None, None]:
+    """Stream the phrase entries of a phrase file. A JSON lines file has a phrase string or phrase dictionary
+    per line, a JSON file has a list of them, and a Parquet file has a row per phrase with at least a
+    'phrase' column. Empty values in Parquet rows are left out of the phrase dictionaries. Reading Parquet
+    requires pyarrow.
+
+    :param file_path: the path of a phrase file
+    :type file_path: str
+    :param batch_size: the number of rows per batch for reading Parquet files
+    :type batch_size: int
+    :return: a generator of phrase entries
+    :rtype: Generator[Union[str, Dict[str, any]], None, None]
+    """
+    file_format = get_phrase_file_format(file_path)
+    if file_format == "parquet":
+        import_pyarrow()
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(file_path)
+        for batch in parquet_file.iter_batches(batch_size=batch_size):
+            for row in batch.to_pylist():
+                yield {key: value for key, value in row.items() if value is not None}
+    elif file_format == "json":
+        with open(file_path, "rt", encoding="utf-8") as fh:
+            for entry in json.load(fh):
+                yield entry
+    else:
+        with open(file_path, "rt", encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip() != "":
+                    yield json.loads(line)
+
+
+def compile_phrase_entry(entry: Union[str, Dict[str, any]], ngram_size: int = 2,
+                         skip_size: int = 2) -> Tuple[Phrase, List[Phrase], List[Phrase]]:
+    """Compile a phrase entry into the phrase objects of its main phrase, variants and distractors.
+
+    :param entry: a phrase string or phrase dictionary
+    :type entry: Union[str, Dict[str, any]]
+    :param ngram_size: the ngram size of the phrase model
+    :type ngram_size: int
+    :param skip_size: the skip size of the phrase model
+    :type skip_size: int
+    :return: a tuple of the main phrase, the variant phrases and the distractor phrases
+    :rtype: Tuple[Phrase, List[Phrase], List[Phrase]]
+    """
+    if isinstance(entry, str):
+        return Phrase(entry, ngram_size=ngram_size, skip_size=skip_size), [], []
+    if not is_phrase_dict(entry):
+        raise KeyError("invalid phrase dictionary")
+    main_phrase = Phrase(entry, ngram_size=ngram_size, skip_size=skip_size)
+    variant_phrases = [Phrase(variant, ngram_size=ngram_size, skip_size=skip_size)
+                       for variant in entry.get("variants", [])]
+    distractor_phrases = [Phrase(distractor, ngram_size=ngram_size, skip_size=skip_size)
+                          for distractor in entry.get("distractors", [])]
+    return main_phrase, variant_phrases, distractor_phrases
+
+
+def pack_phrase(phrase: Phrase) -> Tuple[Dict[str, any], bytes, Dict[bool, Tuple[Set[str], Set[str], Set[str]]]]:
+    """Pack a phrase that is compiled in a worker process into the arguments of a CompiledPhrase.
+
+    :param phrase: a compiled phrase
+    :type phrase: Phrase
+    :return: the eager attributes, the pickled phrase and the skipgram strings of the phrase
+    :rtype: Tuple[Dict[str, any], bytes, Dict[bool, Tuple[Set[str], Set[str], Set[str]]]]
+    """
+    eager_state = {attribute: phrase.__dict__[attribute] for attribute in eager_phrase_attributes}
+    skipgram_strings = {ignorecase: phrase.get_skipgram_strings(ignorecase=ignorecase)
+                        for ignorecase in (False, True)}
+    return eager_state, pickle.dumps(phrase, protocol=pickle.HIGHEST_PROTOCOL), skipgram_strings
+
+
+def compile_phrase_entries(entries: List[Union[str, Dict[str, any]]], ngram_size: int = 2,
+                           skip_size: int = 2) -> List[tuple]:
+    """Compile a chunk of phrase entries in a worker process, see compile_phrase_entry. Each phrase is
+    returned packed, see pack_phrase.
+
+    :param entries: a list of phrase strings or phrase dictionaries
+    :type entries: List[Union[str, Dict[str, any]]]
+    :param ngram_size: the ngram size of the phrase model
+    :type ngram_size: int
+    :param skip_size: the skip size of the phrase model
+    :type skip_size: int
+    :return: a list of tuples of the packed main phrase, variant phrases and distractor phrases
+    :rtype: List[tuple]
+    """
+    packed_entries = []
+    for entry in entries:
+        main_phrase, variant_phrases, distractor_phrases = compile_phrase_entry(entry, ngram_size=ngram_size,
+                                                                                skip_size=skip_size)
+        packed_entries.append((pack_phrase(main_phrase), [pack_phrase(phrase) for phrase in variant_phrases],
+                               [pack_phrase(phrase) for phrase in distractor_phrases]))
+    return packed_entries
+
+
+def unpack_compiled_entry(packed_entry: tuple) -> Tuple[Phrase, List[Phrase], List[Phrase]]:
+    """Turn a phrase entry that is compiled in a worker process into compiled phrases.
+
+    :param packed_entry: a tuple of the packed main phrase, variant phrases and distractor phrases
+    :type packed_entry: tuple
+    :return: a tuple of the main phrase, the variant phrases and the distractor phrases
+    :rtype: Tuple[Phrase, List[Phrase], List[Phrase]]
+    """
+    packed_main, packed_variants, packed_distractors = packed_entry
+    return (CompiledPhrase(*packed_main), [CompiledPhrase(*packed) for packed in packed_variants],
+            [CompiledPhrase(*packed) for packed in packed_distractors])
+
+
+def add_compiled_entry(phrase_model: PhraseModel, entry: Union[str, Dict[str, any]], main_phrase: Phrase,
+                       variant_phrases: List[Phrase], distractor_phrases: List[Phrase]) -> None:
+    """Register a compiled phrase entry with a phrase model, in the same way as PhraseModel.add_model
+    registers a phrase entry, but without compiling any phrases again.
+
+    :param phrase_model: the phrase model to add the entry to
+    :type phrase_model: PhraseModel
+    :param entry: the phrase string or phrase dictionary of the entry
+    :type entry: Union[str, Dict[str, any]]
+    :param main_phrase: the main phrase of the entry
+    :type main_phrase: Phrase
+    :param variant_phrases: the variant phrases of the entry
+    :type variant_phrases: List[Phrase]
+    :param distractor_phrases: the distractor phrases of the entry
+    :type distractor_phrases: List[Phrase]
+    """
+    phrase_model.add_phrase(main_phrase)
+    for variant_phrase in variant_phrases:
+        phrase_model.add_variant(variant_phrase, main_phrase)
+    for distractor_phrase in distractor_phrases:
+        phrase_model.add_distractor(distractor_phrase, main_phrase)
+    if isinstance(entry, dict):
+        phrase_model.add_custom([entry])
+    phrase_model.add_labels([main_phrase])
+
+
+def load_phrase_model(phrases: Union[str, Iterable[Union[str, Dict[str, any]]]],
+                      config: Union[None, Dict[str, any]] = None,
+                      num_workers: Union[None, int] = None,
+                      batch_size: int = 10000, chunk_size: int = 500) -> PhraseModel:
+    """Build a phrase model from a large list of phrases. The phrase entries are streamed in batches and
+    the skipgram data of the phrases in each batch is compiled in parallel worker processes. The main
+    process registers the compiled phrases with the model without rebuilding them: each phrase is
+    adopted as a CompiledPhrase that only expands its skipgram objects and indexes when they are first
+    used, so the build time scales with the number of workers. The resulting model is the same as
+    PhraseModel(model=phrases, config=config).
+
+    :param phrases: the path of a JSON lines, JSON or Parquet phrase file, or an iterable of phrase entries
+    :type phrases: Union[str, Iterable[Union[str, Dict[str, any]]]]
+    :param config: an optional config with the ngram_size and skip_size of the phrase model
+    :type config: Union[None, Dict[str, any]]
+    :param num_workers: the number of worker processes (defaults to the number of processors, 0 to compile
+        in the main process)
+    :type num_workers: Union[None, int]
+    :param batch_size: the number of phrase entries that are read and compiled per batch
+    :type batch_size: int
+    :param chunk_size: the number of phrase entries per task that is sent to a worker process
+    :type chunk_size: int
+    :return: the phrase model
+    :rtype: PhraseModel
+    """
+    if batch_size < 1 or chunk_size < 1:
+        raise ValueError("batch_size and chunk_size must be positive integers")
+    phrase_model = PhraseModel(config=config)
+    entries = read_phrase_entries(phrases, batch_size=batch_size) if isinstance(phrases, str) else iter(phrases)
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    if num_workers == 0:
+        for entry in entries:
+            compiled_entry = compile_phrase_entry(entry, ngram_size=phrase_model.ngram_size,
+                                                  skip_size=phrase_model.skip_size)
+            add_compiled_entry(phrase_model, entry, *compiled_entry)
+        return phrase_model
+    compile_chunk = functools.partial(compile_phrase_entries, ngram_size=phrase_model.ngram_size,
+                                      skip_size=phrase_model.skip_size)
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        while True:
+            batch = list(itertools.islice(entries, batch_size))
+            if len(batch) == 0:
+                break
+            chunks = [batch[start:start + chunk_size] for start in range(0, len(batch), chunk_size)]
+            for chunk, packed_chunk in zip(chunks, executor.map(compile_chunk, chunks)):
+                for entry, packed_entry in zip(chunk, packed_chunk):
+                    add_compiled_entry(phrase_model, entry, *unpack_compiled_entry(packed_entry))
+    return phrase_model
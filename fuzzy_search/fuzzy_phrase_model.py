@@ -92,6 +92,27 @@ class PhraseModel:
     def __str__(self):
         return self.__repr__()
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # the length and word indexes are derived from the phrases, so they are rebuilt when unpickling
+        for index_name in ["phrase_length_index", "variant_length_index", "word_in_phrase", "first_word_in_phrase"]:
+            del state[index_name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.phrase_length_index = defaultdict(set)
+        self.variant_length_index = defaultdict(set)
+        self.word_in_phrase = defaultdict(set)
+        self.first_word_in_phrase = defaultdict(dict)
+        for phrase_string in self.phrase_index:
+            self.phrase_length_index[len(phrase_string)].add(phrase_string)
+        for variant_string in self.variant_index:
+            self.variant_length_index[len(variant_string)].add(variant_string)
+        for phrase_index in [self.phrase_index, self.variant_index, self.distractor_index]:
+            for phrase in phrase_index.values():
+                self.index_phrase_words(phrase)
+
     def add_model(self, model: List[Union[str, Dict[str, Union[str, list]]]]) -> None:
         """Add an entire model with list of phrase dictionaries.
 
@@ -116,9 +137,9 @@ class PhraseModel:
         for phrase in self.phrase_index:
             entry = {'phrase': self.phrase_index[phrase].metadata}
             if phrase in self.has_variants:
-                entry['variants'] = list(self.has_variants[phrase])
+                entry['variants'] = sorted(self.has_variants[phrase])
             if phrase in self.has_labels:
-                entry['label'] = list(self.has_labels[phrase])
+                entry['label'] = sorted(self.has_labels[phrase])
             model_json += [entry]
         return model_json
 
@@ -146,7 +167,7 @@ class PhraseModel:
             self.phrase_string_map[variant_phrase.phrase_string] = variant_phrase
         self.variant_index[variant_phrase.phrase_string] = variant_phrase
         self.is_variant_of[variant_phrase.phrase_string] = main_phrase.phrase_string
-        self.has_variants[main_phrase.phrase_string] = variant_phrase.phrase_string
+        self.has_variants[main_phrase.phrase_string].add(variant_phrase.phrase_string)
         self.phrase_type[variant_phrase.phrase_string].add("variant")
         self.variant_length_index[len(variant_phrase.phrase_string)].add(variant_phrase.phrase_string)
         self.index_phrase_words(variant_phrase)
@@ -176,31 +197,63 @@ class PhraseModel:
         # first check if phrase is registered in this phrase model
         if phrase.phrase_string not in self.phrase_index:
             raise ValueError(f"{phrase.phrase_string} is not registered as a main phrase")
+        # if the phrase has labels or custom properties, remove those first
+        if phrase.phrase_string in self.has_labels:
+            self.remove_labels([phrase.phrase_string])
+        if phrase.phrase_string in self.custom:
+            del self.custom[phrase.phrase_string]
         # remove phrase from the type index
         self.phrase_type[phrase.phrase_string].remove("phrase")
         # remove the phrase string from the main phrase index
         del self.phrase_index[phrase.phrase_string]
         # remove the phrase from the phrase length index
-        self.phrase_length_index[len(phrase.phrase_string)].remove(phrase.phrase_string)
+        self.remove_from_length_index(self.phrase_length_index, phrase)
         if len(self.phrase_type[phrase.phrase_string]) == 0:
             # if the phrase string is not registered as another type (variant or distractor)
             # remove the phrase words from the word_to_phrase index
             self.remove_phrase_words(phrase)
+            self.remove_phrase_type(phrase)
         # if the phrase has variants, remove those as well
         if phrase.phrase_string in self.has_variants:
-            for variant_string in self.has_variants:
+            for variant_string in list(self.has_variants[phrase.phrase_string]):
                 variant_phrase = self.variant_index[variant_string]
                 self.remove_variant(variant_phrase)
         # if the phrase has distractors, remove its connections with them as well
         if phrase.phrase_string in self.has_distractors:
-            for distractor_string in self.has_distractors:
+            for distractor_string in list(self.has_distractors[phrase.phrase_string]):
                 distractor_phrase = self.distractor_index[distractor_string]
                 if len(self.is_distractor_of[distractor_string]) > 1:
                     self.is_distractor_of[distractor_string].remove(phrase.phrase_string)
                 else:
                     # if the distractor is only connected to this phrase, remove the distractor as well
                     self.remove_distractor(distractor_phrase)
-            del self.has_distractors[phrase.phrase_string]
+            # removing the last distractor already removes the phrase from the has_distractors index
+            if phrase.phrase_string in self.has_distractors:
+                del self.has_distractors[phrase.phrase_string]
+
+    def remove_from_length_index(self, length_index: Dict[int, set], phrase: Phrase) -> None:
+        """Remove a phrase from a length index and remove the length if no phrases of that length remain.
+
+        :param length_index: the phrase or variant length index
+        :type length_index: Dict[int, set]
+        :param phrase: a phrase that is registered in the length index
+        :type phrase: Phrase
+        """
+        phrase_length = len(phrase.phrase_string)
+        length_index[phrase_length].remove(phrase.phrase_string)
+        if len(length_index[phrase_length]) == 0:
+            del length_index[phrase_length]
+
+    def remove_phrase_type(self, phrase: Phrase) -> None:
+        """Remove a phrase string that is no longer registered as any type from the type index and the
+        phrase string map.
+
+        :param phrase: a phrase that no longer has any registered type
+        :type phrase: Phrase
+        """
+        del self.phrase_type[phrase.phrase_string]
+        if phrase.phrase_string in self.phrase_string_map:
+            del self.phrase_string_map[phrase.phrase_string]
 
     def remove_variant(self, variant_phrase: Phrase) -> None:
         """Remove a variant phrase from the model, including its connection to the phrase it is a
@@ -217,10 +270,11 @@ class PhraseModel:
         # if that is the only type of the phrase, remove it from the word_to_phrase index
         if len(self.phrase_type[variant_phrase.phrase_string]) == 0:
             self.remove_phrase_words(variant_phrase)
+            self.remove_phrase_type(variant_phrase)
         # remove the variant from the variant index
         del self.variant_index[variant_phrase.phrase_string]
         # remove the variant from the phrase length index
-        self.variant_length_index[len(variant_phrase.phrase_string)].remove(variant_phrase.phrase_string)
+        self.remove_from_length_index(self.variant_length_index, variant_phrase)
         # remove its connection with its main phrase
         main_phrase_string = self.is_variant_of[variant_phrase.phrase_string]
         del self.is_variant_of[variant_phrase.phrase_string]
@@ -241,6 +295,7 @@ class PhraseModel:
         self.phrase_type[distractor_phrase.phrase_string].remove("distractor")
         if len(self.phrase_type[distractor_phrase.phrase_string]) == 0:
             self.remove_phrase_words(distractor_phrase)
+            self.remove_phrase_type(distractor_phrase)
         del self.distractor_index[distractor_phrase.phrase_string]
         for main_phrase_string in self.is_distractor_of[distractor_phrase.phrase_string]:
             self.has_distractors[main_phrase_string].remove(distractor_phrase.phrase_string)
@@ -359,13 +414,12 @@ class PhraseModel:
                 self.remove_variant(variant)
         if variants_of_phrase:
             main_phrase = as_phrase_object(variants_of_phrase, ngram_size=self.ngram_size, skip_size=self.skip_size)
-            if main_phrase not in self.phrase_index:
+            if main_phrase.phrase_string not in self.phrase_index:
                 raise IndexError(f"{main_phrase.phrase_string} is not registered in this phrase model")
-            if main_phrase not in self.has_variants:
+            if main_phrase.phrase_string not in self.has_variants:
                 return None
-            for variant_string in self.has_variants[main_phrase.phrase_string]:
-                variant = as_phrase_object(variant_string, ngram_size=self.ngram_size, skip_size=self.skip_size)
-                self.remove_variant(variant)
+            for variant_string in list(self.has_variants[main_phrase.phrase_string]):
+                self.remove_variant(self.variant_index[variant_string])
 
     def get_variants(self, phrases: List[str] = None) -> List[Dict[str, Union[str, List[str]]]]:
         """Return registered variants of a specific list of phrases or
@@ -447,13 +501,12 @@ class PhraseModel:
                 self.remove_distractor(distractor)
         if distractors_of_phrase:
             main_phrase = as_phrase_object(distractors_of_phrase, ngram_size=self.ngram_size, skip_size=self.skip_size)
-            if main_phrase not in self.phrase_index:
+            if main_phrase.phrase_string not in self.phrase_index:
                 raise IndexError(f"{main_phrase.phrase_string} is not registered in this phrase model")
-            if main_phrase not in self.has_distractors:
+            if main_phrase.phrase_string not in self.has_distractors:
                 return None
-            for distractor_string in self.has_distractors[main_phrase.phrase_string]:
-                distractor = as_phrase_object(distractor_string, ngram_size=self.ngram_size, skip_size=self.skip_size)
-                self.remove_distractor(distractor)
+            for distractor_string in list(self.has_distractors[main_phrase.phrase_string]):
+                self.remove_distractor(self.distractor_index[distractor_string])
 
     def add_labels(self, phrase_labels: List[Dict[str, Union[str, list]]]):
         """Add a label to a phrase. This can be used to group phrases under the same label.
@@ -612,3 +665,44 @@ class PhraseModel:
             self.word_in_phrase[word.group(0)].remove(phrase.phrase_string)
             if len(self.word_in_phrase[word.group(0)]) == 0:
                 del self.word_in_phrase[word.group(0)]
+
+
+def merge_phrase_models(phrase_models: List[PhraseModel], config: dict = None) -> PhraseModel:
+    """Merge a list of phrase models into a single phrase model. A phrase that occurs in more than
+    one model gets the union of its labels, variants and distractors in those models. For other
+    custom properties, the value of the first model that has the property is kept.
+
+    :param phrase_models: a list of phrase models
+    :type phrase_models: List[PhraseModel]
+    :param config: an optional config with the ngram_size and skip_size of the merged model
+    :type config: dict
+    :return: the merged phrase model
+    :rtype: PhraseModel
+    """
+    entries: Dict[str, Dict[str, any]] = {}
+    list_properties = ["label", "variants", "distractors"]
+    for phrase_model in phrase_models:
+        for phrase_string, phrase in phrase_model.phrase_index.items():
+            if phrase_string not in entries:
+                entries[phrase_string] = {"phrase": phrase_string, "label": set(), "variants": set(),
+                                          "distractors": set()}
+            entry = entries[phrase_string]
+            entry["label"].update(phrase.label_set)
+            entry["label"].update(phrase_model.has_labels.get(phrase_string, set()))
+            entry["variants"].update(phrase_model.has_variants.get(phrase_string, set()))
+            entry["distractors"].update(phrase_model.has_distractors.get(phrase_string, set()))
+            custom = phrase_model.custom[phrase_string] if phrase_string in phrase_model.custom else phrase.metadata
+            for custom_property in custom:
+                if custom_property not in list_properties and custom_property not in entry:
+                    entry[custom_property] = custom[custom_property]
+    model: List[Dict[str, any]] = []
+    for entry in entries.values():
+        for list_property in list_properties:
+            if len(entry[list_property]) == 0:
+                del entry[list_property]
+            elif list_property == "label" and len(entry["label"]) == 1:
+                entry["label"] = entry["label"].pop()
+            else:
+                entry[list_property] = sorted(entry[list_property])
+        model.append(entry)
+    return PhraseModel(model=model, config=config)
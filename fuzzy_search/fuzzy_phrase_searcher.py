@@ -1,11 +1,19 @@
-from typing import Dict, List, Set, Union
+from typing import Dict, Generator, Iterable, List, Sequence, Set, Tuple, Union
+from array import array
+import bisect
 import copy
+import heapq
 import string
 import re
+import time
 from collections import defaultdict
 
+from fuzzy_search.fuzzy_file import add_byte_offsets, get_file_format
+from fuzzy_search.fuzzy_file import read_text_file_chunks, read_jsonl_file_records
 from fuzzy_search.fuzzy_phrase_model import PhraseModel
-from fuzzy_search.fuzzy_match import PhraseMatch, Candidate, adjust_match_offsets
+from fuzzy_search.fuzzy_match import PhraseMatch, Candidate, ProximityMatch, adjust_match_offsets
+from fuzzy_search.fuzzy_match import MatchRow, make_exact_match_row, make_row_match, make_scored_match_row
+from fuzzy_search.fuzzy_match_table import PhraseMatchTable
 from fuzzy_search.fuzzy_phrase import Phrase
 from fuzzy_search.fuzzy_string import text2skipgrams, SkipGram, score_levenshtein_similarity_ratio
 
@@ -37,9 +45,208 @@ default_config = {
     # allow matches of partially overlapping phrase
     "allow_overlapping_matches": True,
     # the set of symbols to use as punctuation (for word boundaries)
-    "punctuation": string.punctuation
+    "punctuation": string.punctuation,
+    # the number of characters per window when searching very long texts in chunks
+    "chunk_size": 100000,
+    # per text budgets for the search time in seconds, the number of candidates and the number of
+    # Levenshtein computations, None means unlimited. A search that runs out of budget returns a truncated result
+    "time_budget": None,
+    "max_candidates": None,
+    "max_levenshtein": None
 }
 
+# returned when looking up a skipgram or word that is not indexed, so lookups never add keys to the indexes
+empty_postings = frozenset()
+
+
+skipgram_index_names = [
+    "skipgram_index", "early_skipgram_index", "late_skipgram_index",
+    "variant_skipgram_index", "variant_early_skipgram_index", "variant_late_skipgram_index",
+    "distractor_skipgram_index", "distractor_early_skipgram_index", "distractor_late_skipgram_index"
+]
+
+
+class FlatPostingsIndex:
+
+    def __init__(self, index: Dict[str, Iterable[Phrase]], phrase_list: List[Phrase],
+                 phrase_ids: Dict[Phrase, int]):
+        """A read-only skipgram index that keeps its postings in flat arrays of phrase numbers instead
+        of a set object per skipgram. Looking up a skipgram returns a tuple of the phrases. The only
+        Python objects per skipgram are the key string and its number, so the index consists of a few
+        large memory blocks that stay shared between forked worker processes.
+
+        :param index: a skipgram index, mapping skipgram strings to phrases
+        :type index: Dict[str, Iterable[Phrase]]
+        :param phrase_list: the list of phrases that the phrase numbers refer to, shared by all flat indexes
+        :type phrase_list: List[Phrase]
+        :param phrase_ids: the number of each phrase in the phrase list
+        :type phrase_ids: Dict[Phrase, int]
+        """
+        self.phrase_list = phrase_list
+        self.key_index: Dict[str, int] = {}
+        self.bounds = array("q", [0])
+        self.postings = array("q")
+        for skipgram_string in index:
+            self.key_index[skipgram_string] = len(self.key_index)
+            self.postings.extend(sorted(phrase_ids[phrase] for phrase in index[skipgram_string]))
+            self.bounds.append(len(self.postings))
+
+    @classmethod
+    def from_arrays(cls, keys: List[str], bounds: Sequence[int], postings: Sequence[int],
+                    phrase_list: List[Phrase]) -> "FlatPostingsIndex":
+        """Make a flat index from existing arrays, e.g. memoryviews of shared memory, without copying them.
+
+        :param keys: the skipgram strings, in the order of their bounds
+        :type keys: List[str]
+        :param bounds: the start of the postings of each skipgram, followed by the total number of postings
+        :type bounds: Sequence[int]
+        :param postings: the phrase numbers of the postings of all skipgrams
+        :type postings: Sequence[int]
+        :param phrase_list: the list of phrases that the phrase numbers refer to
+        :type phrase_list: List[Phrase]
+        :return: the flat index
+        :rtype: FlatPostingsIndex
+        """
+        index = cls.__new__(cls)
+        index.phrase_list = phrase_list
+        index.key_index = dict(zip(keys, range(len(keys))))
+        index.bounds = bounds
+        index.postings = postings
+        return index
+
+    def __len__(self):
+        return len(self.key_index)
+
+    def __iter__(self):
+        return iter(self.key_index)
+
+    def __contains__(self, skipgram_string: str):
+        return skipgram_string in self.key_index
+
+    def __getitem__(self, skipgram_string: str) -> Tuple[Phrase, ...]:
+        key_id = self.key_index[skipgram_string]
+        phrase_list = self.phrase_list
+        return tuple(phrase_list[phrase_id] for phrase_id in
+                     self.postings[self.bounds[key_id]:self.bounds[key_id + 1]])
+
+    def get(self, skipgram_string: str, default: any = None) -> Union[any, Tuple[Phrase, ...]]:
+        """Return the phrases that contain a skipgram, or a default value if the skipgram is not indexed.
+
+        :param skipgram_string: a skipgram string
+        :type skipgram_string: str
+        :param default: the value to return for skipgrams that are not indexed
+        :type default: any
+        :return: a tuple of the phrases that contain the skipgram
+        :rtype: Union[any, Tuple[Phrase, ...]]
+        """
+        if skipgram_string not in self.key_index:
+            return default
+        return self[skipgram_string]
+
+    def keys(self):
+        return self.key_index.keys()
+
+
+class SearchContext:
+
+    def __init__(self, text: Dict[str, any], use_word_boundaries: bool = True,
+                 allow_overlapping_matches: bool = True, include_variants: bool = False,
+                 filter_distractors: bool = False, skip_exact_matching: bool = False,
+                 time_budget: Union[None, float] = None, max_candidates: Union[None, int] = None,
+                 max_levenshtein: Union[None, int] = None, phrase_filter: Union[None, Set[str]] = None):
+        """The state of a single search call. Keeping this state out of the searcher makes it safe to
+        call a single searcher from multiple threads. The context also keeps track of the search budgets.
+        When a budget runs out, the search stops and only returns the matches that are confirmed so far.
+
+        :param text: the text dictionary to search in
+        :type text: Dict[str, any]
+        :param use_word_boundaries: use word boundaries in determining match boundaries
+        :type use_word_boundaries: bool
+        :param allow_overlapping_matches: boolean flag for whether to allow matches to overlap in their text ranges
+        :type allow_overlapping_matches: bool
+        :param include_variants: boolean flag for whether to include phrase variants for finding matches
+        :type include_variants: bool
+        :param filter_distractors: boolean flag for whether to remove phrase matches that better match distractors
+        :type filter_distractors: bool
+        :param skip_exact_matching: boolean flag whether to skip the exact matching step
+        :type skip_exact_matching: bool
+        :param time_budget: the maximum number of seconds for the search
+        :type time_budget: Union[None, float]
+        :param max_candidates: the maximum number of candidate matches to generate
+        :type max_candidates: Union[None, int]
+        :param max_levenshtein: the maximum number of Levenshtein distance computations
+        :type max_levenshtein: Union[None, int]
+        :param phrase_filter: an optional set of phrase and variant strings to restrict the search to
+        :type phrase_filter: Union[None, Set[str]]
+        """
+        self.text = text
+        self.use_word_boundaries = use_word_boundaries
+        self.allow_overlapping_matches = allow_overlapping_matches
+        self.include_variants = include_variants
+        self.filter_distractors = filter_distractors
+        self.skip_exact_matching = skip_exact_matching
+        self.exact_matches: List[Union[PhraseMatch, MatchRow]] = []
+        self.known_word_offset: Dict[int, Dict[str, any]] = {}
+        self.exact_match_ranges: Dict[str, Tuple[List[int], List[int]]] = {}
+        self.deadline = None if time_budget is None else time.perf_counter() + time_budget
+        self.max_candidates = max_candidates
+        self.max_levenshtein = max_levenshtein
+        self.num_candidates = 0
+        self.num_levenshtein = 0
+        self.truncated = False
+        self.phrase_filter = phrase_filter
+
+    def __repr__(self):
+        return f"SearchContext(text_id: {self.text['id']}, num_exact_matches: {len(self.exact_matches)}, " \
+               f"truncated: {self.truncated})"
+
+    def has_time_left(self) -> bool:
+        """Check if the time budget has not run out. If it has, the search is marked as truncated.
+
+        :return: a boolean whether there is time left
+        :rtype: bool
+        """
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            self.truncated = True
+        return not self.truncated
+
+    def has_candidate_budget(self) -> bool:
+        """Check if more candidates can be generated within the candidate and time budgets.
+
+        :return: a boolean whether more candidates can be generated
+        :rtype: bool
+        """
+        if self.max_candidates is not None and self.num_candidates >= self.max_candidates:
+            self.truncated = True
+        return self.has_time_left()
+
+    def has_levenshtein_budget(self, num_computations: int = 1) -> bool:
+        """Check if a number of Levenshtein distance computations fits in the Levenshtein and time budgets.
+
+        :param num_computations: the number of computations that are needed
+        :type num_computations: int
+        :return: a boolean whether the computations fit in the budgets
+        :rtype: bool
+        """
+        if self.max_levenshtein is not None and self.num_levenshtein + num_computations > self.max_levenshtein:
+            self.truncated = True
+        return self.has_time_left()
+
+
+class SearchResult(list):
+
+    def __init__(self, matches: Iterable[PhraseMatch] = (), truncated: bool = False):
+        """A list of phrase matches with a flag whether the search was stopped early because one of
+        its budgets ran out. A truncated result contains only the matches that were confirmed before that.
+
+        :param matches: the phrase matches
+        :type matches: Iterable[PhraseMatch]
+        :param truncated: whether the search was stopped early
+        :type truncated: bool
+        """
+        super().__init__(matches)
+        self.truncated = truncated
+
 
 class SkipMatches:
 
@@ -67,6 +274,72 @@ class SkipMatches:
         self.match_skipgrams[phrase].append(skipgram)
         self.phrases.add(phrase)
 
+    def restrict(self, start: int, end: int) -> "SkipMatches":
+        """Return the skipgram matches that lie within a window of the text. The skipgram matches of
+        each phrase are in text order, so the window is found by binary search.
+
+        :param start: the start offset of the window
+        :type start: int
+        :param end: the end offset of the window
+        :type end: int
+        :return: a new SkipMatches object with only the skipgram matches in the window
+        :rtype: SkipMatches
+        """
+        restricted = SkipMatches(self.ngram_size, self.skip_size)
+        for phrase in self.phrases:
+            offsets = self.match_offsets[phrase]
+            first_index = bisect.bisect_left(offsets, start)
+            last_index = bisect.bisect_left(offsets, end, first_index)
+            for skipgram in self.match_skipgrams[phrase][first_index:last_index]:
+                if skipgram.offset + skipgram.length <= end:
+                    restricted.add_skip_match(skipgram, phrase)
+        return restricted
+
+
+class IndexedText:
+
+    def __init__(self, text: Dict[str, any], skip_matches: SkipMatches, exact_matches: List[PhraseMatch],
+                 use_word_boundaries: bool = True, include_variants: bool = False):
+        """A text with its skipgram matches and exact matches cached, so that windows of the text can be
+        searched without generating skipgrams and running the exact pass again. Match offsets are
+        always in the coordinates of the whole text.
+
+        :param text: the text dictionary with 'text' and 'id' properties
+        :type text: Dict[str, any]
+        :param skip_matches: the skipgram matches between the whole text and the phrases
+        :type skip_matches: SkipMatches
+        :param exact_matches: the exact matches in the whole text
+        :type exact_matches: List[PhraseMatch]
+        :param use_word_boundaries: whether match boundaries are adjusted to word boundaries
+        :type use_word_boundaries: bool
+        :param include_variants: whether phrase variants are included in the skipgram matches
+        :type include_variants: bool
+        """
+        self.text = text
+        self.skip_matches = skip_matches
+        self.exact_matches = sorted(exact_matches, key=lambda x: x.offset)
+        self.exact_match_offsets = [match.offset for match in self.exact_matches]
+        self.use_word_boundaries = use_word_boundaries
+        self.include_variants = include_variants
+
+    def __repr__(self):
+        return f"IndexedText(text_id: {self.text['id']}, num_phrases: {len(self.skip_matches.phrases)}, " \
+               f"num_exact_matches: {len(self.exact_matches)})"
+
+    def get_exact_matches(self, start: int, end: int) -> List[PhraseMatch]:
+        """Return copies of the exact matches that lie within a window of the text.
+
+        :param start: the start offset of the window
+        :type start: int
+        :param end: the end offset of the window
+        :type end: int
+        :return: the exact matches in the window, sorted by offset
+        :rtype: List[PhraseMatch]
+        """
+        first_index = bisect.bisect_left(self.exact_match_offsets, start)
+        last_index = bisect.bisect_left(self.exact_match_offsets, end)
+        return [copy.copy(match) for match in self.exact_matches[first_index:last_index] if match.end <= end]
+
 
 def get_skipset_overlap(phrase: Phrase, skip_matches: SkipMatches) -> float:
     """Calculate the overlap between the set of skipgrams of a text and the skipgrams of a phrase.
@@ -193,7 +466,8 @@ def get_skipmatch_phrase_candidates(text: Dict[str, any], phrase: Phrase, skip_m
 
 def get_skipmatch_candidates(text: Dict[str, any], skip_matches: SkipMatches,
                              skipgram_threshold: float, phrase_model: PhraseModel,
-                             max_length_variance: int = 1) -> List[Candidate]:
+                             max_length_variance: int = 1,
+                             search_context: Union[None, SearchContext] = None) -> List[Candidate]:
     """Find all candidate matches for the phrases in a SkipMatches object.
 
     :param text: the text object to match with phrases
@@ -206,12 +480,16 @@ def get_skipmatch_candidates(text: Dict[str, any], skip_matches: SkipMatches,
     :type phrase_model: PhraseModel
     :param max_length_variance: the maximum difference in length between candidate and phrase
     :type max_length_variance: int
+    :param search_context: an optional search context with budgets for the number of candidates
+    :type search_context: Union[None, SearchContext]
     :return: a list of candidate matches
     :rtype: List[Candidate]
     """
     phrase_candidates = defaultdict(list)
     candidates: List[Candidate] = []
     for phrase in skip_matches.phrases:
+        if search_context is not None and not search_context.has_candidate_budget():
+            break
         # print("get_skipmatch_candidates - phrase:", phrase.phrase_string)
         if get_skipset_overlap(phrase, skip_matches) < skipgram_threshold:
             continue
@@ -219,10 +497,19 @@ def get_skipmatch_candidates(text: Dict[str, any], skip_matches: SkipMatches,
             match_phrase = phrase_model.is_variant_of[phrase.phrase_string]
         else:
             match_phrase = phrase.phrase_string
-        phrase_candidates[match_phrase] += get_skipmatch_phrase_candidates(text, phrase, skip_matches,
-                                                                           skipgram_threshold,
-                                                                           max_length_variance=max_length_variance)
+        new_candidates = get_skipmatch_phrase_candidates(text, phrase, skip_matches, skipgram_threshold,
+                                                         max_length_variance=max_length_variance)
+        if search_context is not None:
+            if search_context.max_candidates is not None:
+                new_candidates = new_candidates[:search_context.max_candidates - search_context.num_candidates]
+            search_context.num_candidates += len(new_candidates)
+        phrase_candidates[match_phrase] += new_candidates
     for phrase_string in phrase_candidates:
+        # selecting the best of overlapping candidates scores each candidate by Levenshtein similarity
+        if search_context is not None:
+            if not search_context.has_levenshtein_budget(len(phrase_candidates[phrase_string])):
+                break
+            search_context.num_levenshtein += len(phrase_candidates[phrase_string])
         # print("phrase_candidates:", len(phrase_candidates[phrase_string]))
         filtered_candidates = filter_overlapping_phrase_candidates(phrase_candidates[phrase_string])
         # print(phrase_candidates)
@@ -235,7 +522,8 @@ def get_skipmatch_candidates(text: Dict[str, any], skip_matches: SkipMatches,
 
 def get_text_dict(text: Union[str, dict], ignorecase: bool = False) -> dict:
     """Check that text is in a dictionary with an id property, so that passing a long text
-    goes by reference instead of copying the long text string.
+    goes by reference instead of copying the long text string. A text dictionary that needs
+    changes is copied, so the dictionary of the caller is never modified.
 
     :param text: a text string or text dictionary
     :type text: Union[str, dict]
@@ -246,6 +534,8 @@ def get_text_dict(text: Union[str, dict], ignorecase: bool = False) -> dict:
     """
     if isinstance(text, str):
         text = {"text": text, "id": None}
+    elif ignorecase or "id" not in text:
+        text = copy.copy(text)
     if ignorecase:
         text["text"] = text["text"].lower()
     if "id" not in text:
@@ -253,19 +543,325 @@ def get_text_dict(text: Union[str, dict], ignorecase: bool = False) -> dict:
     return text
 
 
-def candidates_to_matches(candidates: List[Candidate], text: dict, phrase_model: PhraseModel) -> List[PhraseMatch]:
-    matches: List[PhraseMatch] = []
+def get_text_chunks(text_string: str, chunk_size: int,
+                    chunk_overlap: int) -> Generator[Tuple[int, str], None, None]:
+    """Split a text string into windows of chunk_size characters plus an overlap with the next window.
+    Each window starts chunk_size characters after the start of the previous window.
+
+    :param text_string: the text string to split into windows
+    :type text_string: str
+    :param chunk_size: the number of characters between the starts of consecutive windows
+    :type chunk_size: int
+    :param chunk_overlap: the number of characters that a window extends into the next window
+    :type chunk_overlap: int
+    :return: a generator of tuples of the window start offset and the window string
+    :rtype: Generator[Tuple[int, str], None, None]
+    """
+    if not isinstance(chunk_size, int) or chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer")
+    if not isinstance(chunk_overlap, int) or chunk_overlap < 0:
+        raise ValueError("chunk_overlap must be zero or a positive integer")
+    for chunk_start in range(0, max(len(text_string), 1), chunk_size):
+        yield chunk_start, text_string[chunk_start:chunk_start + chunk_size + chunk_overlap]
+
+
+def shift_match_offsets(match: PhraseMatch, shift: int) -> PhraseMatch:
+    """Shift the offsets of a match found in a window of a text to offsets in the text as a whole.
+
+    :param match: a phrase match found in a window of a text
+    :type match: PhraseMatch
+    :param shift: the offset of the window in the text
+    :type shift: int
+    :return: the phrase match with shifted offsets
+    :rtype: PhraseMatch
+    """
+    match.offset += shift
+    match.end += shift
+    return match
+
+
+def get_phrase_skipgram_strings(phrase: Phrase, ignorecase: bool = False) -> Tuple[Set[str], Set[str], Set[str]]:
+    """Return the skipgram strings under which a phrase is indexed in the full, early and late skipgram indexes.
+
+    :param phrase: a phrase object
+    :type phrase: Phrase
+    :param ignorecase: whether to use the lowercased skipgrams of the phrase
+    :type ignorecase: bool
+    :return: the sets of skipgram strings for the full, early and late skipgram indexes
+    :rtype: Tuple[Set[str], Set[str], Set[str]]
+    """
+    return phrase.get_skipgram_strings(ignorecase=ignorecase)
+
+
+def index_phrase_skipgrams(phrase: Phrase, skipgram_index: Dict[str, Set[Phrase]],
+                           early_skipgram_index: Dict[str, Set[Phrase]], late_skipgram_index: Dict[str, Set[Phrase]],
+                           ignorecase: bool = False) -> None:
+    """Add a phrase to the postings of its skipgrams in the full, early and late skipgram indexes.
+
+    :param phrase: a phrase object
+    :type phrase: Phrase
+    :param skipgram_index: the index of all skipgrams
+    :type skipgram_index: Dict[str, Set[Phrase]]
+    :param early_skipgram_index: the index of skipgrams at the start of phrases
+    :type early_skipgram_index: Dict[str, Set[Phrase]]
+    :param late_skipgram_index: the index of skipgrams at the end of phrases
+    :type late_skipgram_index: Dict[str, Set[Phrase]]
+    :param ignorecase: whether to use the lowercased skipgrams of the phrase
+    :type ignorecase: bool
+    """
+    skipgram_strings = get_phrase_skipgram_strings(phrase, ignorecase=ignorecase)
+    for index, index_strings in zip((skipgram_index, early_skipgram_index, late_skipgram_index), skipgram_strings):
+        for skipgram_string in index_strings:
+            index[skipgram_string].add(phrase)
+
+
+def unindex_phrase_skipgrams(phrase: Phrase, skipgram_index: Dict[str, Set[Phrase]],
+                             early_skipgram_index: Dict[str, Set[Phrase]], late_skipgram_index: Dict[str, Set[Phrase]],
+                             ignorecase: bool = False) -> None:
+    """Remove a phrase from the postings of its skipgrams in the full, early and late skipgram indexes.
+    Skipgrams without any remaining phrases are removed from the index.
+
+    :param phrase: a phrase object
+    :type phrase: Phrase
+    :param skipgram_index: the index of all skipgrams
+    :type skipgram_index: Dict[str, Set[Phrase]]
+    :param early_skipgram_index: the index of skipgrams at the start of phrases
+    :type early_skipgram_index: Dict[str, Set[Phrase]]
+    :param late_skipgram_index: the index of skipgrams at the end of phrases
+    :type late_skipgram_index: Dict[str, Set[Phrase]]
+    :param ignorecase: whether to use the lowercased skipgrams of the phrase
+    :type ignorecase: bool
+    """
+    skipgram_strings = get_phrase_skipgram_strings(phrase, ignorecase=ignorecase)
+    for index, index_strings in zip((skipgram_index, early_skipgram_index, late_skipgram_index), skipgram_strings):
+        for skipgram_string in index_strings:
+            if skipgram_string not in index:
+                continue
+            index[skipgram_string].discard(phrase)
+            if len(index[skipgram_string]) == 0:
+                del index[skipgram_string]
+
+
+def get_phrase_entry_strings(phrase: Union[str, Dict[str, Union[str, List[str]]], Phrase],
+                             entry_property: Union[None, str] = None) -> List[str]:
+    """Return the phrase string of a phrase entry, or the strings of one of its list properties such as
+    'variants' or 'distractors'.
+
+    :param phrase: a phrase as string, phrase dictionary or Phrase object
+    :type phrase: Union[str, Dict[str, Union[str, List[str]]], Phrase]
+    :param entry_property: an optional list property of the phrase entry
+    :type entry_property: Union[None, str]
+    :return: a list of phrase strings
+    :rtype: List[str]
+    """
+    if isinstance(phrase, Phrase):
+        metadata = phrase.metadata
+    elif isinstance(phrase, dict):
+        metadata = phrase
+    else:
+        metadata = {"phrase": phrase}
+    if entry_property is None:
+        return [metadata["phrase"]]
+    return list(metadata[entry_property]) if entry_property in metadata else []
+
+
+def candidates_to_matches(candidates: List[Candidate], text: dict, phrase_model: PhraseModel,
+                          search_context: Union[None, SearchContext] = None) -> List[PhraseMatch]:
+    return [make_row_match(match_row, text_id=text["id"])
+            for match_row in candidates_to_rows(candidates, phrase_model, search_context=search_context)]
+
+
+def candidates_to_rows(candidates: List[Candidate], phrase_model: PhraseModel,
+                       search_context: Union[None, SearchContext] = None) -> List[MatchRow]:
+    """Score candidate matches and turn them into match rows. Each candidate costs a Levenshtein
+    computation, which is counted against the Levenshtein budget of the search context.
+
+    :param candidates: a list of candidate matches
+    :type candidates: List[Candidate]
+    :param phrase_model: the phrase model that the candidate phrases belong to
+    :type phrase_model: PhraseModel
+    :param search_context: an optional search context with search budgets
+    :type search_context: Union[None, SearchContext]
+    :return: a list of scored match rows
+    :rtype: List[MatchRow]
+    """
+    match_rows: List[MatchRow] = []
     for candidate in candidates:
+        # scoring a match includes a Levenshtein similarity computation
+        if search_context is not None:
+            if not search_context.has_levenshtein_budget():
+                break
+            search_context.num_levenshtein += 1
         if candidate.phrase.phrase_string in phrase_model.is_variant_of:
             match_phrase_string = phrase_model.is_variant_of[candidate.phrase.phrase_string]
             match_phrase = phrase_model.phrase_index[match_phrase_string]
         else:
             match_phrase = candidate.phrase
-        match = PhraseMatch(match_phrase, candidate.phrase,
-                            candidate.match_string, candidate.match_start_offset, text["id"])
-        match.add_scores(skipgram_overlap=candidate.get_skip_count_overlap())
-        matches.append(match)
-    return matches
+        match_rows.append(make_scored_match_row(match_phrase, candidate.phrase, candidate.match_string,
+                                                candidate.match_start_offset,
+                                                skipgram_overlap=candidate.get_skip_count_overlap()))
+    return match_rows
+
+
+def join_proximity_matches(anchors: List[PhraseMatch], targets: List[PhraseMatch],
+                           max_distance: int, direction: str = "after") -> List[ProximityMatch]:
+    """Join anchor matches and target matches that are at most max_distance characters apart. The
+    distance is the number of characters between the end of the first match and the start of the second,
+    so overlapping matches are never joined. The targets are looked up by binary search on their offsets.
+
+    :param anchors: a list of anchor matches
+    :type anchors: List[PhraseMatch]
+    :param targets: a list of target matches
+    :type targets: List[PhraseMatch]
+    :param max_distance: the maximum number of characters between an anchor and a target
+    :type max_distance: int
+    :param direction: where to look for targets: 'after' the anchor, 'before' the anchor or on 'both' sides
+    :type direction: str
+    :return: a list of anchor-target pairs, sorted by anchor offset and distance
+    :rtype: List[ProximityMatch]
+    """
+    targets_by_start = sorted(targets, key=lambda x: x.offset)
+    target_starts = [target.offset for target in targets_by_start]
+    targets_by_end = sorted(targets, key=lambda x: x.end)
+    target_ends = [target.end for target in targets_by_end]
+    proximity_matches = []
+    for anchor in sorted(anchors, key=lambda x: x.offset):
+        anchor_matches = []
+        if direction in {"after", "both"}:
+            first_index = bisect.bisect_left(target_starts, anchor.end)
+            last_index = bisect.bisect_right(target_starts, anchor.end + max_distance)
+            for target in targets_by_start[first_index:last_index]:
+                anchor_matches.append(ProximityMatch(anchor, target, target.offset - anchor.end, "after"))
+        if direction in {"before", "both"}:
+            first_index = bisect.bisect_left(target_ends, anchor.offset - max_distance)
+            last_index = bisect.bisect_right(target_ends, anchor.offset)
+            for target in targets_by_end[first_index:last_index]:
+                anchor_matches.append(ProximityMatch(anchor, target, anchor.offset - target.end, "before"))
+        anchor_matches.sort(key=lambda x: (x.distance, x.target.offset))
+        proximity_matches.extend(anchor_matches)
+    return proximity_matches
+
+
+def select_non_overlapping_matches(matches: List[PhraseMatch]) -> List[PhraseMatch]:
+    """Select the set of non-overlapping matches with the highest total score, across all phrases.
+    Each match is weighted by its Levenshtein similarity times its length, so that a long match is
+    not replaced by a shorter match inside it. This is the weighted interval scheduling problem,
+    which is solved in O(n log n) by sorting the matches by end offset and using binary search to
+    find the last match that ends before each match starts.
+
+    :param matches: a list of scored phrase matches
+    :type matches: List[PhraseMatch]
+    :return: the selected non-overlapping matches, sorted by offset
+    :rtype: List[PhraseMatch]
+    """
+    matches = sorted(matches, key=lambda x: (x.end, x.offset))
+    ends = [match.end for match in matches]
+    # best_score[j] is the highest total score using only the first j matches
+    best_score = [0.0] * (len(matches) + 1)
+    for mi, match in enumerate(matches):
+        prev_index = bisect.bisect_right(ends, match.offset, 0, mi)
+        with_match = match.levenshtein_similarity * len(match.string) + best_score[prev_index]
+        best_score[mi + 1] = max(best_score[mi], with_match)
+    selected: List[PhraseMatch] = []
+    mi = len(matches)
+    while mi > 0:
+        match = matches[mi - 1]
+        prev_index = bisect.bisect_right(ends, match.offset, 0, mi - 1)
+        if match.levenshtein_similarity * len(match.string) + best_score[prev_index] >= best_score[mi - 1]:
+            selected.append(match)
+            mi = prev_index
+        else:
+            mi -= 1
+    return selected[::-1]
+
+
+class BestMatches:
+
+    def __init__(self, k: int):
+        """A bounded min-heap of the k best matches, ranked by Levenshtein similarity and, for equal
+        scores, by preferring earlier matches. A match that overlaps with a kept match of the same phrase
+        only replaces it if it has a higher score. Replaced matches are removed from the heap lazily.
+
+        :param k: the maximum number of matches to keep
+        :type k: int
+        """
+        self.k = k
+        self.heap: List[Tuple[float, int, str, PhraseMatch]] = []
+        self.removed: Set[int] = set()
+        # the kept matches per phrase don't overlap, so their starts and ends are sorted in the same order
+        self.phrase_starts: Dict[str, List[int]] = defaultdict(list)
+        self.phrase_matches: Dict[str, List[PhraseMatch]] = defaultdict(list)
+
+    def __len__(self):
+        return len(self.heap) - len(self.removed)
+
+    def get_matches(self) -> List[PhraseMatch]:
+        """Return the kept matches, sorted by descending score and then by offset.
+
+        :return: the kept matches
+        :rtype: List[PhraseMatch]
+        """
+        entries = [entry for entry in self.heap if id(entry[3]) not in self.removed]
+        return [entry[3] for entry in sorted(entries, key=lambda entry: entry[:3], reverse=True)]
+
+    def has_perfect_matches(self) -> bool:
+        """Check if the heap holds k matches with a perfect score, so that no other match can improve on it.
+
+        :return: a boolean whether the heap is full with perfect matches
+        :rtype: bool
+        """
+        return len(self) >= self.k and self.peek()[0] >= 1.0
+
+    def peek(self) -> Tuple[float, int, str, PhraseMatch]:
+        """Return the entry of the lowest ranked kept match.
+
+        :return: a (score, negative offset, variant string, match) tuple
+        :rtype: Tuple[float, int, str, PhraseMatch]
+        """
+        while id(self.heap[0][3]) in self.removed:
+            self.removed.remove(id(heapq.heappop(self.heap)[3]))
+        return self.heap[0]
+
+    def add(self, match: PhraseMatch) -> None:
+        """Add a match if it ranks among the k best matches.
+
+        :param match: a scored phrase match
+        :type match: PhraseMatch
+        """
+        starts = self.phrase_starts[match.phrase.phrase_string]
+        matches = self.phrase_matches[match.phrase.phrase_string]
+        last_index = bisect.bisect_left(starts, match.end)
+        first_index = last_index
+        while first_index > 0 and matches[first_index - 1].end > match.offset:
+            first_index -= 1
+        overlapping = matches[first_index:last_index]
+        if any(kept_match.levenshtein_similarity >= match.levenshtein_similarity for kept_match in overlapping):
+            return None
+        entry = (match.levenshtein_similarity, -match.offset, match.variant.phrase_string, match)
+        if len(self) - len(overlapping) >= self.k and entry[:3] <= self.peek()[:3]:
+            return None
+        for kept_match in overlapping:
+            self.removed.add(id(kept_match))
+        del starts[first_index:last_index]
+        del matches[first_index:last_index]
+        if len(self) >= self.k:
+            self.peek()
+            self.remove_match(heapq.heappop(self.heap)[3])
+        heapq.heappush(self.heap, entry)
+        starts.insert(first_index, match.offset)
+        matches.insert(first_index, match)
+
+    def remove_match(self, match: PhraseMatch) -> None:
+        """Remove a match that was popped from the heap from the kept matches of its phrase.
+
+        :param match: a kept match
+        :type match: PhraseMatch
+        """
+        starts = self.phrase_starts[match.phrase.phrase_string]
+        matches = self.phrase_matches[match.phrase.phrase_string]
+        match_index = bisect.bisect_left(starts, match.offset)
+        del starts[match_index]
+        del matches[match_index]
 
 
 class FuzzyPhraseSearcher(object):
@@ -306,6 +902,12 @@ class FuzzyPhraseSearcher(object):
         self.phrase_model: Union[None, PhraseModel] = None
         self.debug = False
         self.punctuation = string.punctuation
+        self.chunk_size = 100000
+        self.time_budget: Union[None, float] = None
+        self.max_candidates: Union[None, int] = None
+        self.max_levenshtein: Union[None, int] = None
+        self.frozen = False
+        self.flat_indexes = False
         # non-default configuration
         if config:
             self.config = config
@@ -313,6 +915,35 @@ class FuzzyPhraseSearcher(object):
         else:
             self.config = default_config
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # the skipgram indexes are derived from the phrases, so they are rebuilt when unpickling
+        for index_name in skipgram_index_names:
+            del state[index_name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.rebuild_skipgram_indexes()
+
+    def rebuild_skipgram_indexes(self) -> None:
+        """Rebuild the skipgram indexes from the indexed phrases, variants and distractors. A frozen
+        searcher is frozen again after rebuilding.
+        """
+        for index_name in skipgram_index_names:
+            setattr(self, index_name, defaultdict(set))
+        for phrase in self.phrases:
+            index_phrase_skipgrams(phrase, self.skipgram_index, self.early_skipgram_index,
+                                   self.late_skipgram_index, ignorecase=self.ignorecase)
+        for variant in self.variants:
+            index_phrase_skipgrams(variant, self.variant_skipgram_index, self.variant_early_skipgram_index,
+                                   self.variant_late_skipgram_index, ignorecase=self.ignorecase)
+        for distractor in self.distractors:
+            index_phrase_skipgrams(distractor, self.distractor_skipgram_index, self.distractor_early_skipgram_index,
+                                   self.distractor_late_skipgram_index, ignorecase=self.ignorecase)
+        if self.frozen:
+            self.freeze(flat=self.flat_indexes)
+
     def configure(self, config: Dict[str, Union[str, int, float]]) -> None:
         """Configure the fuzzy searcher with a given config object.
 
@@ -348,6 +979,14 @@ class FuzzyPhraseSearcher(object):
             self.punctuation = config["punctuation"]
         if "debug" in config:
             self.debug = config["debug"]
+        if "chunk_size" in config:
+            self.chunk_size = config["chunk_size"]
+        if "time_budget" in config:
+            self.time_budget = config["time_budget"]
+        if "max_candidates" in config:
+            self.max_candidates = config["max_candidates"]
+        if "max_levenshtein" in config:
+            self.max_levenshtein = config["max_levenshtein"]
 
     def index_phrase_model(self, phrase_model: Union[List[Dict[str, Union[str, int, float, list]]], PhraseModel]):
         """Add a phrase model to search for phrases in texts.
@@ -355,6 +994,7 @@ class FuzzyPhraseSearcher(object):
         :param phrase_model: a phrase model, either as dictionary or as PhraseModel object
         :type phrase_model: Union[List[Dict[str, Union[str, int, float, list]]], PhraseModel]
         """
+        self.check_not_frozen()
         if isinstance(phrase_model, list):
             phrase_model = PhraseModel(model=phrase_model, config=self.config)
         self.phrase_model = phrase_model
@@ -368,6 +1008,7 @@ class FuzzyPhraseSearcher(object):
         :param phrases: a list of phrases, either as string or as Phrase objects
         :type phrases: List[Union[str, Phrase]]
         """
+        self.check_not_frozen()
         for phrase in phrases:
             if isinstance(phrase, str):
                 phrase = Phrase(phrase, ngram_size=self.ngram_size, skip_size=self.skip_size)
@@ -378,20 +1019,8 @@ class FuzzyPhraseSearcher(object):
                 searcher_size = f"{self.__class__.__name__} ({self.skip_size}"
                 raise ValueError(f"phrase has different skip_size ({phrase.skip_size}) than {searcher_size}")
             self.phrases.add(phrase)
-            if self.ignorecase:
-                for skipgram in phrase.skipgrams_lower:
-                    self.skipgram_index[skipgram.string].add(phrase)
-                for skipgram_string in phrase.early_skipgram_index_lower:
-                    self.early_skipgram_index[skipgram_string].add(phrase)
-                for skipgram_string in phrase.late_skipgram_index_lower:
-                    self.late_skipgram_index[skipgram_string].add(phrase)
-            else:
-                for skipgram in phrase.skipgrams:
-                    self.skipgram_index[skipgram.string].add(phrase)
-                for skipgram_string in phrase.early_skipgram_index:
-                    self.early_skipgram_index[skipgram_string].add(phrase)
-                for skipgram_string in phrase.late_skipgram_index:
-                    self.late_skipgram_index[skipgram_string].add(phrase)
+            index_phrase_skipgrams(phrase, self.skipgram_index, self.early_skipgram_index,
+                                   self.late_skipgram_index, ignorecase=self.ignorecase)
         if self.phrase_model is None:
             self.phrase_model = PhraseModel(phrases=list(self.phrases))
 
@@ -401,6 +1030,7 @@ class FuzzyPhraseSearcher(object):
         :param variants: a list of variants, either as string or as Phrase objects
         :type variants: List[Union[str, Phrase]]
         """
+        self.check_not_frozen()
         for variant in variants:
             if isinstance(variant, str):
                 variant = Phrase(variant, ngram_size=self.ngram_size, skip_size=self.skip_size)
@@ -411,20 +1041,8 @@ class FuzzyPhraseSearcher(object):
                 searcher_size = f"{self.__class__.__name__} ({self.skip_size}"
                 raise ValueError(f"variant has different skip_size ({variant.skip_size}) than {searcher_size}")
             self.variants.add(variant)
-            if self.ignorecase:
-                for skipgram in variant.skipgrams_lower:
-                    self.variant_skipgram_index[skipgram.string].add(variant)
-                for skipgram_string in variant.early_skipgram_index_lower:
-                    self.variant_early_skipgram_index[skipgram_string].add(variant)
-                for skipgram_string in variant.late_skipgram_index_lower:
-                    self.variant_late_skipgram_index[skipgram_string].add(variant)
-            else:
-                for skipgram in variant.skipgrams:
-                    self.variant_skipgram_index[skipgram.string].add(variant)
-                for skipgram_string in variant.early_skipgram_index:
-                    self.variant_early_skipgram_index[skipgram_string].add(variant)
-                for skipgram_string in variant.late_skipgram_index:
-                    self.variant_late_skipgram_index[skipgram_string].add(variant)
+            index_phrase_skipgrams(variant, self.variant_skipgram_index, self.variant_early_skipgram_index,
+                                   self.variant_late_skipgram_index, ignorecase=self.ignorecase)
 
     def index_distractors(self, distractors: List[Union[str, Phrase]]) -> None:
         """Add a list of distractor phrases to filter out likely incorrect phrase matches.
@@ -432,6 +1050,7 @@ class FuzzyPhraseSearcher(object):
         :param distractors: a list of distractors, either as string or as Phrase objects
         :type distractors: List[Union[str, Phrase]]
         """
+        self.check_not_frozen()
         for distractor in distractors:
             if isinstance(distractor, str):
                 distractor = Phrase(distractor, ngram_size=self.ngram_size, skip_size=self.skip_size)
@@ -442,24 +1061,93 @@ class FuzzyPhraseSearcher(object):
                 searcher_size = f"{self.__class__.__name__} ({self.skip_size}"
                 raise ValueError(f"distractor has different skip_size ({distractor.skip_size}) than {searcher_size}")
             self.distractors.add(distractor)
-            if self.ignorecase:
-                for skipgram in distractor.skipgrams_lower:
-                    self.distractor_skipgram_index[skipgram.string].add(distractor)
-                for skipgram_string in distractor.early_skipgram_index_lower:
-                    self.distractor_early_skipgram_index[skipgram_string].add(distractor)
-                for skipgram_string in distractor.late_skipgram_index_lower:
-                    self.distractor_late_skipgram_index[skipgram_string].add(distractor)
-            else:
-                for skipgram in distractor.skipgrams:
-                    self.distractor_skipgram_index[skipgram.string].add(distractor)
-                for skipgram_string in distractor.early_skipgram_index:
-                    self.distractor_early_skipgram_index[skipgram_string].add(distractor)
-                for skipgram_string in distractor.late_skipgram_index:
-                    self.distractor_late_skipgram_index[skipgram_string].add(distractor)
+            index_phrase_skipgrams(distractor, self.distractor_skipgram_index, self.distractor_early_skipgram_index,
+                                   self.distractor_late_skipgram_index, ignorecase=self.ignorecase)
+
+    def unindex_phrases(self, phrases: List[Phrase], phrase_type: str = "phrase") -> None:
+        """Remove a list of phrase objects from the skipgram indexes of the given phrase type.
+
+        :param phrases: a list of indexed phrase objects
+        :type phrases: List[Phrase]
+        :param phrase_type: the type of the phrases, either 'phrase', 'variant' or 'distractor'
+        :type phrase_type: str
+        """
+        self.check_not_frozen()
+        if phrase_type == "phrase":
+            phrase_set = self.phrases
+            indexes = (self.skipgram_index, self.early_skipgram_index, self.late_skipgram_index)
+        elif phrase_type == "variant":
+            phrase_set = self.variants
+            indexes = (self.variant_skipgram_index, self.variant_early_skipgram_index,
+                       self.variant_late_skipgram_index)
+        elif phrase_type == "distractor":
+            phrase_set = self.distractors
+            indexes = (self.distractor_skipgram_index, self.distractor_early_skipgram_index,
+                       self.distractor_late_skipgram_index)
+        else:
+            raise ValueError(f"unknown phrase type {phrase_type}")
+        for phrase in phrases:
+            phrase_set.discard(phrase)
+            unindex_phrase_skipgrams(phrase, *indexes, ignorecase=self.ignorecase)
+
+    def add_phrases(self, phrases: List[Union[str, Dict[str, Union[str, List[str]]], Phrase]]) -> None:
+        """Add phrases, including their variants, distractors and labels, to the phrase model of the searcher
+        and update the skipgram indexes in place. Only the added phrases are (re-)indexed, so the searcher
+        doesn't need to be rebuilt for changes to the phrase model.
+
+        :param phrases: a list of phrases as strings, phrase dictionaries or Phrase objects
+        :type phrases: List[Union[str, Dict[str, Union[str, List[str]]], Phrase]]
+        """
+        if self.phrase_model is None:
+            self.phrase_model = PhraseModel(config=self.config)
+        model = self.phrase_model
+        phrase_strings = [phrase_string for phrase in phrases for phrase_string in get_phrase_entry_strings(phrase)]
+        variant_strings = [variant_string for phrase in phrases
+                           for variant_string in get_phrase_entry_strings(phrase, "variants")]
+        distractor_strings = [distractor_string for phrase in phrases
+                              for distractor_string in get_phrase_entry_strings(phrase, "distractors")]
+        # phrases that are added again replace the existing phrase objects, so unindex those first
+        self.unindex_phrases([model.phrase_index[ps] for ps in phrase_strings if ps in model.phrase_index])
+        self.unindex_phrases([model.variant_index[vs] for vs in variant_strings if vs in model.variant_index],
+                             phrase_type="variant")
+        self.unindex_phrases([model.distractor_index[ds] for ds in distractor_strings
+                              if ds in model.distractor_index], phrase_type="distractor")
+        model.add_phrases(phrases)
+        self.index_phrases([model.phrase_index[ps] for ps in phrase_strings])
+        # the phrase model only registers variants and distractors of phrase dictionaries
+        self.index_variants([model.variant_index[vs] for vs in variant_strings if vs in model.variant_index])
+        self.index_distractors([model.distractor_index[ds] for ds in distractor_strings
+                                if ds in model.distractor_index])
+
+    def remove_phrases(self, phrases: List[Union[str, Dict[str, Union[str, List[str]]], Phrase]]) -> None:
+        """Remove phrases from the phrase model of the searcher, including their variants and any distractors
+        that are not connected to other phrases, and update the skipgram indexes in place.
+
+        :param phrases: a list of registered phrases as strings, phrase dictionaries or Phrase objects
+        :type phrases: List[Union[str, Dict[str, Union[str, List[str]]], Phrase]]
+        """
+        if self.phrase_model is None:
+            raise ValueError("No phrase model indexed")
+        model = self.phrase_model
+        phrase_strings = [phrase_string for phrase in phrases for phrase_string in get_phrase_entry_strings(phrase)]
+        for phrase_string in phrase_strings:
+            if phrase_string not in model.phrase_index:
+                raise KeyError(f"Unknown phrase: {phrase_string}")
+        removed_variants = [model.variant_index[variant_string] for phrase_string in phrase_strings
+                            for variant_string in model.has_variants.get(phrase_string, [])]
+        removed_distractors = [model.distractor_index[distractor_string] for phrase_string in phrase_strings
+                               for distractor_string in model.has_distractors.get(phrase_string, [])
+                               if model.is_distractor_of[distractor_string].issubset(phrase_strings)]
+        self.unindex_phrases([model.phrase_index[phrase_string] for phrase_string in phrase_strings])
+        self.unindex_phrases(removed_variants, phrase_type="variant")
+        self.unindex_phrases(removed_distractors, phrase_type="distractor")
+        model.remove_phrases([model.phrase_index[phrase_string] for phrase_string in phrase_strings])
 
     def find_skipgram_matches(self, text: Dict[str, Union[str, int, float, list]],
                               include_variants: Union[None, bool] = None,
-                              known_word_offset: Dict[int, Dict[str, any]] = None) -> SkipMatches:
+                              known_word_offset: Dict[int, Dict[str, any]] = None,
+                              search_context: Union[None, SearchContext] = None,
+                              exact_match_ranges: Dict[str, Tuple[List[int], List[int]]] = None) -> SkipMatches:
         """Find all skipgram matches between text and phrases.
 
         :param text: the text object to match with phrases
@@ -468,6 +1156,11 @@ class FuzzyPhraseSearcher(object):
         :type include_variants: bool
         :param known_word_offset: a dictionary of known words and their text offsets based on exact matches
         :type known_word_offset: Dict[int, Dict[str, any]]
+        :param search_context: an optional search context with a time budget and phrase filter
+        :type search_context: Union[None, SearchContext]
+        :param exact_match_ranges: the text ranges per phrase string that are covered by exact matches,
+            skipgrams of a phrase inside its covered ranges are skipped
+        :type exact_match_ranges: Dict[str, Tuple[List[int], List[int]]]
         :return: a SkipMatches object contain all skipgram matches
         :rtype: SkipMatches
         """
@@ -477,9 +1170,14 @@ class FuzzyPhraseSearcher(object):
             include_variants = self.include_variants
         if known_word_offset is None:
             known_word_offset = {}
+        if exact_match_ranges is None:
+            exact_match_ranges = {}
+        phrase_filter = None if search_context is None else search_context.phrase_filter
         # print(known_word_offset)
         skip_matches = SkipMatches(self.ngram_size, self.skip_size)
-        for skipgram in text2skipgrams(text["text"], self.ngram_size, self.skip_size):
+        for si, skipgram in enumerate(text2skipgrams(text["text"], self.ngram_size, self.skip_size)):
+            if search_context is not None and si % 1000 == 0 and not search_context.has_time_left():
+                break
             # print(skipgram.offset, skipgram.string)
             # print("skipgram:", skipgram.string)
             if skipgram.offset in known_word_offset:
@@ -510,39 +1208,53 @@ class FuzzyPhraseSearcher(object):
                     for phrase in self.variant_skipgram_index[skipgram.string]:
                         skip_matches.add_skip_match(skipgram, phrase)
                 """
-            for phrase in self.skipgram_index[skipgram.string]:
+            for phrase in self.skipgram_index.get(skipgram.string, empty_postings):
+                if phrase_filter is not None and phrase.phrase_string not in phrase_filter:
+                    continue
                 if phrase.max_offset > 0 and phrase.max_end < skipgram.offset + \
                         skipgram.length + self.max_length_variance:
                     # print(skipgram.offset, phrase.max_offset, phrase.max_end, phrase.phrase_string)
                     # print(f"skipping phrase {phrase.phrase_string} at offset", skipgram.offset)
                     continue
                 if known_word:
-                    if phrase.phrase_string not in self.phrase_model.word_in_phrase[known_word["word"]]:
+                    if phrase.phrase_string not in self.phrase_model.word_in_phrase.get(known_word["word"],
+                                                                                        empty_postings):
                         # print("skipping phrase because doesn't match known word:", phrase.phrase_string)
                         continue
                     if phrase.phrase_string in known_word["match_phrases"]:
                         # print("skipping phrase because found as exact match:", phrase.phrase_string)
                         continue
+                if phrase.phrase_string in exact_match_ranges and \
+                        in_exact_match_range(exact_match_ranges[phrase.phrase_string], skipgram):
+                    continue
                 # print("\tphrase has skip:", phrase.phrase_string)
                 # skipmatch_count += 1
                 # print("adding skipmatch", skipmatch_count)
                 skip_matches.add_skip_match(skipgram, phrase)
             if include_variants:
-                for phrase in self.variant_skipgram_index[skipgram.string]:
+                for phrase in self.variant_skipgram_index.get(skipgram.string, empty_postings):
+                    if phrase_filter is not None and phrase.phrase_string not in phrase_filter:
+                        continue
                     if known_word:
-                        if phrase.phrase_string not in self.phrase_model.word_in_phrase[known_word["word"]]:
+                        if phrase.phrase_string not in self.phrase_model.word_in_phrase.get(known_word["word"],
+                                                                                            empty_postings):
                             # print("skipping phrase because doesn't match known word:", phrase.phrase_string)
                             continue
                         if phrase.phrase_string in known_word["match_phrases"]:
                             # print("skipping phrase because found as exact match:", phrase.phrase_string)
                             continue
+                    if phrase.phrase_string in exact_match_ranges and \
+                            in_exact_match_range(exact_match_ranges[phrase.phrase_string], skipgram):
+                        continue
                     skip_matches.add_skip_match(skipgram, phrase)
         # print("final skipmatch count:", skipmatch_count)
         return skip_matches
 
     def find_candidates(self, text: dict, use_word_boundaries: bool,
                         include_variants: Union[None, bool] = None,
-                        known_word_offset: Dict[int, Dict[str, any]] = None) -> List[Candidate]:
+                        known_word_offset: Dict[int, Dict[str, any]] = None,
+                        search_context: Union[None, SearchContext] = None,
+                        exact_match_ranges: Dict[str, Tuple[List[int], List[int]]] = None) -> List[Candidate]:
         """Find candidate fuzzy matches for a given text.
 
         :param text: the text object to match with phrases
@@ -553,13 +1265,55 @@ class FuzzyPhraseSearcher(object):
         :type include_variants: bool
         :param known_word_offset: a dictionary of known words and their text offsets based on exact matches
         :type known_word_offset: Dict[int, Dict[str, any]]
+        :param search_context: an optional search context with search budgets
+        :type search_context: Union[None, SearchContext]
+        :param exact_match_ranges: the text ranges per phrase string that are covered by exact matches
+        :type exact_match_ranges: Dict[str, Tuple[List[int], List[int]]]
         :return: a list of candidate matches
         :rtype: List[Candidate]
         """
         skip_matches = self.find_skipgram_matches(text, include_variants=include_variants,
-                                                  known_word_offset=known_word_offset)
+                                                  known_word_offset=known_word_offset,
+                                                  search_context=search_context,
+                                                  exact_match_ranges=exact_match_ranges)
+        return self.get_skip_match_candidates(text, skip_matches, use_word_boundaries,
+                                              search_context=search_context)
+
+    def get_skip_match_candidates(self, text: dict, skip_matches: SkipMatches,
+                                  use_word_boundaries: Union[None, bool] = None,
+                                  search_context: Union[None, SearchContext] = None) -> List[Candidate]:
+        """Turn the skipgram matches of a text into candidate fuzzy matches.
+
+        :param text: the text object to match with phrases
+        :type text: dict
+        :param skip_matches: the skipgram matches between the text and the phrases
+        :type skip_matches: SkipMatches
+        :param use_word_boundaries: use word boundaries in determining match boundaries
+        :type use_word_boundaries: Union[None, bool]
+        :param search_context: an optional search context with search budgets
+        :type search_context: Union[None, SearchContext]
+        :return: a list of candidate matches
+        :rtype: List[Candidate]
+        """
         candidates = get_skipmatch_candidates(text, skip_matches, self.skipgram_threshold, self.phrase_model,
-                                              max_length_variance=self.max_length_variance)
+                                              max_length_variance=self.max_length_variance,
+                                              search_context=search_context)
+        return self.adjust_candidate_boundaries(text, candidates, use_word_boundaries=use_word_boundaries)
+
+    def adjust_candidate_boundaries(self, text: dict, candidates: List[Candidate],
+                                    use_word_boundaries: Union[None, bool] = None) -> List[Candidate]:
+        """Adjust the boundaries of candidate matches to word boundaries, dropping candidates that
+        can't be adjusted.
+
+        :param text: the text object that the candidates were found in
+        :type text: dict
+        :param candidates: a list of candidate matches
+        :type candidates: List[Candidate]
+        :param use_word_boundaries: use word boundaries in determining match boundaries
+        :type use_word_boundaries: Union[None, bool]
+        :return: a list of candidate matches
+        :rtype: List[Candidate]
+        """
         filtered = []
         use_word_boundaries = use_word_boundaries if use_word_boundaries is not None else self.use_word_boundaries
         for candidate in candidates:
@@ -609,10 +1363,18 @@ class FuzzyPhraseSearcher(object):
                      allow_overlapping_matches: Union[None, bool] = None,
                      include_variants: Union[None, bool] = None,
                      filter_distractors: Union[None, bool] = None,
-                     skip_exact_matching: bool = None) -> List[PhraseMatch]:
+                     skip_exact_matching: bool = None,
+                     time_budget: Union[None, float] = None,
+                     max_candidates: Union[None, int] = None,
+                     max_levenshtein: Union[None, int] = None,
+                     phrases: Union[None, Iterable[Union[str, Phrase]]] = None) -> SearchResult:
         """Find all fuzzy matching phrases for a given text. By default, a first pass of exact matching is conducted
         to find exact occurrences of phrases. This is to speed up the fuzzy matching pass
 
+        The search can be bounded by a time budget, a maximum number of candidates and a maximum number of
+        Levenshtein computations. When a budget runs out, the matches confirmed so far are returned and the
+        truncated property of the result is set to True. Exact matches are always included.
+
         :param text: the text (string or dictionary with 'text' property) to find fuzzy matching phrases in.
         :type text: Union[str, Dict[str, str]]
         :param use_word_boundaries: use word boundaries in determining match boundaries
@@ -625,40 +1387,730 @@ class FuzzyPhraseSearcher(object):
         :type filter_distractors: Union[None, bool]
         :param skip_exact_matching: boolean flag whether to skip the exact matching step
         :type skip_exact_matching: Union[None, bool]
-        :return: a list of phrases matches
-        :rtype: PhraseMatch
+        :param time_budget: the maximum number of seconds to search the text
+        :type time_budget: Union[None, float]
+        :param max_candidates: the maximum number of candidate matches to generate for the text
+        :type max_candidates: Union[None, int]
+        :param max_levenshtein: the maximum number of Levenshtein computations for the text
+        :type max_levenshtein: Union[None, int]
+        :param phrases: an optional list of registered phrases to restrict the search to
+        :type phrases: Union[None, Iterable[Union[str, Phrase]]]
+        :return: a list of phrases matches, flagged as truncated if a search budget ran out
+        :rtype: SearchResult
+        """
+        context = self.make_search_context(text, use_word_boundaries=use_word_boundaries,
+                                           allow_overlapping_matches=allow_overlapping_matches,
+                                           include_variants=include_variants,
+                                           filter_distractors=filter_distractors,
+                                           skip_exact_matching=skip_exact_matching,
+                                           time_budget=time_budget, max_candidates=max_candidates,
+                                           max_levenshtein=max_levenshtein, phrases=phrases)
+        return self.search_in_context(context)
+
+    def make_search_context(self, text: Union[str, Dict[str, str]],
+                            use_word_boundaries: Union[None, bool] = None,
+                            allow_overlapping_matches: Union[None, bool] = None,
+                            include_variants: Union[None, bool] = None,
+                            filter_distractors: Union[None, bool] = None,
+                            skip_exact_matching: bool = None,
+                            time_budget: Union[None, float] = None,
+                            max_candidates: Union[None, int] = None,
+                            max_levenshtein: Union[None, int] = None,
+                            phrases: Union[None, Iterable[Union[str, Phrase]]] = None) -> SearchContext:
+        """Make a search context for a single search call, with the search settings resolved against the
+        configuration of the searcher.
+
+        :param text: the text (string or dictionary with 'text' property) to find fuzzy matching phrases in.
+        :type text: Union[str, Dict[str, str]]
+        :param use_word_boundaries: use word boundaries in determining match boundaries
+        :type use_word_boundaries: Union[None, bool]
+        :param allow_overlapping_matches: boolean flag for whether to allow matches to overlap in their text ranges
+        :type allow_overlapping_matches: Union[None, bool]
+        :param include_variants: boolean flag for whether to include phrase variants for finding matches
+        :type include_variants: Union[None, bool]
+        :param filter_distractors: boolean flag for whether to remove phrase matches that better match distractors
+        :type filter_distractors: Union[None, bool]
+        :param skip_exact_matching: boolean flag whether to skip the exact matching step
+        :type skip_exact_matching: Union[None, bool]
+        :param time_budget: the maximum number of seconds to search the text
+        :type time_budget: Union[None, float]
+        :param max_candidates: the maximum number of candidate matches to generate for the text
+        :type max_candidates: Union[None, int]
+        :param max_levenshtein: the maximum number of Levenshtein computations for the text
+        :type max_levenshtein: Union[None, int]
+        :param phrases: an optional list of registered phrases to restrict the search to
+        :type phrases: Union[None, Iterable[Union[str, Phrase]]]
+        :return: a search context
+        :rtype: SearchContext
         """
         if self.phrase_model is None:
             raise ValueError("No phrase model indexed")
-        text = get_text_dict(text, ignorecase=self.ignorecase)
-        if use_word_boundaries is None:
-            use_word_boundaries = self.use_word_boundaries
-        if skip_exact_matching is None:
-            skip_exact_matching = self.skip_exact_matching
-        if not skip_exact_matching:
-            # print("running exact matching")
-            exact_matches = self.find_exact_matches(text, use_word_boundaries=use_word_boundaries,
-                                                    include_variants=include_variants)
-            known_word_offset = index_known_word_offsets(exact_matches)
-        else:
-            # print("skipping exact matching")
-            exact_matches = []
-            known_word_offset = {}
+        phrase_filter = None if phrases is None else self.get_phrase_filter(phrases)
+        return SearchContext(get_text_dict(text, ignorecase=self.ignorecase),
+                             use_word_boundaries=self.use_word_boundaries if use_word_boundaries is None
+                             else use_word_boundaries,
+                             allow_overlapping_matches=self.allow_overlapping_matches
+                             if allow_overlapping_matches is None else allow_overlapping_matches,
+                             include_variants=self.include_variants if include_variants is None else include_variants,
+                             filter_distractors=self.filter_distractors if filter_distractors is None
+                             else filter_distractors,
+                             skip_exact_matching=self.skip_exact_matching if skip_exact_matching is None
+                             else skip_exact_matching,
+                             time_budget=self.time_budget if time_budget is None else time_budget,
+                             max_candidates=self.max_candidates if max_candidates is None else max_candidates,
+                             max_levenshtein=self.max_levenshtein if max_levenshtein is None
+                             else max_levenshtein,
+                             phrase_filter=phrase_filter)
+
+    def get_phrase_filter(self, phrases: Iterable[Union[str, Phrase]]) -> Set[str]:
+        """Return the set of phrase and variant strings to restrict a search to a list of registered phrases.
+
+        :param phrases: a list of registered phrases
+        :type phrases: Iterable[Union[str, Phrase]]
+        :return: the phrase strings and the strings of their variants
+        :rtype: Set[str]
+        """
+        phrase_filter: Set[str] = set()
+        for phrase in phrases:
+            phrase_string = phrase.phrase_string if isinstance(phrase, Phrase) else phrase
+            phrase_filter.add(phrase_string)
+            if phrase_string in self.phrase_model.has_variants:
+                phrase_filter.update(self.phrase_model.has_variants[phrase_string])
+        return phrase_filter
+
+    def search_in_context(self, context: SearchContext) -> SearchResult:
+        """Find all fuzzy matching phrases for the text of a search context. All state of the search is kept
+        in the context, the searcher itself is only read.
+
+        :param context: a search context made with make_search_context
+        :type context: SearchContext
+        :return: a list of phrases matches, flagged as truncated if a search budget ran out
+        :rtype: SearchResult
+        """
+        match_rows = self.search_rows_in_context(context)
+        return SearchResult([make_row_match(match_row, text_id=context.text["id"]) for match_row in match_rows],
+                            truncated=context.truncated)
+
+    def search_exact_in_context(self, context: SearchContext) -> None:
+        """Run the exact matching pass for the text of a search context, unless the context skips exact
+        matching, and store the exact match rows, the known word offsets and the exact match ranges in the
+        context. With a phrase filter, only the filtered phrases are looked up.
+
+        :param context: a search context made with make_search_context
+        :type context: SearchContext
+        """
+        if context.skip_exact_matching:
+            return None
+        context.exact_matches = list(search_exact_phrase_rows(self.phrase_model, context.text,
+                                                              use_word_boundaries=context.use_word_boundaries,
+                                                              include_variants=context.include_variants,
+                                                              phrase_filter=context.phrase_filter))
+        context.known_word_offset = index_known_word_offsets(context.exact_matches)
+        context.exact_match_ranges = index_exact_match_ranges(context.exact_matches)
+
+    def search_rows_in_context(self, context: SearchContext) -> List[MatchRow]:
+        """Find all fuzzy matching phrases for the text of a search context as match rows, without making
+        PhraseMatch objects. Candidates that are filtered out are never turned into matches.
+
+        :param context: a search context made with make_search_context
+        :type context: SearchContext
+        :return: a list of match rows, sorted by offset
+        :rtype: List[MatchRow]
+        """
+        text = context.text
+        self.search_exact_in_context(context)
         # print('number of exact matches:', len(exact_matches))
-        candidates = self.find_candidates(text, use_word_boundaries=use_word_boundaries,
-                                          include_variants=include_variants, known_word_offset=known_word_offset)
+        candidates = self.find_candidates(text, use_word_boundaries=context.use_word_boundaries,
+                                          include_variants=context.include_variants,
+                                          known_word_offset=context.known_word_offset,
+                                          search_context=context,
+                                          exact_match_ranges=context.exact_match_ranges)
         # print(candidates)
-        matches = candidates_to_matches(candidates, text, self.phrase_model)
-        # print(matches)
-        filtered_matches = self.filter_matches_by_threshold(matches)
+        match_rows = candidates_to_rows(candidates, self.phrase_model, search_context=context)
+        filtered_rows = self.filter_matches_by_threshold(match_rows)
+        if context.filter_distractors:
+            filtered_rows = self.filter_matches_by_distractors(filtered_rows)
+        selected_rows = sorted(filtered_rows + context.exact_matches, key=lambda x: x.offset)
+        if not context.allow_overlapping_matches:
+            selected_rows = select_non_overlapping_matches(selected_rows)
+        return selected_rows
+
+    def index_text(self, text: Union[str, Dict[str, str]],
+                   use_word_boundaries: Union[None, bool] = None,
+                   include_variants: Union[None, bool] = None,
+                   skip_exact_matching: bool = None,
+                   phrases: Union[None, Iterable[Union[str, Phrase]]] = None) -> IndexedText:
+        """Run the exact pass and the skipgram scan over a whole text once and cache the results, so that
+        windows of the text can be searched with find_matches_in_window without processing the text again.
+
+        :param text: the text (string or dictionary with 'text' property) to index
+        :type text: Union[str, Dict[str, str]]
+        :param use_word_boundaries: use word boundaries in determining match boundaries
+        :type use_word_boundaries: Union[None, bool]
+        :param include_variants: boolean flag for whether to include phrase variants for finding matches
+        :type include_variants: Union[None, bool]
+        :param skip_exact_matching: boolean flag whether to skip the exact matching step
+        :type skip_exact_matching: Union[None, bool]
+        :param phrases: an optional list of registered phrases to restrict the index to
+        :type phrases: Union[None, Iterable[Union[str, Phrase]]]
+        :return: the text with its cached skipgram and exact matches
+        :rtype: IndexedText
+        """
+        context = self.make_search_context(text, use_word_boundaries=use_word_boundaries,
+                                           include_variants=include_variants,
+                                           skip_exact_matching=skip_exact_matching, phrases=phrases)
+        self.search_exact_in_context(context)
+        skip_matches = self.find_skipgram_matches(context.text, include_variants=context.include_variants,
+                                                  known_word_offset=context.known_word_offset,
+                                                  search_context=context,
+                                                  exact_match_ranges=context.exact_match_ranges)
+        exact_matches = [make_row_match(match_row, text_id=context.text["id"]) for match_row in context.exact_matches]
+        return IndexedText(context.text, skip_matches, exact_matches,
+                           use_word_boundaries=context.use_word_boundaries,
+                           include_variants=context.include_variants)
+
+    def find_matches_in_window(self, indexed_text: IndexedText, start: int, end: int,
+                               filter_distractors: Union[None, bool] = None) -> List[PhraseMatch]:
+        """Find all fuzzy matching phrases in a window of an indexed text, using the cached skipgram and
+        exact matches of the text. The offsets of the matches are in the coordinates of the whole text.
+
+        :param indexed_text: a text indexed with index_text
+        :type indexed_text: IndexedText
+        :param start: the start offset of the window
+        :type start: int
+        :param end: the end offset of the window
+        :type end: int
+        :param filter_distractors: boolean flag for whether to remove phrase matches that better match distractors
+        :type filter_distractors: Union[None, bool]
+        :return: a list of phrase matches, sorted by offset
+        :rtype: List[PhraseMatch]
+        """
         if filter_distractors is None:
             filter_distractors = self.filter_distractors
+        skip_matches = indexed_text.skip_matches.restrict(start, end)
+        candidates = self.get_skip_match_candidates(indexed_text.text, skip_matches,
+                                                    use_word_boundaries=indexed_text.use_word_boundaries)
+        matches = candidates_to_matches(candidates, indexed_text.text, self.phrase_model)
+        # adjusting to word boundaries can move a match outside the window
+        matches = [match for match in matches if match.offset >= start and match.end <= end]
+        filtered_matches = self.filter_matches_by_threshold(matches)
         if filter_distractors:
             filtered_matches = self.filter_matches_by_distractors(filtered_matches)
-        # print(exact_matches)
-        # print(filtered_matches)
-        selected_matches = filtered_matches + exact_matches
-        return sorted(selected_matches, key=lambda x: x.offset)
+        return sorted(filtered_matches + indexed_text.get_exact_matches(start, end), key=lambda x: x.offset)
+
+    def find_near(self, text: Union[str, Dict[str, str], IndexedText],
+                  anchor_phrases: Iterable[Union[str, Phrase]],
+                  target_phrases: Iterable[Union[str, Phrase]],
+                  max_distance: int, direction: str = "after",
+                  use_word_boundaries: Union[None, bool] = None,
+                  include_variants: Union[None, bool] = None,
+                  filter_distractors: Union[None, bool] = None) -> List[ProximityMatch]:
+        """Find matches of target phrases within a maximum number of characters of matches of anchor phrases.
+        Anchors and targets are found in a single scan of the text and joined by their offsets, without
+        searching the contexts of the anchors again.
+
+        :param text: the text (string or dictionary with 'text' property) to search, or a text indexed with
+            index_text that includes the anchor and target phrases
+        :type text: Union[str, Dict[str, str], IndexedText]
+        :param anchor_phrases: the registered phrases to use as anchors
+        :type anchor_phrases: Iterable[Union[str, Phrase]]
+        :param target_phrases: the registered phrases to find near the anchors
+        :type target_phrases: Iterable[Union[str, Phrase]]
+        :param max_distance: the maximum number of characters between the anchor and the target
+        :type max_distance: int
+        :param direction: where to look for targets: 'after' the anchor, 'before' the anchor or on 'both' sides
+        :type direction: str
+        :param use_word_boundaries: use word boundaries in determining match boundaries
+        :type use_word_boundaries: Union[None, bool]
+        :param include_variants: boolean flag for whether to include phrase variants for finding matches
+        :type include_variants: Union[None, bool]
+        :param filter_distractors: boolean flag for whether to remove phrase matches that better match distractors
+        :type filter_distractors: Union[None, bool]
+        :return: a list of anchor-target pairs, sorted by anchor offset and distance
+        :rtype: List[ProximityMatch]
+        """
+        if direction not in {"after", "before", "both"}:
+            raise ValueError(f"invalid direction '{direction}', must be 'after', 'before' or 'both'")
+        if max_distance < 0:
+            raise ValueError("max_distance must be a non-negative integer")
+        anchor_strings = {self.get_phrase_string(phrase) for phrase in anchor_phrases}
+        target_strings = {self.get_phrase_string(phrase) for phrase in target_phrases}
+        if isinstance(text, IndexedText):
+            indexed_text = text
+        else:
+            indexed_text = self.index_text(text, use_word_boundaries=use_word_boundaries,
+                                           include_variants=include_variants,
+                                           phrases=anchor_strings.union(target_strings))
+        matches = self.find_matches_in_window(indexed_text, 0, len(indexed_text.text["text"]),
+                                              filter_distractors=filter_distractors)
+        anchors = [match for match in matches if match.phrase.phrase_string in anchor_strings]
+        targets = [match for match in matches if match.phrase.phrase_string in target_strings]
+        return join_proximity_matches(anchors, targets, max_distance, direction)
+
+    def get_phrase_string(self, phrase: Union[str, Phrase]) -> str:
+        """Return the string of a registered phrase.
+
+        :param phrase: a registered phrase
+        :type phrase: Union[str, Phrase]
+        :return: the phrase string
+        :rtype: str
+        """
+        phrase_string = phrase.phrase_string if isinstance(phrase, Phrase) else phrase
+        if self.phrase_model is None or phrase_string not in self.phrase_model.phrase_index:
+            raise ValueError(f"Unknown phrase: {phrase_string}")
+        return phrase_string
+
+    def find_best_matches(self, text: Union[str, Dict[str, str]], k: int = 1, per_phrase: bool = True,
+                          phrases: Union[None, List[Union[str, Phrase]]] = None,
+                          use_word_boundaries: Union[None, bool] = None,
+                          include_variants: Union[None, bool] = None,
+                          filter_distractors: Union[None, bool] = None,
+                          skip_exact_matching: bool = None) -> List[PhraseMatch]:
+        """Find the k best matches in a text, either per phrase or over all phrases. Unlike find_matches,
+        this doesn't score every candidate. Phrases for which the exact matching pass already found k
+        occurrences are not fuzzy matched, and candidates of a phrase are no longer scored once k perfect
+        matches have been found. A restriction to a list of phrases is applied in the exact pass and the
+        skipgram scan, so other phrases are never looked up.
+
+        :param text: the text (string or dictionary with 'text' property) to find fuzzy matching phrases in.
+        :type text: Union[str, Dict[str, str]]
+        :param k: the number of best matches to return (per phrase or in total)
+        :type k: int
+        :param per_phrase: boolean flag whether to return the k best matches per phrase or in total
+        :type per_phrase: bool
+        :param phrases: an optional list of registered phrases to restrict the search to
+        :type phrases: Union[None, List[Union[str, Phrase]]]
+        :param use_word_boundaries: use word boundaries in determining match boundaries
+        :type use_word_boundaries: Union[None, bool]
+        :param include_variants: boolean flag for whether to include phrase variants for finding matches
+        :type include_variants: Union[None, bool]
+        :param filter_distractors: boolean flag for whether to remove phrase matches that better match distractors
+        :type filter_distractors: Union[None, bool]
+        :param skip_exact_matching: boolean flag whether to skip the exact matching step
+        :type skip_exact_matching: Union[None, bool]
+        :return: a list of the best phrase matches, sorted by descending score and then by offset
+        :rtype: List[PhraseMatch]
+        """
+        if k < 1:
+            raise ValueError("k must be a positive integer")
+        context = self.make_search_context(text, use_word_boundaries=use_word_boundaries,
+                                           include_variants=include_variants,
+                                           filter_distractors=filter_distractors,
+                                           skip_exact_matching=skip_exact_matching, phrases=phrases)
+        text = context.text
+        best_matches: Dict[Union[None, str], BestMatches] = {}
+
+        def get_best_matches(phrase_string: str) -> BestMatches:
+            key = phrase_string if per_phrase else None
+            if key not in best_matches:
+                best_matches[key] = BestMatches(k)
+            return best_matches[key]
+
+        self.search_exact_in_context(context)
+        for match_row in context.exact_matches:
+            get_best_matches(match_row.phrase.phrase_string).add(make_row_match(match_row, text_id=text["id"]))
+        if per_phrase or not get_best_matches(None).has_perfect_matches():
+            skip_matches = self.find_skipgram_matches(text, include_variants=context.include_variants,
+                                                      known_word_offset=context.known_word_offset,
+                                                      search_context=context,
+                                                      exact_match_ranges=context.exact_match_ranges)
+            # candidates of a phrase and its variants are filtered together, as in get_skipmatch_candidates
+            phrase_candidates: Dict[str, List[Candidate]] = defaultdict(list)
+            for phrase in skip_matches.phrases:
+                match_phrase_string = self.phrase_model.is_variant_of.get(phrase.phrase_string, phrase.phrase_string)
+                # skip phrases that are already satisfied, e.g. by the exact matching pass
+                if get_best_matches(match_phrase_string).has_perfect_matches():
+                    continue
+                if get_skipset_overlap(phrase, skip_matches) < self.skipgram_threshold:
+                    continue
+                phrase_candidates[match_phrase_string] += get_skipmatch_phrase_candidates(
+                    text, phrase, skip_matches, self.skipgram_threshold, max_length_variance=self.max_length_variance)
+            for match_phrase_string, candidates in phrase_candidates.items():
+                phrase_best_matches = get_best_matches(match_phrase_string)
+                if phrase_best_matches.has_perfect_matches():
+                    continue
+                candidates = self.adjust_candidate_boundaries(text, filter_overlapping_phrase_candidates(candidates),
+                                                              use_word_boundaries=context.use_word_boundaries)
+                for candidate in candidates:
+                    matches = self.filter_matches_by_threshold(candidates_to_matches([candidate], text,
+                                                                                     self.phrase_model))
+                    if context.filter_distractors:
+                        matches = self.filter_matches_by_distractors(matches)
+                    for match in matches:
+                        phrase_best_matches.add(match)
+                    if phrase_best_matches.has_perfect_matches():
+                        break
+        selected_matches = [match for key in best_matches for match in best_matches[key].get_matches()]
+        return sorted(selected_matches, key=lambda match: (match.levenshtein_similarity, -match.offset,
+                                                           match.variant.phrase_string), reverse=True)
+
+    def exists(self, text: Union[str, Dict[str, str]], phrase: Union[str, Phrase],
+               use_word_boundaries: Union[None, bool] = None,
+               include_variants: Union[None, bool] = None) -> bool:
+        """Check whether a registered phrase occurs in a text, either exactly or as fuzzy match. The search
+        stops at the first exact occurrence or perfect fuzzy match.
+
+        :param text: the text (string or dictionary with 'text' property) to find the phrase in.
+        :type text: Union[str, Dict[str, str]]
+        :param phrase: a registered phrase, as string or Phrase object
+        :type phrase: Union[str, Phrase]
+        :param use_word_boundaries: use word boundaries in determining match boundaries
+        :type use_word_boundaries: Union[None, bool]
+        :param include_variants: boolean flag for whether to include phrase variants for finding matches
+        :type include_variants: Union[None, bool]
+        :return: a boolean whether the phrase occurs in the text
+        :rtype: bool
+        """
+        phrase_string = phrase.phrase_string if isinstance(phrase, Phrase) else phrase
+        if self.phrase_model is None or phrase_string not in self.phrase_model.phrase_index:
+            raise ValueError(f"Unknown phrase: {phrase_string}")
+        text = get_text_dict(text, ignorecase=self.ignorecase)
+        if use_word_boundaries is None:
+            use_word_boundaries = self.use_word_boundaries
+        if include_variants is None:
+            include_variants = self.include_variants
+        exact_phrases = [self.phrase_model.phrase_index[phrase_string]]
+        if include_variants:
+            exact_phrases += [self.phrase_model.variant_index[variant_string]
+                              for variant_string in self.phrase_model.has_variants.get(phrase_string, [])]
+        for exact_phrase in exact_phrases:
+            if next(search_exact(exact_phrase, text, use_word_boundaries=use_word_boundaries), None) is not None:
+                return True
+        best_matches = self.find_best_matches(text, k=1, phrases=[phrase_string],
+                                              use_word_boundaries=use_word_boundaries,
+                                              include_variants=include_variants, skip_exact_matching=True)
+        return len(best_matches) > 0
+
+    def freeze(self, flat: bool = False) -> None:
+        """Freeze the indexes of the searcher, so that it can be shared between threads. The skipgram
+        indexes are turned into plain dictionaries of frozensets and any attempt to change the indexed
+        phrases raises a ValueError. Searching doesn't change the searcher, so a frozen searcher can be
+        called from many threads at the same time.
+
+        With flat indexes, the postings of the skipgram indexes are stored in flat arrays of phrase
+        numbers (see FlatPostingsIndex) instead of millions of small set objects. Forked worker processes
+        then share the index memory with the parent process, see make_prefork_executor.
+
+        :param flat: whether to store the skipgram indexes as flat arrays
+        :type flat: bool
+        """
+        if flat:
+            phrase_list = sorted(set(self.phrases).union(self.variants, self.distractors),
+                                 key=lambda phrase: phrase.phrase_string)
+            phrase_ids = {phrase: phrase_id for phrase_id, phrase in enumerate(phrase_list)}
+        for index_name in skipgram_index_names:
+            index = getattr(self, index_name)
+            if flat:
+                setattr(self, index_name, FlatPostingsIndex(index, phrase_list, phrase_ids))
+            else:
+                setattr(self, index_name, {skipgram_string: frozenset(index[skipgram_string])
+                                           for skipgram_string in index})
+        self.phrases = frozenset(self.phrases)
+        self.variants = frozenset(self.variants)
+        self.distractors = frozenset(self.distractors)
+        # compute the lazy skipgram distances now, so that reading them doesn't change a shared phrase
+        for phrase in self.phrases.union(self.variants, self.distractors):
+            _ = phrase.skipgram_distance
+        self.frozen = True
+        self.flat_indexes = flat
+
+    def check_not_frozen(self) -> None:
+        """Raise a ValueError if the searcher is frozen."""
+        if self.frozen:
+            raise ValueError(f"{self.__class__.__name__} is frozen, its indexed phrases cannot be changed")
+
+    def get_chunk_overlap(self, include_variants: Union[None, bool] = None) -> int:
+        """Return the number of characters that consecutive windows of a chunked search should overlap,
+        which is the length of the longest registered phrase plus the maximum length variance.
+
+        :param include_variants: boolean flag for whether to include phrase variants for finding matches
+        :type include_variants: Union[None, bool]
+        :return: the window overlap in number of characters
+        :rtype: int
+        """
+        if include_variants is None:
+            include_variants = self.include_variants
+        phrase_lengths = list(self.phrase_model.phrase_length_index.keys())
+        if include_variants:
+            phrase_lengths += list(self.phrase_model.variant_length_index.keys())
+        max_phrase_length = max(phrase_lengths) if len(phrase_lengths) > 0 else 0
+        return max_phrase_length + self.max_length_variance
+
+    def iter_matches_chunked(self, text: Union[str, Dict[str, str]],
+                             chunk_size: Union[None, int] = None,
+                             use_word_boundaries: Union[None, bool] = None,
+                             include_variants: Union[None, bool] = None,
+                             filter_distractors: Union[None, bool] = None,
+                             skip_exact_matching: bool = None) -> Generator[PhraseMatch, None, None]:
+        """Find all fuzzy matching phrases in a long text by searching it in overlapping windows of
+        chunk_size characters, so that memory use depends on the chunk size instead of the text size.
+        Matches are yielded per window, in order of their offset in the text.
+
+        :param text: the text (string or dictionary with 'text' property) to find fuzzy matching phrases in.
+        :type text: Union[str, Dict[str, str]]
+        :param chunk_size: the number of characters per window (defaults to the configured chunk_size)
+        :type chunk_size: Union[None, int]
+        :param use_word_boundaries: use word boundaries in determining match boundaries
+        :type use_word_boundaries: Union[None, bool]
+        :param include_variants: boolean flag for whether to include phrase variants for finding matches
+        :type include_variants: Union[None, bool]
+        :param filter_distractors: boolean flag for whether to remove phrase matches that better match distractors
+        :type filter_distractors: Union[None, bool]
+        :param skip_exact_matching: boolean flag whether to skip the exact matching step
+        :type skip_exact_matching: Union[None, bool]
+        :return: a generator of phrase matches with offsets in the text as a whole
+        :rtype: Generator[PhraseMatch, None, None]
+        """
+        if self.phrase_model is None:
+            raise ValueError("No phrase model indexed")
+        if chunk_size is None:
+            chunk_size = self.chunk_size
+        text = get_text_dict(text)
+        chunk_overlap = self.get_chunk_overlap(include_variants=include_variants)
+        # matches of the previous window that extend into the current window
+        boundary_matches: List[PhraseMatch] = []
+        for chunk_start, chunk_string in get_text_chunks(text["text"], chunk_size, chunk_overlap):
+            previous_char = text["text"][chunk_start - 1] if chunk_start > 0 else ""
+            chunk_matches = self.find_chunk_matches(chunk_string, chunk_start, chunk_size, boundary_matches,
+                                                    text_id=text["id"], previous_char=previous_char,
+                                                    use_word_boundaries=use_word_boundaries,
+                                                    include_variants=include_variants,
+                                                    filter_distractors=filter_distractors,
+                                                    skip_exact_matching=skip_exact_matching)
+            boundary_matches = [match for match in chunk_matches if match.end > chunk_start + chunk_size]
+            for match in chunk_matches:
+                yield match
+
+    def find_chunk_matches(self, chunk_string: str, chunk_start: int, chunk_size: int,
+                           boundary_matches: List[PhraseMatch],
+                           text_id: Union[None, str] = None,
+                           previous_char: str = "",
+                           use_word_boundaries: Union[None, bool] = None,
+                           include_variants: Union[None, bool] = None,
+                           filter_distractors: Union[None, bool] = None,
+                           skip_exact_matching: bool = None) -> List[PhraseMatch]:
+        """Find the matches in a single window of a chunked search. Only matches that start before the
+        end of the window's chunk are returned, matches starting in the overlap are left to the next window.
+
+        :param chunk_string: the text of the window, i.e. the chunk plus the overlap with the next window
+        :type chunk_string: str
+        :param chunk_start: the offset of the window in the text as a whole
+        :type chunk_start: int
+        :param chunk_size: the number of characters between the starts of consecutive windows
+        :type chunk_size: int
+        :param boundary_matches: the matches of the previous window that extend into this window
+        :type boundary_matches: List[PhraseMatch]
+        :param text_id: the identifier of the text as a whole
+        :type text_id: Union[None, str]
+        :param previous_char: the character of the text just before the window (empty for the first window)
+        :type previous_char: str
+        :param use_word_boundaries: use word boundaries in determining match boundaries
+        :type use_word_boundaries: Union[None, bool]
+        :param include_variants: boolean flag for whether to include phrase variants for finding matches
+        :type include_variants: Union[None, bool]
+        :param filter_distractors: boolean flag for whether to remove phrase matches that better match distractors
+        :type filter_distractors: Union[None, bool]
+        :param skip_exact_matching: boolean flag whether to skip the exact matching step
+        :type skip_exact_matching: Union[None, bool]
+        :return: a list of phrase matches with offsets in the text as a whole
+        :rtype: List[PhraseMatch]
+        """
+        chunk_end = chunk_start + chunk_size
+        if use_word_boundaries is None:
+            use_word_boundaries = self.use_word_boundaries
+        partial_word_end = chunk_start
+        if use_word_boundaries and re.match(r"\w", previous_char):
+            # the window starts in the middle of a word, which the window search takes for a word start
+            partial_word_end += re.match(r"\w*", chunk_string).end()
+        chunk_text = {"text": chunk_string, "id": text_id}
+        chunk_matches = FuzzyPhraseSearcher.find_matches(self, chunk_text, use_word_boundaries=use_word_boundaries,
+                                                         include_variants=include_variants,
+                                                         filter_distractors=filter_distractors,
+                                                         skip_exact_matching=skip_exact_matching)
+        selected_matches: List[PhraseMatch] = []
+        for match in chunk_matches:
+            shift_match_offsets(match, chunk_start)
+            if match.offset >= chunk_end:
+                # this match starts in the overlap, the next window will find it
+                continue
+            if match.offset < partial_word_end:
+                # this match starts inside a word that is cut off by the start of the window
+                continue
+            if chunk_start > 0 and 0 < match.phrase.max_offset and \
+                    match.phrase.max_end < match.end + self.max_length_variance:
+                # the phrase is only allowed near the start of the text
+                continue
+            if any(match.phrase.phrase_string == prev_match.phrase.phrase_string and match.overlaps(prev_match)
+                   for prev_match in boundary_matches):
+                # this match is a truncated duplicate of a match crossing the window boundary
+                continue
+            selected_matches.append(match)
+        return selected_matches
+
+    def find_matches_chunked(self, text: Union[str, Dict[str, str]],
+                             chunk_size: Union[None, int] = None,
+                             use_word_boundaries: Union[None, bool] = None,
+                             include_variants: Union[None, bool] = None,
+                             filter_distractors: Union[None, bool] = None,
+                             skip_exact_matching: bool = None) -> List[PhraseMatch]:
+        """Find all fuzzy matching phrases in a long text by searching it in overlapping windows of
+        chunk_size characters. Matches that cross window boundaries are returned only once.
+
+        :param text: the text (string or dictionary with 'text' property) to find fuzzy matching phrases in.
+        :type text: Union[str, Dict[str, str]]
+        :param chunk_size: the number of characters per window (defaults to the configured chunk_size)
+        :type chunk_size: Union[None, int]
+        :param use_word_boundaries: use word boundaries in determining match boundaries
+        :type use_word_boundaries: Union[None, bool]
+        :param include_variants: boolean flag for whether to include phrase variants for finding matches
+        :type include_variants: Union[None, bool]
+        :param filter_distractors: boolean flag for whether to remove phrase matches that better match distractors
+        :type filter_distractors: Union[None, bool]
+        :param skip_exact_matching: boolean flag whether to skip the exact matching step
+        :type skip_exact_matching: Union[None, bool]
+        :return: a list of phrases matches
+        :rtype: List[PhraseMatch]
+        """
+        return list(self.iter_matches_chunked(text, chunk_size=chunk_size, use_word_boundaries=use_word_boundaries,
+                                              include_variants=include_variants,
+                                              filter_distractors=filter_distractors,
+                                              skip_exact_matching=skip_exact_matching))
+
+    def iter_file_matches(self, file_path: str, file_format: Union[None, str] = None,
+                          chunk_size: Union[None, int] = None,
+                          use_word_boundaries: Union[None, bool] = None,
+                          include_variants: Union[None, bool] = None,
+                          filter_distractors: Union[None, bool] = None,
+                          skip_exact_matching: bool = None) -> Generator[PhraseMatch, None, None]:
+        """Find all fuzzy matching phrases in a plain text or JSON lines file, without reading the entire
+        file into memory. The file is memory mapped and decoded incrementally. Plain text files are searched
+        in overlapping windows, with the file path as text identifier. JSON lines files are searched one
+        record at a time. Match offsets are character offsets in the text, as for find_matches, and each
+        match also has the corresponding byte offsets in the UTF-8 encoded text.
+
+        :param file_path: the path of a plain text or JSON lines file
+        :type file_path: str
+        :param file_format: the file format, either 'text' or 'jsonl' (by default based on the file extension)
+        :type file_format: Union[None, str]
+        :param chunk_size: the number of characters per window (defaults to the configured chunk_size)
+        :type chunk_size: Union[None, int]
+        :param use_word_boundaries: use word boundaries in determining match boundaries
+        :type use_word_boundaries: Union[None, bool]
+        :param include_variants: boolean flag for whether to include phrase variants for finding matches
+        :type include_variants: Union[None, bool]
+        :param filter_distractors: boolean flag for whether to remove phrase matches that better match distractors
+        :type filter_distractors: Union[None, bool]
+        :param skip_exact_matching: boolean flag whether to skip the exact matching step
+        :type skip_exact_matching: Union[None, bool]
+        :return: a generator of phrase matches
+        :rtype: Generator[PhraseMatch, None, None]
+        """
+        if self.phrase_model is None:
+            raise ValueError("No phrase model indexed")
+        if chunk_size is None:
+            chunk_size = self.chunk_size
+        if file_format is None:
+            file_format = get_file_format(file_path)
+        if file_format == "jsonl":
+            for line_number, text in read_jsonl_file_records(file_path):
+                text_matches = list(self.iter_matches_chunked(text, chunk_size=chunk_size,
+                                                              use_word_boundaries=use_word_boundaries,
+                                                              include_variants=include_variants,
+                                                              filter_distractors=filter_distractors,
+                                                              skip_exact_matching=skip_exact_matching))
+                add_byte_offsets(text_matches, text["text"])
+                yield from text_matches
+        elif file_format == "text":
+            chunk_overlap = self.get_chunk_overlap(include_variants=include_variants)
+            boundary_matches: List[PhraseMatch] = []
+            previous_char = ""
+            for chunk_start, chunk_byte_start, chunk_string in read_text_file_chunks(file_path, chunk_size,
+                                                                                     chunk_overlap):
+                chunk_matches = self.find_chunk_matches(chunk_string, chunk_start, chunk_size, boundary_matches,
+                                                        text_id=file_path, previous_char=previous_char,
+                                                        use_word_boundaries=use_word_boundaries,
+                                                        include_variants=include_variants,
+                                                        filter_distractors=filter_distractors,
+                                                        skip_exact_matching=skip_exact_matching)
+                boundary_matches = [match for match in chunk_matches if match.end > chunk_start + chunk_size]
+                previous_char = chunk_string[chunk_size - 1:chunk_size]
+                add_byte_offsets(chunk_matches, chunk_string, chunk_start, chunk_byte_start)
+                yield from chunk_matches
+        else:
+            raise ValueError(f"unknown file format '{file_format}', must be 'text' or 'jsonl'")
+
+    def find_matches_in_file(self, file_path: str, file_format: Union[None, str] = None,
+                             chunk_size: Union[None, int] = None,
+                             use_word_boundaries: Union[None, bool] = None,
+                             include_variants: Union[None, bool] = None,
+                             filter_distractors: Union[None, bool] = None,
+                             skip_exact_matching: bool = None) -> List[PhraseMatch]:
+        """Find all fuzzy matching phrases in a plain text or JSON lines file. See iter_file_matches.
+
+        :param file_path: the path of a plain text or JSON lines file
+        :type file_path: str
+        :param file_format: the file format, either 'text' or 'jsonl' (by default based on the file extension)
+        :type file_format: Union[None, str]
+        :param chunk_size: the number of characters per window (defaults to the configured chunk_size)
+        :type chunk_size: Union[None, int]
+        :param use_word_boundaries: use word boundaries in determining match boundaries
+        :type use_word_boundaries: Union[None, bool]
+        :param include_variants: boolean flag for whether to include phrase variants for finding matches
+        :type include_variants: Union[None, bool]
+        :param filter_distractors: boolean flag for whether to remove phrase matches that better match distractors
+        :type filter_distractors: Union[None, bool]
+        :param skip_exact_matching: boolean flag whether to skip the exact matching step
+        :type skip_exact_matching: Union[None, bool]
+        :return: a list of phrases matches
+        :rtype: List[PhraseMatch]
+        """
+        return list(self.iter_file_matches(file_path, file_format=file_format, chunk_size=chunk_size,
+                                           use_word_boundaries=use_word_boundaries,
+                                           include_variants=include_variants,
+                                           filter_distractors=filter_distractors,
+                                           skip_exact_matching=skip_exact_matching))
+
+    def find_matches_batch(self, texts: List[Union[str, Dict[str, str]]], **kwargs) -> List[List[PhraseMatch]]:
+        """Find all fuzzy matching phrases for a batch of texts. Keyword arguments are passed on to find_matches.
+
+        :param texts: a list of texts (strings or dictionaries with 'text' and 'id' properties)
+        :type texts: List[Union[str, Dict[str, str]]]
+        :return: a list of phrase matches per text
+        :rtype: List[List[PhraseMatch]]
+        """
+        return [self.find_matches(text, **kwargs) for text in texts]
+
+    def find_match_table(self, texts: Iterable[Union[str, Dict[str, str]]],
+                         use_word_boundaries: Union[None, bool] = None,
+                         include_variants: Union[None, bool] = None,
+                         filter_distractors: Union[None, bool] = None,
+                         skip_exact_matching: bool = None) -> PhraseMatchTable:
+        """Find all fuzzy matching phrases for a batch of texts and return them as a columnar match table,
+        with parallel columns for text id, phrase id, variant id, offsets and scores. The columns are filled
+        directly from the exact matches and the scored candidates, no PhraseMatch objects are made.
+
+        :param texts: an iterable of texts (strings or dictionaries with 'text' and 'id' properties)
+        :type texts: Iterable[Union[str, Dict[str, str]]]
+        :param use_word_boundaries: use word boundaries in determining match boundaries
+        :type use_word_boundaries: Union[None, bool]
+        :param include_variants: boolean flag for whether to include phrase variants for finding matches
+        :type include_variants: Union[None, bool]
+        :param filter_distractors: boolean flag for whether to remove phrase matches that better match distractors
+        :type filter_distractors: Union[None, bool]
+        :param skip_exact_matching: boolean flag whether to skip the exact matching step
+        :type skip_exact_matching: Union[None, bool]
+        :return: a table of phrase matches
+        :rtype: PhraseMatchTable
+        """
+        match_table = PhraseMatchTable()
+        for text in texts:
+            context = self.make_search_context(text, use_word_boundaries=use_word_boundaries,
+                                               include_variants=include_variants,
+                                               filter_distractors=filter_distractors,
+                                               skip_exact_matching=skip_exact_matching)
+            for match_row in self.search_rows_in_context(context):
+                match_table.add_match_row(match_row, text_id=context.text["id"])
+        return match_table
 
     def find_exact_matches(self, text: Union[str, Dict[str, str]],
                            use_word_boundaries: Union[None, bool] = None,
@@ -715,6 +2167,40 @@ def index_known_word_offsets(exact_matches: List[PhraseMatch]) -> Dict[int, Dict
     return known_word_offset
 
 
+def index_exact_match_ranges(exact_matches: List[PhraseMatch]) -> Dict[str, Tuple[List[int], List[int]]]:
+    """Make a mask of the text ranges that are covered by exact matches, per matched phrase string.
+    The ranges of a phrase are stored as parallel lists of sorted start and end offsets.
+
+    :param exact_matches: a list of exact phrase matches
+    :type exact_matches: List[PhraseMatch]
+    :return: a dictionary of phrase strings and their covered start and end offsets
+    :rtype: Dict[str, Tuple[List[int], List[int]]]
+    """
+    phrase_ranges: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+    for exact_match in exact_matches:
+        phrase_ranges[exact_match.variant.phrase_string].append((exact_match.offset, exact_match.end))
+    exact_match_ranges: Dict[str, Tuple[List[int], List[int]]] = {}
+    for phrase_string, ranges in phrase_ranges.items():
+        ranges.sort()
+        exact_match_ranges[phrase_string] = ([start for start, _ in ranges], [end for _, end in ranges])
+    return exact_match_ranges
+
+
+def in_exact_match_range(match_ranges: Tuple[List[int], List[int]], skipgram: SkipGram) -> bool:
+    """Check if a skipgram lies within one of the ranges covered by exact matches of a phrase.
+
+    :param match_ranges: the sorted start and end offsets of the exact matches of a phrase
+    :type match_ranges: Tuple[List[int], List[int]]
+    :param skipgram: a skipgram from a text
+    :type skipgram: SkipGram
+    :return: a boolean whether the skipgram is covered by an exact match
+    :rtype: bool
+    """
+    starts, ends = match_ranges
+    ri = bisect.bisect_right(starts, skipgram.offset) - 1
+    return ri >= 0 and skipgram.offset + skipgram.length <= ends[ri]
+
+
 def search_exact_phrases(phrase_model: PhraseModel, text: Dict[str, str],
                          ignorecase: bool = False, use_word_boundaries: bool = True,
                          include_variants: bool = False):
@@ -736,12 +2222,94 @@ def add_exact_match_score(match: PhraseMatch) -> PhraseMatch:
 
 def search_exact_phrases_with_word_boundaries(phrase_model: PhraseModel, text: Dict[str, str],
                                               ignorecase: bool = False, include_variants: bool = False):
+    for match_row in search_exact_phrase_rows_with_word_boundaries(phrase_model, text,
+                                                                   include_variants=include_variants):
+        yield make_row_match(match_row, text_id=text["id"])
+
+
+def search_exact_phrases_without_word_boundaries(phrase_model: PhraseModel, text: Dict[str, str],
+                                                 ignorecase: bool = False,
+                                                 include_variants: bool = False):
+    for match_row in search_exact_phrase_rows_without_word_boundaries(phrase_model, text,
+                                                                      include_variants=include_variants):
+        yield make_row_match(match_row, text_id=text["id"])
+
+
+def search_exact_phrase_rows(phrase_model: PhraseModel, text: Dict[str, str], use_word_boundaries: bool = True,
+                             include_variants: bool = False,
+                             phrase_filter: Union[None, Set[str]] = None) -> Generator[MatchRow, None, None]:
+    """Find the exact occurrences of phrases (and optionally their variants) in a text, as match rows.
+
+    :param phrase_model: the phrase model to search the phrases of
+    :type phrase_model: PhraseModel
+    :param text: the text object to search
+    :type text: Dict[str, str]
+    :param use_word_boundaries: whether exact matches must start and end at word boundaries
+    :type use_word_boundaries: bool
+    :param include_variants: whether to include exact occurrences of phrase variants
+    :type include_variants: bool
+    :param phrase_filter: an optional set of phrase and variant strings to restrict the search to
+    :type phrase_filter: Union[None, Set[str]]
+    :return: a generator of match rows
+    :rtype: Generator[MatchRow, None, None]
+    """
+    if use_word_boundaries:
+        return search_exact_phrase_rows_with_word_boundaries(phrase_model, text, include_variants=include_variants,
+                                                             phrase_filter=phrase_filter)
+    else:
+        return search_exact_phrase_rows_without_word_boundaries(phrase_model, text,
+                                                                include_variants=include_variants,
+                                                                phrase_filter=phrase_filter)
+
+
+def get_filtered_phrase_strings(phrase_model: PhraseModel, phrase_filter: Set[str]) -> List[str]:
+    """Return the registered phrase and variant strings of a phrase filter. Variants are only included
+    if their main phrase is in the filter as well.
+
+    :param phrase_model: the phrase model of the phrases
+    :type phrase_model: PhraseModel
+    :param phrase_filter: a set of phrase and variant strings
+    :type phrase_filter: Set[str]
+    :return: the phrase and variant strings to search
+    :rtype: List[str]
+    """
+    return [phrase_string for phrase_string in phrase_filter if phrase_string in phrase_model.phrase_index or
+            phrase_string in phrase_model.variant_index and phrase_model.is_variant_of[phrase_string] in phrase_filter]
+
+
+def index_first_words(phrase_strings: Iterable[str]) -> Dict[str, Dict[str, int]]:
+    """Index phrase strings on their first word, in the same way as the first_word_in_phrase index
+    of a phrase model.
+
+    :param phrase_strings: a list of phrase strings
+    :type phrase_strings: Iterable[str]
+    :return: a dictionary of first words and the offsets of the word in their phrase strings
+    :rtype: Dict[str, Dict[str, int]]
+    """
+    first_word_in_phrase: Dict[str, Dict[str, int]] = defaultdict(dict)
+    for phrase_string in phrase_strings:
+        word = re.search(r"\w+", phrase_string)
+        if word is not None:
+            first_word_in_phrase[word.group(0)][phrase_string] = word.start()
+    return first_word_in_phrase
+
+
+def search_exact_phrase_rows_with_word_boundaries(phrase_model: PhraseModel, text: Dict[str, str],
+                                                  include_variants: bool = False,
+                                                  phrase_filter: Union[None, Set[str]] = None
+                                                  ) -> Generator[MatchRow, None, None]:
+    if phrase_filter is None:
+        first_word_in_phrase = phrase_model.first_word_in_phrase
+    else:
+        # only look up the words that start one of the filtered phrases
+        first_word_in_phrase = index_first_words(get_filtered_phrase_strings(phrase_model, phrase_filter))
     for word in re.finditer(r"\w+", text["text"]):
-        if word.group(0) not in phrase_model.word_in_phrase:
+        if word.group(0) not in first_word_in_phrase:
             continue
         # print("\tword:", word)
-        for phrase_string in phrase_model.first_word_in_phrase[word.group(0)]:
-            phrase_word_offset = phrase_model.first_word_in_phrase[word.group(0)][phrase_string]
+        first_word_phrases = first_word_in_phrase[word.group(0)]
+        for phrase_string in first_word_phrases:
+            phrase_word_offset = first_word_phrases[phrase_string]
             phrase_start = word.start() - phrase_word_offset
             phrase_end = phrase_start + len(phrase_string)
             # print(phrase_start, phrase_end, phrase_string)
@@ -752,35 +2320,39 @@ def search_exact_phrases_with_word_boundaries(phrase_model: PhraseModel, text: D
                     continue
                 if "phrase" in phrase_model.phrase_type[phrase_string]:
                     phrase = phrase_model.phrase_index[phrase_string]
-                    match = PhraseMatch(phrase, phrase, phrase_string, phrase_start, text_id=text["id"])
-                    yield add_exact_match_score(match)
+                    yield make_exact_match_row(phrase, phrase, phrase_start)
                     # print("the matching phrase:", phrase)
                 elif "variant" in phrase_model.phrase_type[phrase_string] and include_variants:
                     variant_phrase = phrase_model.variant_index[phrase_string]
                     main_phrase_string = phrase_model.is_variant_of[phrase_string]
                     main_phrase = phrase_model.phrase_index[main_phrase_string]
-                    match = PhraseMatch(main_phrase, variant_phrase, phrase_string, phrase_start, text_id=text["id"])
-                    yield add_exact_match_score(match)
+                    yield make_exact_match_row(main_phrase, variant_phrase, phrase_start)
 
 
-def search_exact_phrases_without_word_boundaries(phrase_model: PhraseModel, text: Dict[str, str],
-                                                 ignorecase: bool = False,
-                                                 include_variants: bool = False):
-    for phrase_string in phrase_model.phrase_index:
+def search_exact_phrase_rows_without_word_boundaries(phrase_model: PhraseModel, text: Dict[str, str],
+                                                     include_variants: bool = False,
+                                                     phrase_filter: Union[None, Set[str]] = None
+                                                     ) -> Generator[MatchRow, None, None]:
+    if phrase_filter is None:
+        phrase_strings = list(phrase_model.phrase_index)
+        variant_strings = list(phrase_model.variant_index)
+    else:
+        filtered_strings = get_filtered_phrase_strings(phrase_model, phrase_filter)
+        phrase_strings = [phrase_string for phrase_string in filtered_strings
+                          if phrase_string in phrase_model.phrase_index]
+        variant_strings = [phrase_string for phrase_string in filtered_strings
+                           if phrase_string in phrase_model.variant_index]
+    for phrase_string in phrase_strings:
         phrase = phrase_model.phrase_index[phrase_string]
         for match in re.finditer(phrase.exact_string, text["text"]):
-            phrase = phrase_model.phrase_index[phrase_string]
-            match = PhraseMatch(phrase, phrase, phrase_string, match.start(), text_id=text["id"])
-            yield add_exact_match_score(match)
+            yield make_exact_match_row(phrase, phrase, match.start())
     if include_variants:
-        for phrase_string in phrase_model.variant_index:
+        for phrase_string in variant_strings:
             variant_phrase = phrase_model.variant_index[phrase_string]
             for match in re.finditer(variant_phrase.exact_string, text["text"]):
-                variant_phrase = phrase_model.variant_index[phrase_string]
                 main_phrase_string = phrase_model.is_variant_of[phrase_string]
                 main_phrase = phrase_model.phrase_index[main_phrase_string]
-                match = PhraseMatch(main_phrase, variant_phrase, phrase_string, match.start(), text_id=text["id"])
-                yield add_exact_match_score(match)
+                yield make_exact_match_row(main_phrase, variant_phrase, match.start())
 
 
 def search_exact(phrase: Phrase, text: Dict[str, str], ignorecase: bool = False, use_word_boundaries: bool = True):
@@ -0,0 +1,324 @@
+from typing import IO, Dict, List, Union
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker
+from multiprocessing.context import BaseContext
+from multiprocessing.shared_memory import SharedMemory
+import copyreg
+import io
+import multiprocessing
+import pickle
+import struct
+import sys
+import threading
+
+from fuzzy_search.fuzzy_async import init_worker_searcher
+from fuzzy_search.fuzzy_phrase import Phrase
+from fuzzy_search.fuzzy_phrase_model import PhraseModel
+from fuzzy_search.fuzzy_phrase_searcher import FlatPostingsIndex, FuzzyPhraseSearcher, skipgram_index_names
+
+
+# a segment starts with a magic string and the offset and length of the pickled searcher state,
+# followed by the arrays of the flat skipgram indexes, a table with the offset and length of each
+# phrase state, the pickled phrase states and the pickled searcher state
+header_format = "<4sqq"
+header_magic = b"FZSI"
+header_size = struct.calcsize(header_format)
+
+
+class SharedSegment(SharedMemory):
+    """A shared memory segment that stays open while attached searchers still refer to its memory."""
+
+    def close(self) -> None:
+        try:
+            super().close()
+        except BufferError:
+            # the memory is released when the attached searchers are gone
+            pass
+
+
+# the shared memory segments that are published or attached in this process, by name. Attached
+# searchers keep views of the segment memory, so segments stay open as long as the process runs.
+shared_segments: Dict[str, SharedSegment] = {}
+
+# attached searchers are shared between threads, so shared phrases are loaded under a lock
+shared_phrase_lock = threading.Lock()
+
+
+class SharedPhrase(Phrase):
+
+    def __init__(self, buffer: memoryview, offset: int, length: int):
+        """A phrase of a searcher that is attached from shared memory. Its compiled state is only
+        unpickled from the shared memory segment when one of its attributes is first used, so
+        attaching a searcher doesn't need to restore all phrases up front. The state is loaded under a
+        lock, so threads can share an attached searcher. Once loaded, it behaves exactly like the phrase
+        it was published from.
+
+        :param buffer: the memory of the shared memory segment
+        :type buffer: memoryview
+        :param offset: the offset of the pickled phrase state in the segment
+        :type offset: int
+        :param length: the length of the pickled phrase state
+        :type length: int
+        """
+        self._shared_location = (buffer, offset, length)
+
+    def __getattr__(self, name: str):
+        # only called for attributes that are not set, i.e. before the phrase state is loaded or while
+        # another thread is loading it
+        if name.startswith("__"):
+            raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{name}'")
+        if "_shared_location" in self.__dict__:
+            with shared_phrase_lock:
+                # another thread may have loaded the state while this one waited for the lock
+                if "_shared_location" in self.__dict__:
+                    buffer, offset, length = self._shared_location
+                    self.__dict__.update(pickle.loads(buffer[offset:offset + length]))
+                    # the location is removed only after the complete state is loaded
+                    del self.__dict__["_shared_location"]
+        return object.__getattribute__(self, name)
+
+    def __reduce_ex__(self, protocol):
+        # pickled as a regular phrase, e.g. when matches are returned from a worker process
+        return copyreg._reconstructor, (Phrase, object, None), self.__getstate__()
+
+
+def restore_object(cls: type, state: Dict[str, any]) -> any:
+    """Restore an object from its complete attribute state, without calling its constructor or
+    its __setstate__ method.
+
+    :param cls: the class of the object
+    :type cls: type
+    :param state: the attributes of the object
+    :type state: Dict[str, any]
+    :return: the object
+    :rtype: any
+    """
+    obj = cls.__new__(cls)
+    obj.__dict__.update(state)
+    return obj
+
+
+class SearcherStatePickler(pickle.Pickler):
+
+    def __init__(self, file: IO[bytes], phrase_list: List[Phrase]):
+        """A pickler for the state of a searcher that refers to phrases by their number instead of
+        pickling them, so that the phrases can be stored and loaded separately. Phrase models are
+        stored with their complete state, so that unpickling them doesn't rebuild their indexes, and
+        searchers are stored without their skipgram indexes, which are attached separately.
+
+        :param file: the file to write the pickled state to
+        :type file: IO[bytes]
+        :param phrase_list: the phrases that are already numbered, new phrases are added to the list
+        :type phrase_list: List[Phrase]
+        """
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.phrase_list = phrase_list
+        self.phrase_ids = {id(phrase): phrase_id for phrase_id, phrase in enumerate(phrase_list)}
+
+    def persistent_id(self, obj):
+        if not isinstance(obj, Phrase):
+            return None
+        if id(obj) not in self.phrase_ids:
+            self.phrase_ids[id(obj)] = len(self.phrase_list)
+            self.phrase_list.append(obj)
+        return self.phrase_ids[id(obj)]
+
+    def reducer_override(self, obj):
+        if isinstance(obj, PhraseModel):
+            return restore_object, (type(obj), obj.__dict__)
+        if isinstance(obj, FuzzyPhraseSearcher):
+            return restore_object, (type(obj), obj.__getstate__())
+        return NotImplemented
+
+
+class SearcherStateUnpickler(pickle.Unpickler):
+
+    def __init__(self, file: IO[bytes], phrase_list: List[Phrase]):
+        """An unpickler for the state of a searcher that resolves phrase numbers to phrases.
+
+        :param file: the file to read the pickled state from
+        :type file: IO[bytes]
+        :param phrase_list: the phrases by their number
+        :type phrase_list: List[Phrase]
+        """
+        super().__init__(file)
+        self.phrase_list = phrase_list
+
+    def persistent_load(self, pid):
+        return self.phrase_list[pid]
+
+
+def publish_searcher(searcher: FuzzyPhraseSearcher, name: Union[None, str] = None) -> SharedSegment:
+    """Publish a searcher in a new shared memory segment. The searcher is frozen with flat indexes
+    first, if it isn't already. The postings arrays of the skipgram indexes are copied into the
+    segment as they are, each phrase is stored as its pickled compiled state, with its skipgrams,
+    lengths and thresholds, and the rest of the searcher is stored as its pickled state.
+
+    :param searcher: a searcher with an indexed phrase model, e.g. a FuzzyPhraseSearcher or a
+        FuzzyTemplateSearcher
+    :type searcher: FuzzyPhraseSearcher
+    :param name: the name of the segment (defaults to a random name)
+    :type name: Union[None, str]
+    :return: the shared memory segment
+    :rtype: SharedSegment
+    """
+    if not searcher.flat_indexes:
+        searcher.freeze(flat=True)
+    blocks = []
+    index_layout = {}
+    offset = header_size
+    for index_name in skipgram_index_names:
+        flat_index = getattr(searcher, index_name)
+        layout = {"keys": list(flat_index.keys())}
+        for array_name in ["bounds", "postings"]:
+            array_bytes = memoryview(getattr(flat_index, array_name)).cast("B")
+            layout[array_name] = (offset, len(array_bytes))
+            blocks.append(array_bytes)
+            offset += len(array_bytes)
+        index_layout[index_name] = layout
+    # pickling the searcher state numbers the phrases that are not in the skipgram indexes
+    phrase_list = list(searcher.skipgram_index.phrase_list)
+    state_fh = io.BytesIO()
+    SearcherStatePickler(state_fh, phrase_list).dump(searcher)
+    phrase_table = array("q", [0] * (2 * len(phrase_list)))
+    phrase_table_offset = offset
+    offset += phrase_table.itemsize * len(phrase_table)
+    phrase_blocks = []
+    for phrase_id, phrase in enumerate(phrase_list):
+        phrase_bytes = pickle.dumps(phrase.__dict__, protocol=pickle.HIGHEST_PROTOCOL)
+        phrase_table[2 * phrase_id] = offset
+        phrase_table[2 * phrase_id + 1] = len(phrase_bytes)
+        phrase_blocks.append(phrase_bytes)
+        offset += len(phrase_bytes)
+    blocks.append(memoryview(phrase_table).cast("B"))
+    blocks.extend(phrase_blocks)
+    state_bytes = pickle.dumps({
+        "searcher": state_fh.getvalue(),
+        "phrase_table": (phrase_table_offset, len(phrase_list)),
+        "indexes": index_layout
+    }, protocol=pickle.HIGHEST_PROTOCOL)
+    blocks.append(state_bytes)
+    shared_memory = SharedSegment(name=name, create=True, size=offset + len(state_bytes))
+    struct.pack_into(header_format, shared_memory.buf, 0, header_magic, offset, len(state_bytes))
+    block_offset = header_size
+    for block in blocks:
+        shared_memory.buf[block_offset:block_offset + len(block)] = block
+        block_offset += len(block)
+    shared_segments[shared_memory.name] = shared_memory
+    return shared_memory
+
+
+def get_shared_segment(name: str) -> SharedSegment:
+    """Return the shared memory segment with the given name, attaching it if this process hasn't
+    published or attached it before.
+
+    :param name: the name of the segment
+    :type name: str
+    :return: the shared memory segment
+    :rtype: SharedSegment
+    """
+    if name not in shared_segments:
+        # the publishing process is responsible for removing the segment
+        if sys.version_info >= (3, 13):
+            shared_memory = SharedSegment(name=name, track=False)
+        else:
+            shared_memory = SharedSegment(name=name)
+            if multiprocessing.parent_process() is None:
+                # worker processes share the resource tracker of the process that started them, but
+                # an independent process has its own, which would remove the segment when it exits
+                resource_tracker.unregister(shared_memory._name, "shared_memory")
+        shared_segments[name] = shared_memory
+    return shared_segments[name]
+
+
+def attach_searcher(name: str) -> FuzzyPhraseSearcher:
+    """Attach a read-only view of a searcher that was published in shared memory. The skipgram
+    indexes refer directly to the arrays in the shared memory segment, so they are neither copied
+    nor rebuilt, and the phrases are loaded from the segment when they are first used, see
+    SharedPhrase. The attached searcher is frozen.
+
+    :param name: the name of the shared memory segment of the searcher
+    :type name: str
+    :return: the searcher
+    :rtype: FuzzyPhraseSearcher
+    """
+    shared_memory = get_shared_segment(name)
+    magic, state_offset, state_length = struct.unpack_from(header_format, shared_memory.buf, 0)
+    if magic != header_magic:
+        raise ValueError(f"shared memory segment '{name}' doesn't contain a published searcher")
+    buffer = shared_memory.buf
+    state = pickle.loads(buffer[state_offset:state_offset + state_length])
+    phrase_table_offset, num_phrases = state["phrase_table"]
+    phrase_table = buffer[phrase_table_offset:phrase_table_offset + 16 * num_phrases].cast("q")
+    phrase_list = [SharedPhrase(buffer, phrase_table[2 * phrase_id], phrase_table[2 * phrase_id + 1])
+                   for phrase_id in range(num_phrases)]
+    searcher = SearcherStateUnpickler(io.BytesIO(state["searcher"]), phrase_list).load()
+    for index_name, layout in state["indexes"].items():
+        bounds_offset, bounds_length = layout["bounds"]
+        postings_offset, postings_length = layout["postings"]
+        bounds = buffer[bounds_offset:bounds_offset + bounds_length].cast("q")
+        postings = buffer[postings_offset:postings_offset + postings_length].cast("q")
+        setattr(searcher, index_name, FlatPostingsIndex.from_arrays(layout["keys"], bounds, postings,
+                                                                    phrase_list))
+    return searcher
+
+
+def init_shared_worker_searcher(name: str) -> None:
+    """Attach a searcher that was published in shared memory and install it in a worker process.
+
+    :param name: the name of the shared memory segment of the searcher
+    :type name: str
+    """
+    init_worker_searcher(attach_searcher(name))
+
+
+class SharedSearcherIndex:
+
+    def __init__(self, searcher: FuzzyPhraseSearcher, name: Union[None, str] = None):
+        """Publish a searcher once in shared memory, so that worker processes that are started with
+        any start method, including 'spawn', attach a read-only view of it instead of rebuilding or
+        unpickling the whole index. Close the shared index to remove the shared memory segment when
+        the workers are done.
+
+        :param searcher: a searcher with an indexed phrase model, e.g. a FuzzyPhraseSearcher or a
+            FuzzyTemplateSearcher
+        :type searcher: FuzzyPhraseSearcher
+        :param name: the name of the shared memory segment (defaults to a random name)
+        :type name: Union[None, str]
+        """
+        self.shared_memory = publish_searcher(searcher, name=name)
+        self.name = self.shared_memory.name
+        self.size = self.shared_memory.size
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(name={self.name}, size={self.size})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def make_executor(self, max_workers: Union[None, int] = None,
+                      mp_context: Union[None, BaseContext] = None) -> ProcessPoolExecutor:
+        """Make a process pool executor of which each worker process attaches the shared searcher
+        when it starts.
+
+        :param max_workers: the maximum number of worker processes (defaults to the number of processors)
+        :type max_workers: Union[None, int]
+        :param mp_context: the multiprocessing context for starting the workers (defaults to the
+            default start method)
+        :type mp_context: Union[None, BaseContext]
+        :return: a process pool executor
+        :rtype: ProcessPoolExecutor
+        """
+        return ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context,
+                                   initializer=init_shared_worker_searcher, initargs=(self.name,))
+
+    def close(self) -> None:
+        """Remove the shared memory segment. Worker processes that attached the searcher can keep
+        using it until they exit."""
+        shared_segments.pop(self.name, None)
+        self.shared_memory.close()
+        self.shared_memory.unlink()
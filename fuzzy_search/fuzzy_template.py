@@ -179,6 +179,8 @@ class FuzzyTemplate:
         self.groups: Set[FuzzyTemplateGroupElement] = set()
         self.required: Set[FuzzyTemplateLabelElement] = set()
         self.label_element_index: Dict[str, FuzzyTemplateLabelElement] = {}
+        # each template label gets a bit, so sets of labels can be compared as bitmasks
+        self.label_bit: Dict[str, int] = {}
         self.group_element_index: Dict[str, FuzzyTemplateGroupElement] = {}
         self.root_element = None
         self.ignore_unknown = ignore_unknown
@@ -199,6 +201,22 @@ class FuzzyTemplate:
             return []
         return [self.phrase_model.phrase_index[phrase_string] for phrase_string in self.phrase_model.is_label_of[label]]
 
+    def get_label_mask(self, label: Union[None, str, List[str]]) -> int:
+        """Return the bitmask of a label or list of labels. Labels that are not part of the template
+        have no bit.
+
+        :param label: a label or list of labels of a template element or phrase match
+        :type label: Union[None, str, List[str]]
+        :return: the bitmask of the template labels
+        :rtype: int
+        """
+        if isinstance(label, list):
+            mask = 0
+            for label_item in label:
+                mask |= self.label_bit.get(label_item, 0)
+            return mask
+        return self.label_bit.get(label, 0)
+
     def has_label(self, label: Union[str, List[str]], ) -> bool:
         """Check if the template has label elements with a given label or list of label (any or all).
 
@@ -328,6 +346,8 @@ class FuzzyTemplate:
         # register the label element as part of the template
         self.label_element_index[element.label] = element
         self.labels.add(element.label)
+        if element.label not in self.label_bit:
+            self.label_bit[element.label] = 1 << len(self.label_bit)
         if element.required:
             # keep track of all label elements that are required
             self.required.add(element)
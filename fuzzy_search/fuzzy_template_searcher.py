@@ -1,7 +1,11 @@
-from typing import Dict, List, Union
+from typing import Dict, Iterable, List, Set, Tuple, Union
+from collections import defaultdict
+import bisect
 
 from fuzzy_search.fuzzy_match import PhraseMatch
-from fuzzy_search.fuzzy_phrase_model import PhraseModel
+from fuzzy_search.fuzzy_phrase_model import PhraseModel, merge_phrase_models
+from fuzzy_search.fuzzy_phrase_searcher import FuzzyPhraseSearcher, get_text_dict, shift_match_offsets
+from fuzzy_search.fuzzy_phrase_searcher import select_non_overlapping_matches
 from fuzzy_search.fuzzy_template import FuzzyTemplate, FuzzyTemplateElement, FuzzyTemplateGroupElement
 from fuzzy_search.fuzzy_context_searcher import FuzzyContextSearcher
 
@@ -57,6 +61,48 @@ def has_required_matches(phrase_matches: List[PhraseMatch], template: FuzzyTempl
     return True
 
 
+def get_label_phrase_strings(phrase_model: PhraseModel, labels: Iterable[str]) -> Set[str]:
+    """Return the strings of all phrases in a phrase model that have at least one of the given labels.
+
+    :param phrase_model: a phrase model
+    :type phrase_model: PhraseModel
+    :param labels: a list of phrase labels
+    :type labels: Iterable[str]
+    :return: the set of phrase strings
+    :rtype: Set[str]
+    """
+    phrase_strings: Set[str] = set()
+    for label in labels:
+        if label in phrase_model.is_label_of:
+            phrase_strings.update(phrase_model.is_label_of[label])
+    return phrase_strings
+
+
+def get_match_windows(phrase_matches: List[PhraseMatch], window_size: int,
+                      text_length: int) -> List[Tuple[int, int]]:
+    """Return the text windows that extend window_size characters before and after each phrase match,
+    with overlapping windows merged.
+
+    :param phrase_matches: a list of phrase matches
+    :type phrase_matches: List[PhraseMatch]
+    :param window_size: the number of characters before and after a match to include in its window
+    :type window_size: int
+    :param text_length: the length of the text that the matches were found in
+    :type text_length: int
+    :return: a sorted list of (start, end) windows
+    :rtype: List[Tuple[int, int]]
+    """
+    windows: List[Tuple[int, int]] = []
+    for phrase_match in sorted(phrase_matches, key=lambda x: x.offset):
+        start = max(0, phrase_match.offset - window_size)
+        end = min(text_length, phrase_match.end + window_size)
+        if len(windows) > 0 and start <= windows[-1][1]:
+            windows[-1] = (windows[-1][0], max(end, windows[-1][1]))
+        else:
+            windows.append((start, end))
+    return windows
+
+
 class TemplateMatch:
 
     def __init__(self, template: FuzzyTemplate, phrase_matches: List[PhraseMatch],
@@ -79,6 +125,81 @@ class TemplateMatch:
         return f"{self.__class__.__name__}(template={self.template}, element_matches={self.element_matches})"
 
 
+class TemplateMatchSequence(list):
+
+    def __init__(self, phrase_matches: List[PhraseMatch], template: FuzzyTemplate):
+        """A list of phrase matches, sorted by offset, compiled against the labels of a template. Each match
+        gets the bitmask of its template labels and each label gets the sorted list of positions of its matches,
+        so that the next match of a template element and the end of its run of matches can be looked up
+        without scanning the list.
+
+        :param phrase_matches: a list of phrase matches sorted by offset
+        :type phrase_matches: List[PhraseMatch]
+        :param template: the template to compile the phrase matches against
+        :type template: FuzzyTemplate
+        """
+        super().__init__(phrase_matches)
+        self.template = template
+        self.label_masks: List[int] = [template.get_label_mask(phrase_match.label) for phrase_match in self]
+        self.label_positions: Dict[int, List[int]] = defaultdict(list)
+        for position, label_mask in enumerate(self.label_masks):
+            for label_bit in template.label_bit.values():
+                if label_mask & label_bit:
+                    self.label_positions[label_bit].append(position)
+        # the position lists and run ends per element mask are computed on first use
+        self.mask_positions: Dict[int, List[int]] = {}
+        self.mask_run_ends: Dict[int, List[int]] = {}
+
+    def get_mask_positions(self, mask: int) -> List[int]:
+        """Return the sorted positions of the phrase matches that have at least one label of a bitmask.
+
+        :param mask: a bitmask of template labels
+        :type mask: int
+        :return: the sorted list of positions
+        :rtype: List[int]
+        """
+        if mask not in self.mask_positions:
+            positions: Set[int] = set()
+            for label_bit, label_positions in self.label_positions.items():
+                if mask & label_bit:
+                    positions.update(label_positions)
+            self.mask_positions[mask] = sorted(positions)
+        return self.mask_positions[mask]
+
+    def find_next_start(self, mask: int, start_index: int) -> int:
+        """Return the position of the next phrase match from start_index that has a label of a bitmask,
+        or -1 if there is none.
+
+        :param mask: a bitmask of template labels
+        :type mask: int
+        :param start_index: the position to start from
+        :type start_index: int
+        :return: the position of the next phrase match with a label of the bitmask
+        :rtype: int
+        """
+        positions = self.get_mask_positions(mask)
+        pi = bisect.bisect_left(positions, start_index)
+        return positions[pi] if pi < len(positions) else -1
+
+    def find_run_end(self, mask: int, start_index: int) -> int:
+        """Return the position of the first phrase match from start_index that has no label of a bitmask,
+        or the length of the list if all remaining phrase matches have a label of the bitmask.
+
+        :param mask: a bitmask of template labels
+        :type mask: int
+        :param start_index: the position to start from
+        :type start_index: int
+        :return: the position where the run of phrase matches with a label of the bitmask ends
+        :rtype: int
+        """
+        if mask not in self.mask_run_ends:
+            run_ends = [len(self)] * (len(self) + 1)
+            for position in range(len(self) - 1, -1, -1):
+                run_ends[position] = run_ends[position + 1] if self.label_masks[position] & mask else position
+            self.mask_run_ends[mask] = run_ends
+        return self.mask_run_ends[mask][start_index]
+
+
 def find_next_element_start_index(phrase_matches: List[PhraseMatch],
                                   template_element: FuzzyTemplateElement,
                                   template_start_index: int) -> int:
@@ -98,13 +219,14 @@ def find_next_element_start_index(phrase_matches: List[PhraseMatch],
     # if isinstance(template_element, FuzzyTemplateGroupElement):
         # print(template_element.group_element_labels)
     # print("finding start index:")
-    for phrase_match in phrase_matches[template_start_index:]:
-        if share_label(template_element, phrase_match):
-            # print(phrase_matches.index(phrase_match), "phrase_match label:", phrase_match.label)
-            # print(phrase_matches.index(phrase_match), "shared label")
+    if isinstance(phrase_matches, TemplateMatchSequence):
+        element_mask = phrase_matches.template.get_label_mask(template_element.label)
+        return phrase_matches.find_next_start(element_mask, template_start_index)
+    for match_index in range(template_start_index, len(phrase_matches)):
+        if share_label(template_element, phrase_matches[match_index]):
             # print("returning start for template element:", template_element.label, template_element.type,
             #       template_start_index)
-            return phrase_matches.index(phrase_match)
+            return match_index
     return -1
 
 
@@ -126,12 +248,14 @@ def find_next_element_end_index(phrase_matches: List[PhraseMatch],
     if element_start_index == -1:
         return -1
     # print("template element finding end:", template_element.label, template_element.type)
-    for phrase_match in phrase_matches[element_start_index:]:
-        if not share_label(template_element, phrase_match):
+    if isinstance(phrase_matches, TemplateMatchSequence):
+        element_mask = phrase_matches.template.get_label_mask(template_element.label)
+        return phrase_matches.find_run_end(element_mask, element_start_index)
+    for match_index in range(element_start_index, len(phrase_matches)):
+        if not share_label(template_element, phrase_matches[match_index]):
             # this is the first phrase match after the start index that does not fit
             # the template element, so the sequence ends here
-            # print("element end index:", phrase_matches.index(phrase_match))
-            return phrase_matches.index(phrase_match)
+            return match_index
     # if all phrases matches after element start fit the element's label(s),
     # the end index is the end of the phrase matches
     return len(phrase_matches)
@@ -461,6 +585,65 @@ def find_next_group_match_sequence(phrase_matches: List[PhraseMatch],
         return sequence
 
 
+def filter_template_phrase_matches(phrase_matches: List[PhraseMatch], template: FuzzyTemplate) -> List[PhraseMatch]:
+    """Filter a list of phrase matches to only include phrase matches that have at least one label in
+    common with a template. If a required label of the template has no match, no phrase matches are returned.
+
+    :param phrase_matches: a list of phrase matches
+    :type phrase_matches: List[PhraseMatch]
+    :param template: a fuzzy template
+    :type template: FuzzyTemplate
+    :return: a filtered list of phrases matches
+    :rtype: List[PhraseMatch]
+    """
+    # first, check if required elements are present
+    if not has_required_matches(phrase_matches, template):
+        return []
+    # second, remove phrase matches that have no label that is part of the template
+    return [phrase_match for phrase_match in phrase_matches if template.has_label(phrase_match.label)]
+
+
+def find_template_matches(phrase_matches: List[PhraseMatch], template: FuzzyTemplate) -> List[TemplateMatch]:
+    """Find all the matches that fit a template. The function returns a list of template matches, where
+    each template match contains the phrase match that fit the template. There can be multiple
+    template matches, if the phrase matches fit a template multiple times.
+
+    :param phrase_matches: a list of phrase matches
+    :type phrase_matches: List[PhraseMatch]
+    :param template: a fuzzy template
+    :type template: FuzzyTemplate
+    :return: a list of template matches
+    :rtype: List[TemplateMatch]
+    """
+    template_matches: List[TemplateMatch] = []
+    # make sure the matches are sorted in order of occurrence in the text
+    template_phrase_matches = filter_template_phrase_matches(sorted(phrase_matches, key=lambda x: x.offset), template)
+    # compile the label sequence once, so that elements are found by lookup instead of by scanning
+    template_phrase_matches = TemplateMatchSequence(template_phrase_matches, template)
+    sequence_start_index = 0
+    # print("num matches:", len(template_phrase_matches))
+    # for phrase_match in template_phrase_matches:
+    #     print("\t", phrase_match.label, phrase_match.phrase.phrase_string, "\t", phrase_match.string)
+    while sequence_start_index < len(template_phrase_matches):
+        if DEBUG:
+            print("sequence_start_index:", sequence_start_index)
+        template_sequence = find_next_group_match_sequence(template_phrase_matches, template.root_element,
+                                                           sequence_start_index)
+        if template_sequence is None:
+            break
+        else:
+            sequence_start_index = template_sequence["end"]
+            sequence_matches = template_phrase_matches[template_sequence["start"]:template_sequence["end"]]
+            template_match = TemplateMatch(template=template, phrase_matches=sequence_matches,
+                                           template_sequence=template_sequence)
+            template_matches.append(template_match)
+        if DEBUG:
+            print("template_sequence:", template_sequence["start"], template_sequence["end"])
+        # print("updated sequence_start_index:", sequence_start_index)
+        # print("\n\n")
+    return template_matches
+
+
 class FuzzyTemplateSearcher(FuzzyContextSearcher):
 
     def __init__(self, template: Union[None, FuzzyTemplate] = None, config: Union[None, dict] = None):
@@ -474,6 +657,10 @@ class FuzzyTemplateSearcher(FuzzyContextSearcher):
         :param searcher_config: an optional configuration dictionary to configure the FuzzyTemplateSearcher
         """
         super().__init__(config=config)
+        # the number of characters around matches of required labels to search for the other template labels
+        self.template_window_size: Union[None, int] = None
+        if config is not None:
+            self.configure_template(config)
         self.template: Union[None, FuzzyTemplate] = template if template else None
         self.phrase_model: Union[None, PhraseModel] = template.phrase_model if template else None
         if self.phrase_model:
@@ -482,6 +669,16 @@ class FuzzyTemplateSearcher(FuzzyContextSearcher):
     def __repr__(self):
         return f"{self.__class__.__name__}(template={self.template})"
 
+    def configure_template(self, config: dict) -> None:
+        """Configure the template searcher.
+
+        :param config: a dictionary with configuration parameters to override the defaults
+        :type config: dict
+        """
+        self.configure_context(config)
+        if "template_window_size" in config:
+            self.template_window_size = config["template_window_size"]
+
     def set_template(self, template: FuzzyTemplate) -> None:
         """Set a new template for the searcher and index the corresponding phrase model.
 
@@ -504,11 +701,49 @@ class FuzzyTemplateSearcher(FuzzyContextSearcher):
         """
         if not self.template:
             raise ValueError("No fuzzy search template registered.")
-        phrase_matches = self.find_matches(text)
+        phrase_matches = self.find_template_phrase_matches(text)
         template_matches = self.find_template_matches(phrase_matches)
         return template_matches
         # return {"phrase_matches": phrase_matches, "template_matches": template_matches}
 
+    def find_template_phrase_matches(self, text: Union[str, Dict[str, str]]) -> List[PhraseMatch]:
+        """Find the matches of the phrases of the template labels in a text. The phrases of the required labels
+        are searched first. If a required label has no match, the text can't match the template and the
+        search stops. Otherwise, the phrases of the other labels are searched, either in the whole text or,
+        if template_window_size is configured, only in windows around the matches of the required labels.
+
+        :param text: a text to search in, either as a string or a dictionary with text and an identifier
+        :type text: Union[str, Dict[str, str]]
+        :return: a list of phrase matches with context, sorted by offset
+        :rtype: List[PhraseMatch]
+        """
+        text = get_text_dict(text, ignorecase=self.ignorecase)
+        template_phrases = get_label_phrase_strings(self.phrase_model, self.template.labels)
+        required_phrases = get_label_phrase_strings(self.phrase_model, self.template.get_required_labels())
+        if len(required_phrases) == 0:
+            return self.find_matches(text, phrases=template_phrases)
+        required_matches = self.find_matches(text, phrases=required_phrases)
+        if not has_required_matches(required_matches, self.template):
+            return []
+        other_phrases = template_phrases.difference(required_phrases)
+        if len(other_phrases) == 0:
+            return required_matches
+        if self.template_window_size is None:
+            other_matches = self.find_matches(text, phrases=other_phrases)
+        else:
+            other_matches = []
+            for window_start, window_end in get_match_windows(required_matches, self.template_window_size,
+                                                              len(text["text"])):
+                window = {"text": text["text"][window_start:window_end], "id": text["id"]}
+                # search without context, the context is taken from the text as a whole
+                for match in FuzzyPhraseSearcher.find_matches(self, window, phrases=other_phrases):
+                    shift_match_offsets(match, window_start)
+                    other_matches.append(self.add_match_context(match, text))
+        phrase_matches = sorted(required_matches + other_matches, key=lambda x: x.offset)
+        if not self.allow_overlapping_matches:
+            phrase_matches = select_non_overlapping_matches(phrase_matches)
+        return phrase_matches
+
     def filter_phrase_matches(self, phrase_matches: List[PhraseMatch]) -> List[PhraseMatch]:
         """Filter a list of phrase matches to only include phrase matches that have at least one label in
         common with the template.
@@ -518,11 +753,7 @@ class FuzzyTemplateSearcher(FuzzyContextSearcher):
         :return: a filtered list of phrases matches
         :rtype: List[PhraseMatch]
         """
-        # first, check if required elements are present
-        if not has_required_matches(phrase_matches, self.template):
-            return []
-        # second, remove phrase matches that have no label that is part of the template
-        return [phrase_match for phrase_match in phrase_matches if self.template.has_label(phrase_match.label)]
+        return filter_template_phrase_matches(phrase_matches, self.template)
 
     def find_template_matches(self, phrase_matches: List[PhraseMatch]) -> List[TemplateMatch]:
         """Find all the matches that fit a template. The method returns a list of template matches, where
@@ -534,28 +765,54 @@ class FuzzyTemplateSearcher(FuzzyContextSearcher):
         :return: a list of template matches
         :rtype: List[TemplateMatch]
         """
-        template_matches: List[TemplateMatch] = []
-        # make sure the matches are sorted in order of occurrence in the text
-        template_phrase_matches = self.filter_phrase_matches(sorted(phrase_matches, key=lambda x: x.offset))
-        sequence_start_index = 0
-        # print("num matches:", len(template_phrase_matches))
-        # for phrase_match in template_phrase_matches:
-        #     print("\t", phrase_match.label, phrase_match.phrase.phrase_string, "\t", phrase_match.string)
-        while sequence_start_index < len(template_phrase_matches):
-            if DEBUG:
-                print("sequence_start_index:", sequence_start_index)
-            template_sequence = find_next_group_match_sequence(template_phrase_matches, self.template.root_element,
-                                                               sequence_start_index)
-            if template_sequence is None:
-                break
-            else:
-                sequence_start_index = template_sequence["end"]
-                sequence_matches = phrase_matches[template_sequence["start"]:template_sequence["end"]]
-                template_match = TemplateMatch(template=self.template, phrase_matches=sequence_matches,
-                                               template_sequence=template_sequence)
-                template_matches.append(template_match)
-            if DEBUG:
-                print("template_sequence:", template_sequence["start"], template_sequence["end"])
-            # print("updated sequence_start_index:", sequence_start_index)
-            # print("\n\n")
-        return template_matches
+        return find_template_matches(phrase_matches, self.template)
+
+
+class MultiTemplateSearcher(FuzzyContextSearcher):
+
+    def __init__(self, templates: Dict[str, FuzzyTemplate], config: Union[None, dict] = None):
+        """A fuzzy searcher for matching texts against multiple templates at once. The phrase models of the
+        templates are merged and indexed once, so each text is searched for phrases only once. The phrase
+        matches are then checked against each template, which is the only step whose cost grows with the
+        number of templates.
+
+        :param templates: a dictionary of template names and fuzzy templates
+        :type templates: Dict[str, FuzzyTemplate]
+        :param config: an optional configuration dictionary to configure the searcher
+        :type config: Union[None, dict]
+        """
+        super().__init__(config=config)
+        self.templates: Dict[str, FuzzyTemplate] = dict(templates)
+        phrase_models = [template.phrase_model for template in self.templates.values()]
+        model_config = {"ngram_size": self.ngram_size, "skip_size": self.skip_size}
+        self.index_phrase_model(merge_phrase_models(phrase_models, config=model_config))
+        # only phrases with a label of one of the templates are searched
+        template_labels = set.union(set(), *[template.labels for template in self.templates.values()])
+        self.template_phrases = get_label_phrase_strings(self.phrase_model, template_labels)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(templates={list(self.templates.keys())})"
+
+    def search_text(self, text: Union[str, Dict[str, str]]) -> Dict[str, List[TemplateMatch]]:
+        """Search the phrases of all templates in a text in a single pass and check which templates
+        the phrase matches fit.
+
+        :param text: a text to search in, either as a string or a dictionary with text and an identifier
+        :type text: Union[str, Dict[str, str]]
+        :return: a dictionary of template names and their template matches
+        :rtype: Dict[str, List[TemplateMatch]]
+        """
+        phrase_matches = self.find_matches(text, phrases=self.template_phrases)
+        return self.find_template_matches(phrase_matches)
+
+    def find_template_matches(self, phrase_matches: List[PhraseMatch]) -> Dict[str, List[TemplateMatch]]:
+        """Find the matches of each template in a list of phrase matches.
+
+        :param phrase_matches: a list of phrase matches
+        :type phrase_matches: List[PhraseMatch]
+        :return: a dictionary of template names and their template matches
+        :rtype: Dict[str, List[TemplateMatch]]
+        """
+        phrase_matches = sorted(phrase_matches, key=lambda x: x.offset)
+        return {template_name: find_template_matches(phrase_matches, template)
+                for template_name, template in self.templates.items()}
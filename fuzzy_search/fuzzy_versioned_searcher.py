@@ -0,0 +1,171 @@
+from typing import Dict, List, Tuple, Union
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+
+from fuzzy_search.fuzzy_match import PhraseMatch
+from fuzzy_search.fuzzy_phrase_model import PhraseModel
+from fuzzy_search.fuzzy_phrase_searcher import FuzzyPhraseSearcher
+
+
+class VersionedSearcher:
+
+    def __init__(self, searcher: Union[None, FuzzyPhraseSearcher] = None,
+                 version: Union[None, int, str] = None,
+                 config: Union[None, Dict[str, any]] = None):
+        """A handle to a versioned searcher, of which the phrase model can be replaced while the handle
+        is in use. A new searcher is built and indexed (optionally in a background thread) and then swapped
+        in atomically. Searches that are in progress finish on the searcher they started with, and every
+        match is tagged with the version of the phrase model that produced it.
+
+        :param searcher: an optional searcher with an indexed phrase model to start with
+        :type searcher: Union[None, FuzzyPhraseSearcher]
+        :param version: the version of the phrase model of the initial searcher (defaults to 1)
+        :type version: Union[None, int, str]
+        :param config: the configuration for building new searchers (defaults to the config of the
+            initial searcher)
+        :type config: Union[None, Dict[str, any]]
+        """
+        if config is None and searcher is not None:
+            config = searcher.config
+        self.config = config
+        self._current: Tuple[Union[None, int, str], Union[None, FuzzyPhraseSearcher]] = (None, None)
+        self._num_versions = 0
+        # serialises updates, searches never need to take the lock
+        self._update_lock = threading.Lock()
+        self._executor: Union[None, ThreadPoolExecutor] = None
+        if searcher is not None:
+            self.swap(searcher, version=version)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(version: {self.version})"
+
+    @property
+    def version(self) -> Union[None, int, str]:
+        """The version of the phrase model of the current searcher."""
+        return self._current[0]
+
+    @property
+    def searcher(self) -> Union[None, FuzzyPhraseSearcher]:
+        """The current searcher."""
+        return self._current[1]
+
+    def snapshot(self) -> Tuple[Union[None, int, str], FuzzyPhraseSearcher]:
+        """Return the current version and searcher as a consistent pair. Use this when making several
+        calls that should all use the same version of the phrase model.
+
+        :return: a tuple of the current version and searcher
+        :rtype: Tuple[Union[None, int, str], FuzzyPhraseSearcher]
+        """
+        version, searcher = self._current
+        if searcher is None:
+            raise ValueError("No searcher has been loaded")
+        return version, searcher
+
+    def build_searcher(self, phrase_model: Union[List[Dict[str, any]], PhraseModel]) -> FuzzyPhraseSearcher:
+        """Build a new searcher for a phrase model. Override this method to build other types of searchers.
+
+        :param phrase_model: a phrase model, either as list of phrase dictionaries or as PhraseModel object
+        :type phrase_model: Union[List[Dict[str, any]], PhraseModel]
+        :return: a searcher with the phrase model indexed
+        :rtype: FuzzyPhraseSearcher
+        """
+        searcher = FuzzyPhraseSearcher(self.config)
+        searcher.index_phrase_model(phrase_model)
+        return searcher
+
+    def swap(self, searcher: FuzzyPhraseSearcher, version: Union[None, int, str] = None) -> Union[int, str]:
+        """Atomically replace the current searcher with a searcher that has already been indexed.
+
+        :param searcher: a searcher with an indexed phrase model
+        :type searcher: FuzzyPhraseSearcher
+        :param version: the version of the phrase model (defaults to the number of loaded versions)
+        :type version: Union[None, int, str]
+        :return: the version of the new searcher
+        :rtype: Union[int, str]
+        """
+        with self._update_lock:
+            self._num_versions += 1
+            if version is None:
+                version = self._num_versions
+            # a single assignment, so searches see either the old or the new pair, never a mix
+            self._current = (version, searcher)
+        return version
+
+    def update(self, phrase_model: Union[List[Dict[str, any]], PhraseModel],
+               version: Union[None, int, str] = None) -> Union[int, str]:
+        """Build and index a searcher for a new phrase model and swap it in.
+
+        :param phrase_model: a phrase model, either as list of phrase dictionaries or as PhraseModel object
+        :type phrase_model: Union[List[Dict[str, any]], PhraseModel]
+        :param version: the version of the phrase model (defaults to the number of loaded versions)
+        :type version: Union[None, int, str]
+        :return: the version of the new searcher
+        :rtype: Union[int, str]
+        """
+        return self.swap(self.build_searcher(phrase_model), version=version)
+
+    def update_in_background(self, phrase_model: Union[List[Dict[str, any]], PhraseModel],
+                             version: Union[None, int, str] = None) -> Future:
+        """Build and index a searcher for a new phrase model in a background thread and swap it in when it
+        is ready. The current searcher keeps serving searches in the meantime. Background updates are
+        applied in the order in which they are submitted.
+
+        :param phrase_model: a phrase model, either as list of phrase dictionaries or as PhraseModel object
+        :type phrase_model: Union[List[Dict[str, any]], PhraseModel]
+        :param version: the version of the phrase model (defaults to the number of loaded versions)
+        :type version: Union[None, int, str]
+        :return: a future that resolves to the version of the new searcher
+        :rtype: Future
+        """
+        with self._update_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="searcher-update")
+        return self._executor.submit(self.update, phrase_model, version)
+
+    def close(self) -> None:
+        """Wait for pending background updates and stop the update thread."""
+        with self._update_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def find_matches(self, text: Union[str, Dict[str, str]], **kwargs) -> List[PhraseMatch]:
+        """Find all fuzzy matching phrases for a given text with the current searcher. The matches are
+        tagged with the version of the phrase model that was used. Keyword arguments are passed on to
+        the find_matches method of the searcher.
+
+        :param text: the text (string or dictionary with 'text' property) to find fuzzy matching phrases in.
+        :type text: Union[str, Dict[str, str]]
+        :return: a list of phrases matches
+        :rtype: List[PhraseMatch]
+        """
+        version, searcher = self.snapshot()
+        return tag_model_version(searcher.find_matches(text, **kwargs), version)
+
+    def find_matches_chunked(self, text: Union[str, Dict[str, str]], **kwargs) -> List[PhraseMatch]:
+        """Find all fuzzy matching phrases in a long text with the current searcher, searching the text
+        in overlapping windows. The matches are tagged with the version of the phrase model that was used.
+        Keyword arguments are passed on to the find_matches_chunked method of the searcher.
+
+        :param text: the text (string or dictionary with 'text' property) to find fuzzy matching phrases in.
+        :type text: Union[str, Dict[str, str]]
+        :return: a list of phrases matches
+        :rtype: List[PhraseMatch]
+        """
+        version, searcher = self.snapshot()
+        return tag_model_version(searcher.find_matches_chunked(text, **kwargs), version)
+
+
+def tag_model_version(matches: List[PhraseMatch], version: Union[None, int, str]) -> List[PhraseMatch]:
+    """Tag a list of matches with the version of the phrase model that produced them.
+
+    :param matches: a list of phrase matches
+    :type matches: List[PhraseMatch]
+    :param version: the version of the phrase model
+    :type version: Union[None, int, str]
+    :return: the list of tagged phrase matches
+    :rtype: List[PhraseMatch]
+    """
+    for match in matches:
+        match.model_version = version
+    return matches
@@ -0,0 +1,151 @@
+from unittest import TestCase, skipUnless
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import gc
+import multiprocessing
+import threading
+
+from fuzzy_search.fuzzy_async import AsyncSearcher, make_batch_key, make_prefork_executor, make_process_executor
+from fuzzy_search.fuzzy_async import run_searcher_method
+from fuzzy_search.fuzzy_phrase_model import PhraseModel
+from fuzzy_search.fuzzy_phrase_searcher import FuzzyPhraseSearcher
+from fuzzy_search.fuzzy_template import FuzzyTemplate
+from fuzzy_search.fuzzy_template_searcher import FuzzyTemplateSearcher
+
+
+class TestAsyncSearch(TestCase):
+
+    def setUp(self) -> None:
+        self.searcher = FuzzyPhraseSearcher({"max_length_variance": 1})
+        self.searcher.index_phrase_model([{"phrase": "Missive"}, {"phrase": "Gouverneur Generaal"}])
+        self.searcher.freeze()
+        self.texts = [{"id": f"text{ti}", "text": f"Ontfangen {ti} Missive van den Gouverneur Generaal."}
+                      for ti in range(10)]
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.async_searcher = AsyncSearcher(self.searcher, executor=self.executor)
+
+    def tearDown(self) -> None:
+        self.executor.shutdown()
+
+    def get_json(self, matches):
+        return [match.json() for match in matches]
+
+    def test_afind_matches_returns_same_matches(self):
+        matches = asyncio.run(self.async_searcher.afind_matches(self.texts[0]))
+        self.assertEqual(self.get_json(matches), self.get_json(self.searcher.find_matches(self.texts[0])))
+
+    def test_afind_matches_batch(self):
+        results = asyncio.run(self.async_searcher.afind_matches_batch(self.texts))
+        expected = self.searcher.find_matches_batch(self.texts)
+        self.assertEqual([self.get_json(matches) for matches in results],
+                         [self.get_json(matches) for matches in expected])
+
+    def test_micro_batching_combines_concurrent_requests(self):
+        dispatched = []
+        dispatch_search = self.async_searcher.dispatch_search
+
+        async def counting_dispatch(method_name, texts, kwargs, deadlines=None):
+            dispatched.append(len(texts))
+            return await dispatch_search(method_name, texts, kwargs, deadlines)
+
+        self.async_searcher.dispatch_search = counting_dispatch
+        self.async_searcher.enable_micro_batching(max_batch_size=4, max_delay=0.05)
+
+        async def search_all():
+            return await asyncio.gather(*[self.async_searcher.afind_matches(text) for text in self.texts])
+
+        results = asyncio.run(search_all())
+        self.assertEqual(sum(dispatched), len(self.texts))
+        self.assertEqual(dispatched[0], 4)
+        self.assertEqual(results[3][0].text_id, "text3")
+
+    def test_micro_batching_accepts_list_arguments(self):
+        self.async_searcher.enable_micro_batching(max_batch_size=4, max_delay=0.05)
+
+        async def search_all():
+            return await asyncio.gather(*[self.async_searcher.afind_matches(text, phrases=["Missive"])
+                                          for text in self.texts])
+
+        results = asyncio.run(search_all())
+        self.assertEqual([[match.phrase.phrase_string for match in matches] for matches in results],
+                         [["Missive"]] * len(self.texts))
+
+    def test_batch_key_freezes_arguments(self):
+        self.assertEqual(make_batch_key("find_matches", {"phrases": ["Missive"]}),
+                         make_batch_key("find_matches", {"phrases": ["Missive"]}))
+        self.assertNotEqual(make_batch_key("find_matches", {"phrases": ["Missive"]}),
+                            make_batch_key("find_matches", {"phrases": ("Missive",)}))
+        self.assertEqual(make_batch_key("find_matches", {"phrases": {"Missive", "Gouverneur Generaal"}}),
+                         make_batch_key("find_matches", {"phrases": {"Gouverneur Generaal", "Missive"}}))
+        self.assertIsNone(make_batch_key("find_matches", {"phrases": [bytearray(b"Missive")]}))
+
+    def test_afind_matches_passes_timeout_as_time_budget(self):
+        time_budgets = []
+        find_matches = self.searcher.find_matches
+
+        def recording_find_matches(text, time_budget=None, **kwargs):
+            time_budgets.append(time_budget)
+            return find_matches(text, time_budget=time_budget, **kwargs)
+
+        self.searcher.find_matches = recording_find_matches
+        asyncio.run(self.async_searcher.afind_matches(self.texts[0], timeout=5))
+        self.async_searcher.enable_micro_batching(max_delay=0.001)
+        asyncio.run(self.async_searcher.afind_matches(self.texts[0], timeout=5, time_budget=1))
+        asyncio.run(self.async_searcher.afind_matches(self.texts[0]))
+        self.assertTrue(0 < time_budgets[0] <= 5)
+        self.assertEqual(time_budgets[1:], [1, None])
+
+    def test_afind_matches_respects_timeout(self):
+        release = threading.Event()
+        find_matches = self.searcher.find_matches
+
+        def slow_find_matches(text, **kwargs):
+            release.wait(5)
+            return find_matches(text, **kwargs)
+
+        self.searcher.find_matches = slow_find_matches
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(self.async_searcher.afind_matches(self.texts[0], timeout=0.01))
+        release.set()
+
+    def test_afind_matches_with_process_executor(self):
+        with make_process_executor(self.searcher, max_workers=1) as executor:
+            self.async_searcher.set_executor(executor)
+            matches = asyncio.run(self.async_searcher.afind_matches(self.texts[0]))
+        self.assertEqual(self.get_json(matches), self.get_json(self.searcher.find_matches(self.texts[0])))
+
+    @skipUnless("fork" in multiprocessing.get_all_start_methods(), "fork is not available")
+    def test_afind_matches_with_prefork_executor(self):
+        expected = self.get_json(self.searcher.find_matches(self.texts[0]))
+        try:
+            with make_prefork_executor(self.searcher, max_workers=1) as executor:
+                self.assertTrue(self.searcher.flat_indexes)
+                self.async_searcher.set_executor(executor)
+                matches = asyncio.run(self.async_searcher.afind_matches(self.texts[0]))
+        finally:
+            gc.unfreeze()
+        self.assertEqual(self.get_json(matches), expected)
+
+    @skipUnless("fork" in multiprocessing.get_all_start_methods(), "fork is not available")
+    def test_prefork_executors_keep_their_own_searcher(self):
+        other_searcher = FuzzyPhraseSearcher({"max_length_variance": 1})
+        other_searcher.index_phrase_model([{"phrase": "Generaal"}])
+        try:
+            # neither executor has forked its workers before the other one is made
+            with make_prefork_executor(self.searcher, max_workers=1) as executor, \
+                    make_prefork_executor(other_searcher, max_workers=1) as other_executor:
+                results = executor.submit(run_searcher_method, None, "find_matches", [self.texts[0]], {})
+                other_results = other_executor.submit(run_searcher_method, None, "find_matches",
+                                                      [self.texts[0]], {})
+                phrase_strings = [match.phrase.phrase_string for match in results.result()[0]]
+                other_phrase_strings = [match.phrase.phrase_string for match in other_results.result()[0]]
+        finally:
+            gc.unfreeze()
+        self.assertEqual(phrase_strings, ["Missive", "Gouverneur Generaal"])
+        self.assertEqual(other_phrase_strings, ["Generaal"])
+
+    def test_template_searcher_asearch_text(self):
+        phrase_model = PhraseModel([{"phrase": "Missive", "label": "missive"}])
+        searcher = FuzzyTemplateSearcher(FuzzyTemplate(phrase_model, template_json=["missive"]))
+        template_matches = asyncio.run(AsyncSearcher(searcher).asearch_text(self.texts[0]))
+        self.assertEqual(len(template_matches), 1)
@@ -0,0 +1,146 @@
+from unittest import TestCase, skipUnless
+from unittest.mock import patch
+import gzip
+import json
+import multiprocessing
+import os
+import tempfile
+
+from fuzzy_search.fuzzy_cli import annotate, generate_tasks, get_input_files, in_shard, main, make_arg_parser
+from fuzzy_search.fuzzy_cli import read_done_records
+
+
+def exit_worker(*args, **kwargs):
+    os._exit(3)
+
+
+class TestFuzzyCli(TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_dir = os.path.join(self.tmp_dir.name, "input")
+        os.mkdir(self.input_dir)
+        with open(os.path.join(self.input_dir, "text.txt"), "wt", encoding="utf-8") as fh:
+            fh.write("This text contains a test.")
+        with open(os.path.join(self.input_dir, "texts.jsonl"), "wt", encoding="utf-8") as fh:
+            for ti in range(5):
+                fh.write(json.dumps({"id": f"text{ti}", "text": f"test number {ti} contains a tset"}) + "\n")
+        with open(os.path.join(self.input_dir, "ignore.csv"), "wt", encoding="utf-8") as fh:
+            fh.write("test")
+        self.phrase_model = [{"phrase": "test", "label": "test_label"}, {"phrase": "contains"}]
+        self.phrase_model_file = os.path.join(self.tmp_dir.name, "model.json")
+        with open(self.phrase_model_file, "wt", encoding="utf-8") as fh:
+            json.dump(self.phrase_model, fh)
+        self.output_file = os.path.join(self.tmp_dir.name, "output.jsonl")
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def read_output(self):
+        with open(self.output_file, "rt", encoding="utf-8") as fh:
+            return [json.loads(line) for line in fh]
+
+    def test_get_input_files_skips_unknown_extensions(self):
+        input_files = get_input_files([self.input_dir])
+        self.assertEqual(len(input_files), 2)
+
+    def test_shards_partition_tasks(self):
+        input_files = get_input_files([self.input_dir])
+        all_ids = [task[0] for task in generate_tasks(input_files)]
+        shard_ids = [task[0] for shard_index in range(3)
+                     for task in generate_tasks(input_files, num_shards=3, shard_index=shard_index)]
+        self.assertEqual(sorted(all_ids), sorted(shard_ids))
+        self.assertEqual(in_shard("text1", 1, 0), True)
+
+    def test_arg_parser_parses_annotate(self):
+        args = make_arg_parser().parse_args(["annotate", "-m", "model.json", "-o", "out.jsonl", "-w", "2",
+                                             "--resume", "input"])
+        self.assertEqual(args.workers, 2)
+        self.assertEqual(args.resume, True)
+
+    def test_annotate_in_main_process(self):
+        reporter = annotate(self.phrase_model, {}, [self.input_dir], self.output_file, num_workers=0,
+                            report_interval=0)
+        self.assertEqual(reporter.num_texts, 6)
+        matches = self.read_output()
+        self.assertEqual(len(matches), reporter.num_matches)
+        self.assertEqual(matches[0]["type"], "PhraseMatch")
+
+    def test_annotate_with_workers(self):
+        annotate(self.phrase_model, {}, [self.input_dir], self.output_file, num_workers=0, report_interval=0)
+        single_matches = self.read_output()
+        annotate(self.phrase_model, {}, [self.input_dir], self.output_file, num_workers=2, queue_size=2,
+                 report_interval=0)
+        worker_matches = self.read_output()
+        self.assertEqual(sorted(json.dumps(match) for match in single_matches),
+                         sorted(json.dumps(match) for match in worker_matches))
+
+    def test_annotate_resume_skips_done_texts(self):
+        annotate(self.phrase_model, {}, [self.input_dir], self.output_file, num_workers=0, report_interval=0)
+        num_matches = len(self.read_output())
+        reporter = annotate(self.phrase_model, {}, [self.input_dir], self.output_file, num_workers=0,
+                            resume=True, report_interval=0)
+        self.assertEqual(reporter.num_texts, 0)
+        self.assertEqual(len(self.read_output()), num_matches)
+
+    def test_annotate_resume_removes_output_of_unfinished_texts(self):
+        annotate(self.phrase_model, {}, [self.input_dir], self.output_file, num_workers=0, report_interval=0)
+        matches = self.read_output()
+        done_file = self.output_file + ".done"
+        done_records = read_done_records(done_file)
+        last_id, last_num_lines = done_records[-1]
+        self.assertGreater(last_num_lines, 0)
+        # simulate a crash after writing the matches of the last text, but before recording it as done
+        with open(done_file, "wt", encoding="utf-8") as fh:
+            for text_id, num_lines in done_records[:-1]:
+                fh.write(f"{text_id}\t{num_lines}\n")
+            fh.write(last_id[:2])
+        reporter = annotate(self.phrase_model, {}, [self.input_dir], self.output_file, num_workers=0,
+                            resume=True, report_interval=0)
+        self.assertEqual(reporter.num_texts, 1)
+        self.assertEqual(self.read_output(), matches)
+        self.assertEqual(read_done_records(done_file), done_records)
+
+    def test_annotate_resume_rewrites_texts_with_missing_output(self):
+        annotate(self.phrase_model, {}, [self.input_dir], self.output_file, num_workers=0, report_interval=0)
+        matches = self.read_output()
+        with open(self.output_file, "rt", encoding="utf-8") as fh:
+            lines = fh.readlines()
+        # simulate a crash that lost the end of the output, including part of a line
+        with open(self.output_file, "wt", encoding="utf-8") as fh:
+            fh.writelines(lines[:-2])
+            fh.write(lines[-2][:10])
+        annotate(self.phrase_model, {}, [self.input_dir], self.output_file, num_workers=0, resume=True,
+                 report_interval=0)
+        self.assertEqual(sorted(json.dumps(match) for match in self.read_output()),
+                         sorted(json.dumps(match) for match in matches))
+
+    def test_annotate_in_main_process_skips_failing_texts(self):
+        with open(os.path.join(self.input_dir, "texts.jsonl"), "at", encoding="utf-8") as fh:
+            fh.write(json.dumps({"id": "broken", "text": None}) + "\n")
+        reporter = annotate(self.phrase_model, {}, [self.input_dir], self.output_file, num_workers=0,
+                            report_interval=0)
+        self.assertEqual(reporter.num_texts, 7)
+        self.assertEqual(reporter.num_errors, 1)
+        self.assertNotIn("broken", [text_id for text_id, _ in read_done_records(self.output_file + ".done")])
+
+    @skipUnless(multiprocessing.get_start_method() == "fork", "workers only inherit the patch when forked")
+    def test_annotate_stops_when_worker_dies(self):
+        with patch("fuzzy_search.fuzzy_cli.annotate_task", exit_worker):
+            with self.assertRaises(RuntimeError):
+                annotate(self.phrase_model, {}, [self.input_dir], self.output_file, num_workers=1,
+                         report_interval=0, poll_interval=0.05)
+
+    def test_main_writes_web_annotations(self):
+        exit_code = main(["annotate", "-m", self.phrase_model_file, "-o", self.output_file, "-f", "web_anno",
+                          "-w", "0", "--report-interval", "0", self.input_dir])
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(self.read_output()[0]["type"], "Annotation")
+
+    def test_annotate_compresses_output(self):
+        annotate(self.phrase_model, {}, [self.input_dir], self.output_file, num_workers=0, report_interval=0)
+        matches = self.read_output()
+        compressed_file = self.output_file + ".gz"
+        annotate(self.phrase_model, {}, [self.input_dir], compressed_file, num_workers=0, report_interval=0)
+        with gzip.open(compressed_file, "rt", encoding="utf-8") as fh:
+            self.assertEqual([json.loads(line) for line in fh], matches)
@@ -44,3 +44,62 @@ class TestFuzzyContextSearcher(TestCase):
         context_searcher.index_phrase_model(phrase_model)
         matches = context_searcher.find_matches_in_context(match_in_context)
         self.assertEqual(len(matches), 1)
+
+
+class TestFuzzyContextSearcherIndexedText(TestCase):
+
+    def setUp(self) -> None:
+        self.text = "A'nthony van der Truyn en Adriaen Bosman, Makelaers tot Rotterdam, prefenteren," + \
+                    "uyt de Hint te verkopen etfn curieufc Party opreckw ?al somfl'e Schalyen of Leyen."
+        self.searcher = FuzzyContextSearcher({"max_length_variance": 1})
+        self.searcher.index_phrases(["Makelaars", "Rotterdam", "verkopen", "Anthony van der Truyn"])
+
+    def test_find_matches_in_window_uses_parent_offsets(self):
+        indexed_text = self.searcher.index_text(self.text)
+        matches = self.searcher.find_matches_in_window(indexed_text, 40, 70)
+        self.assertEqual(sorted(match.phrase.phrase_string for match in matches), ["Makelaars", "Rotterdam"])
+        for match in matches:
+            self.assertEqual(self.text[match.offset:match.end], match.string)
+
+    def test_find_matches_in_window_agrees_with_full_search(self):
+        indexed_text = self.searcher.index_text(self.text)
+        window_matches = self.searcher.find_matches_in_window(indexed_text, 0, len(self.text))
+        full_matches = self.searcher.find_matches(self.text)
+        self.assertEqual([(match.phrase.phrase_string, match.offset, match.string) for match in window_matches],
+                         [(match.phrase.phrase_string, match.offset, match.string) for match in full_matches])
+
+    def test_indexed_text_returns_exact_matches_in_window(self):
+        indexed_text = self.searcher.index_text(self.text)
+        self.assertEqual(indexed_text.exact_match_offsets, [match.offset for match in indexed_text.exact_matches])
+        window_matches = indexed_text.get_exact_matches(55, len(self.text))
+        self.assertEqual([(match.string, match.offset) for match in window_matches], [("Rotterdam", 56),
+                                                                                      ("verkopen", 94)])
+        self.assertEqual(indexed_text.get_exact_matches(57, 100), [])
+
+    def test_indexed_text_bounds_exact_matches_by_window_end(self):
+        indexed_text = self.searcher.index_text(self.text)
+        self.assertEqual([match.string for match in indexed_text.get_exact_matches(0, 94)], ["Rotterdam"])
+        self.assertEqual([match.string for match in indexed_text.get_exact_matches(56, 102)], ["Rotterdam", "verkopen"])
+        # a match that starts in the window but ends after it is left out
+        self.assertEqual(indexed_text.get_exact_matches(0, 64), [])
+
+    def test_index_text_restricts_exact_matches_to_phrases(self):
+        indexed_text = self.searcher.index_text(self.text, phrases=["verkopen"])
+        self.assertEqual([match.string for match in indexed_text.exact_matches], ["verkopen"])
+        self.assertEqual(indexed_text.exact_matches[0].levenshtein_similarity, 1.0)
+
+    def test_find_matches_in_context_uses_indexed_text(self):
+        indexed_text = self.searcher.index_text(self.text)
+        match = [match for match in self.searcher.find_matches(self.text)
+                 if match.phrase.phrase_string == "Rotterdam"][0]
+        indexed_matches = self.searcher.find_matches_in_context(match, indexed_text=indexed_text)
+        context_matches = self.searcher.find_matches_in_context(match)
+        self.assertEqual([(match.phrase.phrase_string, match.offset) for match in indexed_matches],
+                         [(match.phrase.phrase_string, match.offset) for match in context_matches])
+
+    def test_fuzzy_context_searcher_can_use_lazy_context(self):
+        searcher = FuzzyContextSearcher({"max_length_variance": 1, "lazy_context": True})
+        searcher.index_phrases(["Rotterdam"])
+        match = searcher.find_matches(self.text)[0]
+        self.assertEqual(match.context, self.text[match.context_start:match.context_end])
+        self.assertEqual(match.prefix + match.string + match.suffix, match.context)
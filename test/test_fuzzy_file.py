@@ -0,0 +1,89 @@
+from unittest import TestCase
+from types import SimpleNamespace
+import json
+import os
+import tempfile
+
+from fuzzy_search.fuzzy_file import add_byte_offsets, get_byte_offset, get_file_format
+from fuzzy_search.fuzzy_file import read_text_file_chunks, read_jsonl_file_records
+from fuzzy_search.fuzzy_phrase_model import PhraseModel
+from fuzzy_search.fuzzy_phrase_searcher import FuzzyPhraseSearcher
+
+
+class TestFuzzyFile(TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.text = "Ontfangen een Missive van den Gouverneur Generaal van het eiland Amoras, " * 4
+        self.text = "Gedeputeerde uyt de Provincie van Zeelandt. Vrieslandt ‚ Gröningen. " + self.text
+        self.text_file = os.path.join(self.tmp_dir.name, "text.txt")
+        with open(self.text_file, "w", encoding="utf-8") as fh:
+            fh.write(self.text)
+        self.jsonl_file = os.path.join(self.tmp_dir.name, "texts.jsonl")
+        with open(self.jsonl_file, "w", encoding="utf-8") as fh:
+            fh.write(json.dumps({"text": self.text, "id": "text1"}) + "\n")
+            fh.write(json.dumps("a Missive without id") + "\n")
+        self.searcher = FuzzyPhraseSearcher({"max_length_variance": 3})
+        self.searcher.index_phrase_model(PhraseModel(phrases=["Gouverneur Generaal", "Missive"]))
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_get_file_format(self):
+        self.assertEqual(get_file_format(self.jsonl_file), "jsonl")
+        self.assertEqual(get_file_format(self.text_file), "text")
+
+    def test_read_text_file_chunks_covers_text(self):
+        chunks = list(read_text_file_chunks(self.text_file, 30, 5))
+        self.assertEqual("".join(chunk[2][:30] for chunk in chunks), self.text)
+
+    def test_read_text_file_chunks_has_byte_offsets(self):
+        encoded = self.text.encode("utf-8")
+        for char_start, byte_start, chunk in read_text_file_chunks(self.text_file, 30, 5):
+            self.assertEqual(encoded[byte_start:].decode("utf-8")[:len(chunk)], chunk)
+            self.assertEqual(self.text[char_start:char_start + len(chunk)], chunk)
+
+    def test_add_byte_offsets_matches_encoded_prefixes(self):
+        window_start = 20
+        window = self.text[window_start:]
+        window_byte_start = len(self.text[:window_start].encode("utf-8"))
+        # unsorted matches that overlap and share boundaries
+        matches = [SimpleNamespace(offset=70, end=80), SimpleNamespace(offset=window_start, end=70),
+                   SimpleNamespace(offset=55, end=80), SimpleNamespace(offset=60, end=60)]
+        add_byte_offsets(matches, window, window_start, window_byte_start)
+        for match in matches:
+            self.assertEqual(match.byte_offset, get_byte_offset(window, match.offset - window_start,
+                                                                window_byte_start))
+            self.assertEqual(match.byte_end, get_byte_offset(window, match.end - window_start, window_byte_start))
+
+    def test_read_jsonl_file_records_adds_id(self):
+        records = list(read_jsonl_file_records(self.jsonl_file))
+        self.assertEqual(records[0][1]["id"], "text1")
+        self.assertEqual(records[1][1]["id"], f"{self.jsonl_file}:2")
+
+    def test_searcher_finds_matches_in_text_file(self):
+        matches = self.searcher.find_matches(self.text)
+        file_matches = self.searcher.find_matches_in_file(self.text_file, chunk_size=40)
+        self.assertEqual([match.offset for match in matches], [match.offset for match in file_matches])
+        encoded = self.text.encode("utf-8")
+        for match in file_matches:
+            self.assertEqual(encoded[match.byte_offset:match.byte_end].decode("utf-8"), match.string)
+
+    def test_searcher_skips_words_cut_off_by_window_start_in_text_file(self):
+        searcher = FuzzyPhraseSearcher({"max_length_variance": 1})
+        searcher.index_phrase_model(PhraseModel(phrases=["Gouverneur Generaal", "Missive"]))
+        text = "abcdefghij" * 2 + "xxMissive van den Gouverneur Generaal"
+        with open(self.text_file, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        expected = [(match.offset, match.string) for match in searcher.find_matches(text)]
+        for chunk_size in [22, 23]:
+            file_matches = searcher.find_matches_in_file(self.text_file, chunk_size=chunk_size)
+            self.assertEqual([(match.offset, match.string) for match in file_matches], expected)
+
+    def test_searcher_finds_matches_in_jsonl_file(self):
+        file_matches = self.searcher.find_matches_in_file(self.jsonl_file)
+        self.assertEqual(len(file_matches), 9)
+        self.assertEqual(file_matches[-1].text_id, f"{self.jsonl_file}:2")
+        encoded = self.text.encode("utf-8")
+        for match in file_matches[:-1]:
+            self.assertEqual(encoded[match.byte_offset:match.byte_end].decode("utf-8"), match.string)
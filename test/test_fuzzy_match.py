@@ -3,7 +3,10 @@ import string
 from fuzzy_search.fuzzy_match import PhraseMatch, PhraseMatchInContext, adjust_match_offsets
 from fuzzy_search.fuzzy_phrase import Phrase
 from fuzzy_search.fuzzy_match import adjust_match_start_offset, adjust_match_end_offset
-from fuzzy_search.fuzzy_match import map_string
+from fuzzy_search.fuzzy_match import map_string, set_match_ids
+from fuzzy_search.fuzzy_match import phrase_match_from_json, phrase_matches_from_json
+from fuzzy_search.fuzzy_phrase import PhraseStub
+from fuzzy_search.fuzzy_phrase_model import PhraseModel
 
 
 class TestFuzzyMatch(TestCase):
@@ -133,6 +136,40 @@ class TestFuzzyMatch(TestCase):
         self.assertEqual(adjusted_match["match_string"], phrase_string + "e")
 
 
+class TestPhraseMatch(TestCase):
+
+    def setUp(self) -> None:
+        self.phrase = Phrase("test")
+
+    def test_match_has_no_instance_dict(self):
+        match = PhraseMatch(self.phrase, self.phrase, "test", 21)
+        self.assertEqual(hasattr(match, "__dict__"), False)
+
+    def test_match_id_is_generated_once(self):
+        match = PhraseMatch(self.phrase, self.phrase, "test", 21)
+        self.assertEqual(match._id, None)
+        self.assertEqual(match.id, match.id)
+
+    def test_match_validates_by_default(self):
+        self.assertRaises(ValueError, PhraseMatch, self.phrase, self.phrase, "test", -1)
+
+    def test_match_can_skip_validation(self):
+        match = PhraseMatch(self.phrase, self.phrase, "test", -1, validate=False)
+        self.assertEqual(match.offset, -1)
+
+    def test_set_match_ids_shares_timestamp(self):
+        matches = [PhraseMatch(self.phrase, self.phrase, "test", offset) for offset in range(3)]
+        set_match_ids(matches)
+        self.assertEqual(len({match.created for match in matches}), 1)
+        self.assertEqual(len({match.id for match in matches}), 3)
+
+    def test_match_in_context_keeps_match_id(self):
+        match = PhraseMatch(self.phrase, self.phrase, "test", 21, match_label="test_label", match_id="match1")
+        match_in_context = PhraseMatchInContext(match, "This string contains test text.")
+        self.assertEqual(match_in_context.id, "match1")
+        self.assertEqual(match_in_context.label, "test_label")
+
+
 class TestMatchInContext(TestCase):
 
     def setUp(self) -> None:
@@ -197,3 +234,65 @@ class TestMatchAnnotation(TestCase):
                 quote_selector = selector
         self.assertNotEqual(quote_selector, None)
         self.assertEqual(quote_selector['prefix'], self.text[self.match.offset-10:self.match.offset])
+
+
+class TestMatchInLazyContext(TestCase):
+
+    def setUp(self) -> None:
+        self.text = "This string contains test text."
+        self.phrase = Phrase("test")
+        self.match = PhraseMatch(self.phrase, self.phrase, "test", 21)
+
+    def test_lazy_context_has_same_strings(self):
+        eager = PhraseMatchInContext(self.match, self.text, prefix_size=10, suffix_size=3)
+        lazy = PhraseMatchInContext(self.match, self.text, prefix_size=10, suffix_size=3, lazy_context=True)
+        self.assertEqual((lazy.context, lazy.prefix, lazy.suffix), (eager.context, eager.prefix, eager.suffix))
+
+    def test_lazy_context_has_same_web_anno(self):
+        self.match.text_id = "doc1"
+        eager = PhraseMatchInContext(self.match, {"text": self.text, "id": "doc1"})
+        lazy = PhraseMatchInContext(self.match, {"text": self.text, "id": "doc1"}, lazy_context=True)
+        eager_anno = eager.as_web_anno()
+        lazy_anno = lazy.as_web_anno()
+        self.assertEqual(lazy_anno["target"]["selector"], eager_anno["target"]["selector"])
+        self.assertEqual(lazy.json()["context"], eager.json()["context"])
+
+    def test_context_without_text_has_prefix_and_suffix(self):
+        match_in_context = PhraseMatchInContext(self.match, context="contains test text.",
+                                                context_start=12, context_end=31)
+        self.assertEqual(match_in_context.prefix, "contains ")
+        self.assertEqual(match_in_context.suffix, " text.")
+
+
+class TestPhraseMatchesFromJson(TestCase):
+
+    def setUp(self) -> None:
+        self.phrase_model = PhraseModel(model=[{"phrase": "test", "variants": ["tast"], "label": "exam"}])
+        test_phrase = self.phrase_model.phrase_index["test"]
+        tast_phrase = self.phrase_model.variant_index["tast"]
+        self.matches = [PhraseMatch(test_phrase, test_phrase, "test", 5, text_id="doc1"),
+                        PhraseMatch(test_phrase, tast_phrase, "tast", 20, text_id="doc1"),
+                        PhraseMatch(test_phrase, test_phrase, "tekst", 40, text_id="doc2")]
+        for match in self.matches:
+            match.add_scores()
+        self.match_jsons = [match.json() for match in self.matches]
+
+    def test_bulk_load_round_trips_json(self):
+        matches = phrase_matches_from_json(self.match_jsons)
+        self.assertEqual([match.json() for match in matches], self.match_jsons)
+
+    def test_bulk_load_interns_phrase_stubs(self):
+        matches = phrase_matches_from_json(self.match_jsons)
+        self.assertIsInstance(matches[0].phrase, PhraseStub)
+        self.assertIs(matches[0].phrase, matches[2].phrase)
+        self.assertIs(matches[0].phrase, matches[0].variant)
+
+    def test_bulk_load_resolves_phrases_against_model(self):
+        matches = phrase_matches_from_json(self.match_jsons, phrase_model=self.phrase_model)
+        self.assertIs(matches[1].phrase, self.phrase_model.phrase_index["test"])
+        self.assertIs(matches[1].variant, self.phrase_model.variant_index["tast"])
+
+    def test_phrase_match_from_json_restores_context(self):
+        match_in_context = PhraseMatchInContext(self.matches[0], "This test text.", prefix_size=5)
+        match = phrase_match_from_json(match_in_context.json(), phrase_cache={})
+        self.assertEqual(match.json(), match_in_context.json())
@@ -0,0 +1,85 @@
+from unittest import TestCase, skipUnless
+import importlib.util
+import math
+import os
+import tempfile
+
+from fuzzy_search.fuzzy_match_table import PhraseMatchTable
+from fuzzy_search.fuzzy_phrase_searcher import FuzzyPhraseSearcher
+
+
+has_numpy = importlib.util.find_spec("numpy") is not None
+has_pyarrow = importlib.util.find_spec("pyarrow") is not None
+
+
+class TestPhraseMatchTable(TestCase):
+
+    def setUp(self) -> None:
+        self.searcher = FuzzyPhraseSearcher({"include_variants": True})
+        self.searcher.index_phrase_model([{"phrase": "test", "variants": ["tast"]}, {"phrase": "contains"}])
+        self.texts = [{"id": "text1", "text": "This text contains a test."},
+                      {"id": "text2", "text": "Another tast text."}]
+
+    def test_find_match_table_has_row_per_match(self):
+        matches = [match for text in self.texts for match in self.searcher.find_matches(text)]
+        table = self.searcher.find_match_table(self.texts)
+        self.assertEqual(len(table), len(matches))
+        self.assertEqual(table.text_id, [match.text_id for match in matches])
+        self.assertEqual(table.offset.tolist(), [match.offset for match in matches])
+
+    def test_find_match_table_rebuilds_same_matches(self):
+        matches = [match for text in self.texts for match in self.searcher.find_matches(text)]
+        table = self.searcher.find_match_table(self.texts)
+        self.assertEqual([match.json() for match in table.iter_matches()], [match.json() for match in matches])
+
+    def test_table_round_trip_keeps_skipgram_overlap_bytes_and_version(self):
+        matches = [match for match in self.searcher.find_matches(self.texts[1]) if match.skipgram_overlap]
+        matches[0].byte_offset, matches[0].byte_end, matches[0].model_version = 13, 17, "v2"
+        table = PhraseMatchTable(matches)
+        self.assertEqual(table.get_match(0).skipgram_overlap, matches[0].skipgram_overlap)
+        self.assertEqual(table.get_match(0).json(), matches[0].json())
+        self.assertEqual(table.columns()["byte_offset"][0], 13)
+
+    def test_table_stores_phrases_once(self):
+        table = self.searcher.find_match_table(self.texts + self.texts)
+        self.assertEqual(len(table.phrases), len(set(table.phrase.tolist() + table.variant.tolist())))
+
+    def test_columns_resolve_phrase_and_variant_strings(self):
+        table = self.searcher.find_match_table(self.texts)
+        columns = table.columns()
+        self.assertIn("tast", columns["variant"])
+        self.assertEqual(columns["phrase"][columns["variant"].index("tast")], "test")
+
+    def test_get_match_rebuilds_match(self):
+        matches = self.searcher.find_matches(self.texts[0])
+        table = PhraseMatchTable(matches)
+        for match, table_match in zip(matches, table.iter_matches()):
+            self.assertEqual(table_match.json(), match.json())
+
+    def test_missing_scores_are_nan(self):
+        matches = self.searcher.find_matches(self.texts[0])
+        matches[0].ngram_overlap = None
+        table = PhraseMatchTable(matches)
+        self.assertEqual(math.isnan(table.ngram_overlap[0]), True)
+        self.assertEqual(table.get_match(0).ngram_overlap, None)
+
+    @skipUnless(has_numpy, "numpy is not installed")
+    def test_to_numpy(self):
+        table = self.searcher.find_match_table(self.texts)
+        columns = table.to_numpy()
+        self.assertEqual(columns["offset"].tolist(), table.offset.tolist())
+
+    @skipUnless(has_pyarrow, "pyarrow is not installed")
+    def test_write_parquet_and_ipc(self):
+        import pyarrow.parquet as pq
+        table = self.searcher.find_match_table(self.texts)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            parquet_file = os.path.join(tmp_dir, "matches.parquet")
+            table.write_parquet(parquet_file)
+            self.assertEqual(pq.read_table(parquet_file).num_rows, len(table))
+            table.write_ipc(os.path.join(tmp_dir, "matches.arrow"))
+
+    @skipUnless(has_pyarrow, "pyarrow is not installed")
+    def test_to_arrow_accepts_integer_text_ids(self):
+        table = self.searcher.find_match_table([{"id": 1, "text": "This text contains a test."}])
+        self.assertEqual(set(table.to_arrow().column("text_id").to_pylist()), {"1"})
@@ -0,0 +1,71 @@
+from unittest import TestCase
+import gzip
+import io
+import json
+import lzma
+import os
+import tempfile
+
+from fuzzy_search.fuzzy_context_searcher import FuzzyContextSearcher
+from fuzzy_search.fuzzy_match import PhraseMatch
+from fuzzy_search.fuzzy_match_writer import MatchWriter, encode_matches, get_compression
+from fuzzy_search.fuzzy_match_writer import match_to_json_line, match_to_web_anno_line
+from fuzzy_search.fuzzy_phrase import Phrase
+from fuzzy_search.fuzzy_phrase_searcher import FuzzyPhraseSearcher
+
+
+class TestMatchWriter(TestCase):
+
+    def setUp(self) -> None:
+        self.searcher = FuzzyPhraseSearcher({"include_variants": True, "max_length_variance": 1})
+        self.searcher.index_phrase_model([{"phrase": "test", "variants": ["tast"], "label": "exam"},
+                                          {"phrase": "contains"}, {"phrase": "Rotterdam"}])
+        self.texts = [{"id": "text1", "text": "This text contains a test."},
+                      {"id": "text2", "text": "Another tast text from \"Roterdam\" én café."}]
+        self.matches = [match for text in self.texts for match in self.searcher.find_matches(text)]
+
+    def test_json_line_is_identical_to_json_dumps(self):
+        for match in self.matches:
+            self.assertEqual(match_to_json_line(match), json.dumps(match.json()))
+
+    def test_json_line_includes_optional_fields(self):
+        match = self.matches[0]
+        match.byte_offset, match.byte_end, match.model_version = 10, 18, "v2"
+        self.assertEqual(match_to_json_line(match), json.dumps(match.json()))
+
+    def test_web_anno_line_is_identical_to_json_dumps(self):
+        lines = encode_matches(self.matches, output_format="web_anno")
+        self.assertEqual(lines, [json.dumps(match.as_web_anno()) for match in self.matches])
+
+    def test_web_anno_line_of_match_in_context(self):
+        searcher = FuzzyContextSearcher({"max_length_variance": 1, "lazy_context": True})
+        searcher.index_phrases(["Rotterdam"])
+        match = searcher.find_matches(self.texts[1])[0]
+        self.assertEqual(match_to_web_anno_line(match), json.dumps(match.as_web_anno()))
+        self.assertEqual(match_to_json_line(match), json.dumps(match.json()))
+
+    def test_web_anno_line_requires_text_id(self):
+        match = PhraseMatch(Phrase("test"), Phrase("test"), "test", 0)
+        self.assertRaises(ValueError, match_to_web_anno_line, match)
+
+    def test_writer_writes_to_file_handle(self):
+        out_fh = io.StringIO()
+        with MatchWriter(out_fh) as writer:
+            writer.write_matches(self.matches)
+        self.assertEqual(out_fh.getvalue(), "".join(json.dumps(match.json()) + "\n" for match in self.matches))
+        self.assertEqual(writer.num_matches, len(self.matches))
+
+    def test_writer_compresses_by_extension(self):
+        self.assertEqual(get_compression("matches.jsonl.gz"), "gzip")
+        self.assertEqual(get_compression("matches.jsonl"), None)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for file_name, opener in [("matches.jsonl.gz", gzip.open), ("matches.jsonl.xz", lzma.open)]:
+                file_path = os.path.join(tmp_dir, file_name)
+                with MatchWriter(file_path, output_format="web_anno") as writer:
+                    writer.write_matches(self.matches)
+                with opener(file_path, "rt", encoding="utf-8") as fh:
+                    records = [json.loads(line) for line in fh]
+                self.assertEqual([record["id"] for record in records], [match.id for match in self.matches])
+
+    def test_writer_rejects_unknown_format(self):
+        self.assertRaises(ValueError, MatchWriter, io.StringIO(), output_format="xml")
@@ -1,5 +1,6 @@
 from unittest import TestCase
 from typing import Generator
+import pickle
 from fuzzy_search.fuzzy_phrase import text2skipgrams, Phrase
 
 
@@ -74,3 +75,30 @@ class TestFuzzyPhrase(TestCase):
         except ValueError as err:
             error = err
         self.assertNotEqual(error, None)
+
+
+class TestPhrasePickling(TestCase):
+
+    def test_skipgram_distance_is_computed_lazily(self):
+        phrase = Phrase("Rotterdam")
+        self.assertIsNone(phrase._skipgram_distance)
+        self.assertGreater(len(phrase.skipgram_distance), 0)
+        self.assertIsNotNone(phrase._skipgram_distance)
+
+    def test_pickled_phrase_is_restored_from_skipgrams(self):
+        phrase = Phrase({"phrase": "Rotterdam", "label": "place", "max_offset": 10}, ngram_size=3, skip_size=1)
+        _ = phrase.skipgram_distance
+        unpickled = pickle.loads(pickle.dumps(phrase))
+        self.assertEqual(unpickled.phrase_string, phrase.phrase_string)
+        self.assertEqual(unpickled.label, "place")
+        self.assertEqual(unpickled.max_offset, 10)
+        self.assertEqual(unpickled.ngram_size, 3)
+        self.assertEqual(unpickled.late_threshold, phrase.late_threshold)
+        self.assertEqual(unpickled.skipgram_set, phrase.skipgram_set)
+        self.assertEqual(unpickled.skipgram_index_lower.keys(), phrase.skipgram_index_lower.keys())
+        self.assertEqual(len(unpickled.skipgram_distance), len(phrase.skipgram_distance))
+
+    def test_pickled_phrase_is_compact(self):
+        phrase = Phrase("Makelaars tot Rotterdam")
+        state_size = len(pickle.dumps(phrase.__dict__))
+        self.assertLess(len(pickle.dumps(phrase)) * 3, state_size)
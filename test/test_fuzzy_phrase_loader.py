@@ -0,0 +1,107 @@
+from unittest import TestCase, skipUnless
+import importlib.util
+import json
+import os
+import pickle
+import tempfile
+
+from fuzzy_search.fuzzy_phrase import Phrase
+from fuzzy_search.fuzzy_phrase_loader import CompiledPhrase, load_phrase_model, read_phrase_entries
+from fuzzy_search.fuzzy_phrase_model import PhraseModel
+from fuzzy_search.fuzzy_phrase_searcher import FuzzyPhraseSearcher
+
+
+has_pyarrow = importlib.util.find_spec("pyarrow") is not None
+
+
+class TestPhraseLoader(TestCase):
+
+    def setUp(self) -> None:
+        self.model = [
+            {"phrase": "Rotterdam", "variants": ["Roterdam"], "label": "place"},
+            {"phrase": "Amsterdam", "distractors": ["Amstelveen"], "label": ["place", "capital"]},
+            {"phrase": "Makelaars", "type": "occupation"},
+            "Schepenen"
+        ]
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.jsonl_file = os.path.join(self.tmp_dir.name, "phrases.jsonl")
+        with open(self.jsonl_file, "wt", encoding="utf-8") as fh:
+            for entry in self.model:
+                fh.write(json.dumps(entry) + "\n")
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def assert_same_model(self, phrase_model: PhraseModel, expected_model: PhraseModel):
+        self.assertEqual(phrase_model.json(), expected_model.json())
+        self.assertEqual(dict(phrase_model.has_variants), dict(expected_model.has_variants))
+        self.assertEqual(dict(phrase_model.has_distractors), dict(expected_model.has_distractors))
+        self.assertEqual(dict(phrase_model.is_label_of), dict(expected_model.is_label_of))
+        self.assertEqual(phrase_model.custom, expected_model.custom)
+        self.assertEqual(dict(phrase_model.word_in_phrase), dict(expected_model.word_in_phrase))
+
+    def test_read_phrase_entries_streams_jsonl(self):
+        self.assertEqual(list(read_phrase_entries(self.jsonl_file)), self.model)
+
+    def test_load_phrase_model_from_jsonl(self):
+        phrase_model = load_phrase_model(self.jsonl_file)
+        self.assert_same_model(phrase_model, PhraseModel(model=self.model))
+
+    def test_load_phrase_model_from_iterable(self):
+        config = {"ngram_size": 3, "skip_size": 1}
+        phrase_model = load_phrase_model(iter(self.model), config=config, num_workers=2, batch_size=3, chunk_size=1)
+        self.assert_same_model(phrase_model, PhraseModel(model=self.model, config=config))
+        self.assertEqual(phrase_model.phrase_index["Rotterdam"].ngram_size, 3)
+
+    def test_load_phrase_model_in_main_process(self):
+        phrase_model = load_phrase_model(self.model, num_workers=0)
+        self.assert_same_model(phrase_model, PhraseModel(model=self.model))
+        self.assertNotIsInstance(phrase_model.phrase_index["Rotterdam"], CompiledPhrase)
+
+    def test_load_phrase_model_rejects_invalid_entry(self):
+        self.assertRaises(KeyError, load_phrase_model, [{"variants": ["Roterdam"]}], num_workers=0)
+        self.assertRaises(KeyError, load_phrase_model, [{"variants": ["Roterdam"]}], num_workers=1)
+
+    def test_loaded_phrases_expand_when_first_used(self):
+        phrase_model = load_phrase_model(self.model, num_workers=1)
+        phrase = phrase_model.phrase_index["Amsterdam"]
+        self.assertIsInstance(phrase, CompiledPhrase)
+        self.assertIn("_compiled_state", phrase.__dict__)
+        self.assertEqual(phrase.label_set, {"place", "capital"})
+        self.assertIn("_compiled_state", phrase.__dict__)
+        expected_phrase = Phrase(self.model[1])
+        self.assertEqual(phrase.skipgram_freq, expected_phrase.skipgram_freq)
+        self.assertNotIn("_compiled_state", phrase.__dict__)
+        self.assertEqual(len(phrase.skipgram_distance), len(expected_phrase.skipgram_distance))
+
+    def test_loaded_phrases_pickle_as_regular_phrases(self):
+        phrase_model = load_phrase_model(self.model, num_workers=1)
+        phrase = pickle.loads(pickle.dumps(phrase_model.phrase_index["Rotterdam"]))
+        self.assertIs(type(phrase), Phrase)
+        self.assertEqual(phrase.label, "place")
+        self.assertEqual(phrase.skipgram_freq, Phrase(self.model[0]).skipgram_freq)
+
+    def test_searcher_finds_same_matches_in_loaded_model(self):
+        text = {"id": "text1", "text": "De makelaars van Roterdam en Amsterdam"}
+        searcher = FuzzyPhraseSearcher()
+        searcher.index_phrase_model(PhraseModel(model=self.model))
+        loaded_searcher = FuzzyPhraseSearcher()
+        loaded_searcher.index_phrase_model(load_phrase_model(self.model, num_workers=1))
+        loaded_phrases = loaded_searcher.phrase_model.phrase_index.values()
+        self.assertTrue(all("_compiled_state" in phrase.__dict__ for phrase in loaded_phrases))
+        matches = [(match.phrase.phrase_string, match.string, match.offset) for match in searcher.find_matches(text)]
+        loaded_matches = [(match.phrase.phrase_string, match.string, match.offset)
+                          for match in loaded_searcher.find_matches(text)]
+        self.assertEqual(loaded_matches, matches)
+        self.assertGreater(len(matches), 0)
+
+    @skipUnless(has_pyarrow, "pyarrow is not installed")
+    def test_load_phrase_model_from_parquet(self):
+        import pyarrow
+        import pyarrow.parquet as pq
+        parquet_file = os.path.join(self.tmp_dir.name, "phrases.parquet")
+        table = pyarrow.table({"phrase": ["Rotterdam", "Makelaars"], "variants": [["Roterdam"], None]})
+        pq.write_table(table, parquet_file)
+        phrase_model = load_phrase_model(parquet_file)
+        self.assertEqual(phrase_model.has_variants["Rotterdam"], {"Roterdam"})
+        self.assertIn("Makelaars", phrase_model.phrase_index)
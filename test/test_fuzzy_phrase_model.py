@@ -1,5 +1,6 @@
 from unittest import TestCase
-from fuzzy_search.fuzzy_phrase_model import PhraseModel
+import pickle
+from fuzzy_search.fuzzy_phrase_model import PhraseModel, merge_phrase_models
 
 
 class Test(TestCase):
@@ -49,6 +50,10 @@ class Test(TestCase):
         self.assertEqual(isinstance(label, set), True)
         self.assertEqual(len(label), 2)
 
+    def test_phrase_model_json_lists_labels_in_sorted_order(self):
+        phrase_model = PhraseModel(model=[{"phrase": "test", "label": ["place", "capital"]}])
+        self.assertEqual(phrase_model.json()[0]["label"], ["capital", "place"])
+
     def test_can_add_custom_key_value_pairs_to_phrase(self):
         phrases = [{"phrase": "test", "some_key": "some_value"}]
         phrase_model = PhraseModel(phrases=phrases)
@@ -73,3 +78,39 @@ class Test(TestCase):
         self.assertEqual(phrase_model.ngram_size, 3)
         self.assertEqual(phrase_model.phrase_index["test"].ngram_size, 3)
 
+
+    def test_can_add_multiple_variants(self):
+        phrases = [{"phrase": "okay", "variants": ["OK", "oke"]}]
+        phrase_model = PhraseModel(phrases=phrases)
+        self.assertEqual(phrase_model.has_variants["okay"], {"OK", "oke"})
+
+    def test_removing_phrase_removes_variants_and_labels(self):
+        phrases = [{"phrase": "okay", "variants": ["OK", "oke"], "label": "agreement"}, {"phrase": "test"}]
+        phrase_model = PhraseModel(phrases=phrases)
+        phrase_model.remove_phrases(["okay"])
+        self.assertEqual(len(phrase_model.variant_index), 0)
+        self.assertEqual("okay" in phrase_model.has_variants, False)
+        self.assertEqual(phrase_model.is_label("agreement"), False)
+        self.assertEqual("okay" in phrase_model.word_in_phrase, False)
+        self.assertEqual(phrase_model.has_phrase("test"), True)
+
+    def test_merge_phrase_models_unites_labels_and_variants(self):
+        model1 = PhraseModel(model=[{"phrase": "Rotterdam", "label": "location", "variants": ["Roterdam"]},
+                                    {"phrase": "verkopen", "label": "auction"}])
+        model2 = PhraseModel(model=[{"phrase": "Rotterdam", "label": "port", "country": "NL"},
+                                    {"phrase": "vertrekken", "label": "departure"}])
+        merged_model = merge_phrase_models([model1, model2])
+        self.assertEqual(len(merged_model.phrase_index), 3)
+        self.assertEqual(merged_model.has_labels["Rotterdam"], {"location", "port"})
+        self.assertEqual(merged_model.has_variants["Rotterdam"], {"Roterdam"})
+        self.assertEqual(merged_model.get("Rotterdam", "country"), "NL")
+
+    def test_pickled_phrase_model_rebuilds_indexes(self):
+        phrase_model = PhraseModel(model=[{"phrase": "Makelaars tot Rotterdam", "variants": ["Makelaers"]},
+                                          {"phrase": "Amsterdam", "distractors": ["Amstelveen"]}])
+        unpickled = pickle.loads(pickle.dumps(phrase_model))
+        self.assertEqual(unpickled.json(), phrase_model.json())
+        self.assertEqual(dict(unpickled.phrase_length_index), dict(phrase_model.phrase_length_index))
+        self.assertEqual(dict(unpickled.variant_length_index), dict(phrase_model.variant_length_index))
+        self.assertEqual(dict(unpickled.word_in_phrase), dict(phrase_model.word_in_phrase))
+        self.assertEqual(dict(unpickled.first_word_in_phrase), dict(phrase_model.first_word_in_phrase))
@@ -1,9 +1,15 @@
 from unittest import TestCase
+from concurrent.futures import ThreadPoolExecutor
+import pickle
 from fuzzy_search.fuzzy_phrase import Phrase
 from fuzzy_search.fuzzy_phrase_model import PhraseModel
+from fuzzy_search.fuzzy_match import PhraseMatch
 from fuzzy_search.fuzzy_string import SkipGram
-from fuzzy_search.fuzzy_phrase_searcher import FuzzyPhraseSearcher, SkipMatches, Candidate
+from fuzzy_search.fuzzy_phrase_searcher import FuzzyPhraseSearcher, SkipMatches, Candidate, FlatPostingsIndex
 from fuzzy_search.fuzzy_phrase_searcher import filter_skipgram_threshold, get_skipmatch_candidates
+from fuzzy_search.fuzzy_phrase_searcher import select_non_overlapping_matches, index_exact_match_ranges
+from fuzzy_search.fuzzy_phrase_searcher import BestMatches, search_exact_phrase_rows
+from data.demo_data import DemoData
 
 
 class TestSkipMatches(TestCase):
@@ -364,3 +370,367 @@ class TestSearcherRealData2(TestCase):
         for pm in phrase_matches:
             print(pm.offset, pm.string)
         self.assertEqual(len(phrase_matches), 1)
+
+
+class TestSearcherChunked(TestCase):
+
+    def setUp(self) -> None:
+        self.searcher = FuzzyPhraseSearcher({"max_length_variance": 3})
+        self.searcher.index_phrase_model(PhraseModel(phrases=["Gouverneur Generaal", "Missive"]))
+        self.text = "Ontfangen een Missive van den Gouverneur Generaal van het eiland Amoras, " * 5
+
+    def test_chunked_search_finds_same_matches(self):
+        matches = self.searcher.find_matches(self.text)
+        chunked_matches = self.searcher.find_matches_chunked(self.text, chunk_size=20)
+        self.assertEqual([(m.offset, m.string) for m in matches],
+                         [(m.offset, m.string) for m in chunked_matches])
+
+    def test_chunked_search_reports_text_offsets(self):
+        for match in self.searcher.find_matches_chunked(self.text, chunk_size=25):
+            self.assertEqual(self.text[match.offset:match.end], match.string)
+
+    def test_chunked_search_deduplicates_boundary_matches(self):
+        # the window boundary falls inside the first occurrence of the longer phrase
+        matches = self.searcher.find_matches_chunked(self.text, chunk_size=35)
+        offsets = [match.offset for match in matches]
+        self.assertEqual(len(offsets), len(set(offsets)))
+        self.assertEqual(len(matches), 10)
+
+    def test_chunked_search_skips_words_cut_off_by_window_start(self):
+        searcher = FuzzyPhraseSearcher({"max_length_variance": 1})
+        searcher.index_phrase_model(PhraseModel(phrases=["Gouverneur Generaal", "Missive"]))
+        text = "abcdefghij" * 2 + "xxMissive van den Gouverneur Generaal"
+        expected = [(match.offset, match.string) for match in searcher.find_matches(text)]
+        self.assertEqual(expected, [(38, "Gouverneur Generaal")])
+        for chunk_size in [21, 22, 23]:
+            matches = searcher.find_matches_chunked(text, chunk_size=chunk_size)
+            self.assertEqual([(match.offset, match.string) for match in matches], expected)
+
+
+class TestSearcherIncrementalIndex(TestCase):
+
+    def setUp(self) -> None:
+        self.searcher = FuzzyPhraseSearcher({"include_variants": True})
+        self.searcher.index_phrase_model([{"phrase": "Missive", "variants": ["Brief"]}])
+        self.text = "Ontfangen een Missive en een Brief van den Gouverneur Generaal."
+
+    def test_add_phrases_updates_index(self):
+        self.searcher.add_phrases([{"phrase": "Gouverneur Generaal"}])
+        phrases = [match.phrase.phrase_string for match in self.searcher.find_matches(self.text)]
+        self.assertIn("Gouverneur Generaal", phrases)
+
+    def test_add_phrases_matches_full_rebuild(self):
+        self.searcher.add_phrases([{"phrase": "Gouverneur Generaal", "variants": ["Gouverneur"]}])
+        rebuilt = FuzzyPhraseSearcher({"include_variants": True})
+        rebuilt.index_phrase_model([{"phrase": "Missive", "variants": ["Brief"]},
+                                    {"phrase": "Gouverneur Generaal", "variants": ["Gouverneur"]}])
+        self.assertEqual([match.json() for match in self.searcher.find_matches(self.text)],
+                         [match.json() for match in rebuilt.find_matches(self.text)])
+
+    def test_re_adding_phrase_replaces_indexed_phrase(self):
+        self.searcher.add_phrases([{"phrase": "Missive", "variants": ["Brief"]}])
+        self.assertEqual(len(self.searcher.phrases), 1)
+        self.assertEqual(len(self.searcher.variants), 1)
+
+    def test_remove_phrases_prunes_index(self):
+        self.searcher.remove_phrases(["Missive"])
+        self.assertEqual(len(self.searcher.skipgram_index), 0)
+        self.assertEqual(len(self.searcher.variant_skipgram_index), 0)
+        self.assertEqual(self.searcher.find_matches(self.text), [])
+
+
+class TestSearcherConcurrency(TestCase):
+
+    def setUp(self) -> None:
+        self.searcher = FuzzyPhraseSearcher({"ignorecase": True, "include_variants": True})
+        self.searcher.index_phrase_model([{"phrase": "Gouverneur Generaal", "variants": ["Gouverneur"]},
+                                          {"phrase": "Missive"}])
+        self.texts = [{"id": f"text{ti}", "text": f"Ontfangen {ti} Missive van den Gouverneur Generaal."}
+                      for ti in range(20)]
+
+    def test_search_does_not_change_text_dict(self):
+        text = {"text": "Ontfangen een Missive."}
+        self.searcher.find_matches(text)
+        self.assertEqual(text, {"text": "Ontfangen een Missive."})
+
+    def test_search_does_not_grow_indexes(self):
+        num_skipgrams = len(self.searcher.skipgram_index)
+        self.searcher.find_matches("Some text with many skipgrams that are not in the index")
+        self.assertEqual(len(self.searcher.skipgram_index), num_skipgrams)
+
+    def test_frozen_searcher_cannot_change(self):
+        self.searcher.freeze()
+        self.assertRaises(ValueError, self.searcher.add_phrases, ["Resolutie"])
+        self.assertEqual(self.searcher.phrase_model.has_phrase("Resolutie"), False)
+
+    def test_frozen_searcher_phrases_have_skipgram_distances(self):
+        self.searcher.freeze()
+        for phrase in self.searcher.phrases:
+            self.assertIsNotNone(phrase._skipgram_distance)
+
+    def test_frozen_searcher_is_shared_between_threads(self):
+        expected = [[match.json() for match in self.searcher.find_matches(text)] for text in self.texts]
+        self.searcher.freeze()
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(self.searcher.find_matches, self.texts))
+        self.assertEqual([[match.json() for match in matches] for matches in results], expected)
+
+    def test_flat_frozen_searcher_finds_same_matches(self):
+        expected = [[match.json() for match in self.searcher.find_matches(text)] for text in self.texts]
+        skipgram_index = {skipgram_string: set(phrases) for skipgram_string, phrases in
+                          self.searcher.skipgram_index.items()}
+        self.searcher.freeze(flat=True)
+        self.assertIsInstance(self.searcher.variant_skipgram_index, FlatPostingsIndex)
+        self.assertEqual({skipgram_string: set(self.searcher.skipgram_index[skipgram_string])
+                          for skipgram_string in self.searcher.skipgram_index}, skipgram_index)
+        self.assertEqual(self.searcher.skipgram_index.get("xyz", ()), ())
+        self.assertEqual([[match.json() for match in self.searcher.find_matches(text)] for text in self.texts],
+                         expected)
+
+
+class TestSearcherBudget(TestCase):
+
+    def setUp(self) -> None:
+        self.searcher = FuzzyPhraseSearcher({"max_length_variance": 1})
+        self.searcher.index_phrase_model([{"phrase": "Gouverneur Generaal"}, {"phrase": "Missive"}])
+        self.text = "Ontfangen een Missive van den Gouverneur Generael."
+
+    def test_search_without_budget_is_not_truncated(self):
+        matches = self.searcher.find_matches(self.text)
+        self.assertEqual(matches.truncated, False)
+        self.assertEqual(len(matches), 2)
+
+    def test_candidate_budget_keeps_exact_matches(self):
+        matches = self.searcher.find_matches(self.text, max_candidates=0)
+        self.assertEqual(matches.truncated, True)
+        self.assertEqual([match.string for match in matches], ["Missive"])
+
+    def test_levenshtein_budget_truncates(self):
+        matches = self.searcher.find_matches(self.text, max_levenshtein=0)
+        self.assertEqual(matches.truncated, True)
+        self.assertEqual([match.string for match in matches], ["Missive"])
+
+    def test_time_budget_truncates(self):
+        text = "Gouverneur " * 2000
+        matches = self.searcher.find_matches(text, time_budget=0.0, skip_exact_matching=True)
+        self.assertEqual(matches.truncated, True)
+
+    def test_budget_from_config(self):
+        searcher = FuzzyPhraseSearcher({"max_length_variance": 1, "max_candidates": 0})
+        searcher.index_phrase_model([{"phrase": "Gouverneur Generaal"}])
+        matches = searcher.find_matches(self.text)
+        self.assertEqual(matches.truncated, True)
+        self.assertEqual(len(matches), 0)
+
+
+class TestSearcherBestMatches(TestCase):
+
+    def setUp(self) -> None:
+        self.searcher = FuzzyPhraseSearcher({"max_length_variance": 1})
+        self.searcher.index_phrase_model([{"phrase": "Gouverneur Generaal"}, {"phrase": "Missive"},
+                                          {"phrase": "Resolutie"}])
+        self.text = "Ontfangen een Misive van den Gouverneur Generael. Nog een Missive."
+
+    def test_find_best_match_per_phrase(self):
+        matches = self.searcher.find_best_matches(self.text)
+        self.assertEqual([match.string for match in matches], ["Missive", "Gouverneur Generael"])
+
+    def test_find_best_matches_per_phrase_returns_k_matches(self):
+        matches = self.searcher.find_best_matches(self.text, k=2)
+        missive_matches = [match.string for match in matches if match.phrase.phrase_string == "Missive"]
+        self.assertEqual(missive_matches, ["Missive", "Misive"])
+
+    def test_find_best_matches_over_all_phrases(self):
+        matches = self.searcher.find_best_matches(self.text, k=2, per_phrase=False)
+        self.assertEqual([match.string for match in matches], ["Missive", "Gouverneur Generael"])
+
+    def test_find_best_matches_restricted_to_phrases(self):
+        matches = self.searcher.find_best_matches(self.text, phrases=["Gouverneur Generaal"])
+        self.assertEqual([match.phrase.phrase_string for match in matches], ["Gouverneur Generaal"])
+
+    def test_exists(self):
+        self.assertEqual(self.searcher.exists(self.text, "Missive"), True)
+        self.assertEqual(self.searcher.exists(self.text, "Gouverneur Generaal"), True)
+        self.assertEqual(self.searcher.exists(self.text, "Resolutie"), False)
+
+    def test_best_matches_keeps_k_best_non_overlapping_matches(self):
+        phrase = Phrase("abcd")
+        best_matches = BestMatches(2)
+        for offset, score in [(0, 0.5), (2, 0.7), (10, 0.6), (20, 0.8), (9, 0.65), (30, 0.4)]:
+            match = PhraseMatch(phrase, phrase, "abcd", offset)
+            match.levenshtein_similarity = score
+            best_matches.add(match)
+        # (2, 0.7) replaced (0, 0.5), (9, 0.65) replaced (10, 0.6) and was pushed out by (20, 0.8)
+        self.assertEqual([(match.offset, match.levenshtein_similarity) for match in best_matches.get_matches()],
+                         [(20, 0.8), (2, 0.7)])
+        self.assertEqual(len(best_matches), 2)
+        self.assertEqual(best_matches.has_perfect_matches(), False)
+
+    def test_find_best_matches_restricts_exact_pass(self):
+        searcher = FuzzyPhraseSearcher({"max_length_variance": 1, "include_variants": True})
+        searcher.index_phrase_model([{"phrase": "Missive", "variants": ["Missiven"]}, {"phrase": "Resolutie"}])
+        text = {"id": "text1", "text": "Missiven en Resolutie en Missive"}
+        phrase_filter = searcher.get_phrase_filter(["Missive"])
+        for use_word_boundaries in [True, False]:
+            rows = list(search_exact_phrase_rows(searcher.phrase_model, text, use_word_boundaries=use_word_boundaries,
+                                                 include_variants=True, phrase_filter=phrase_filter))
+            all_rows = search_exact_phrase_rows(searcher.phrase_model, text, use_word_boundaries=use_word_boundaries,
+                                                include_variants=True)
+            self.assertEqual(sorted((row.variant.phrase_string, row.offset) for row in rows),
+                             sorted((row.variant.phrase_string, row.offset) for row in all_rows
+                                    if row.phrase.phrase_string == "Missive"))
+            self.assertIn(("Missiven", 0), [(row.variant.phrase_string, row.offset) for row in rows])
+        matches = searcher.find_best_matches(text, k=2, phrases=["Resolutie"])
+        self.assertEqual([(match.string, match.offset) for match in matches], [("Resolutie", 12)])
+
+    def test_find_best_matches_adjusts_to_word_boundaries(self):
+        searcher = FuzzyPhraseSearcher({"max_length_variance": 1})
+        searcher.index_phrase_model(["Tabak"])
+        matches = searcher.find_best_matches("verkopen 20 Vaten Tabaks")
+        self.assertEqual([(match.string, match.offset) for match in matches], [("Tabaks", 18)])
+
+    def test_find_best_matches_agrees_with_best_of_find_matches(self):
+        auction_data = DemoData().get_dataset("auction_advertisements")
+        searcher = FuzzyPhraseSearcher({"max_length_variance": 1})
+        searcher.index_phrase_model(auction_data["phrases"])
+        for text in auction_data["texts"]:
+            expected = {}
+            for match in searcher.find_matches(text):
+                rank = (match.levenshtein_similarity, -match.offset, match.variant.phrase_string)
+                phrase_string = match.phrase.phrase_string
+                if phrase_string not in expected or rank > expected[phrase_string][0]:
+                    expected[phrase_string] = (rank, (match.string, match.offset))
+            best_matches = {match.phrase.phrase_string: (match.string, match.offset)
+                            for match in searcher.find_best_matches(text, k=1)}
+            self.assertEqual(best_matches, {phrase_string: expected[phrase_string][1]
+                                            for phrase_string in expected})
+
+    def test_exists_rejects_unknown_phrase(self):
+        self.assertRaises(ValueError, self.searcher.exists, self.text, "Notulen")
+
+
+class TestSearcherNonOverlapping(TestCase):
+
+    def setUp(self) -> None:
+        self.searcher = FuzzyPhraseSearcher({"max_length_variance": 1, "include_variants": True})
+        self.searcher.index_phrase_model([{"phrase": "Gouverneur Generaal", "variants": ["Gouverneur"]},
+                                          {"phrase": "Generaal"}, {"phrase": "Missive"}])
+        self.text = "Ontfangen een Missive van den Gouverneur Generaal."
+
+    def test_overlapping_matches_are_allowed_by_default(self):
+        matches = self.searcher.find_matches(self.text)
+        self.assertEqual([match.string for match in matches],
+                         ["Missive", "Gouverneur Generaal", "Gouverneur", "Generaal"])
+
+    def test_non_overlapping_selection_prefers_long_matches(self):
+        matches = self.searcher.find_matches(self.text, allow_overlapping_matches=False)
+        self.assertEqual([match.string for match in matches], ["Missive", "Gouverneur Generaal"])
+
+    def test_select_non_overlapping_matches_maximises_total_score(self):
+        phrase = Phrase("abcd")
+        matches = []
+        for match_string, offset, score in [("abcd", 0, 0.5), ("abcd", 2, 0.9), ("abcd", 5, 0.9)]:
+            match = PhraseMatch(phrase, phrase, match_string, offset)
+            match.levenshtein_similarity = score
+            matches.append(match)
+        selected = select_non_overlapping_matches(matches)
+        self.assertEqual([match.offset for match in selected], [0, 5])
+
+
+class TestSearcherExactMatchMask(TestCase):
+
+    def setUp(self) -> None:
+        self.searcher = FuzzyPhraseSearcher({"max_length_variance": 1})
+        self.searcher.index_phrase_model([{"phrase": "Gouverneur Generaal"}, {"phrase": "Missive"}])
+        self.text = {"id": "text1", "text": "Ontfangen een Missive van den Gouverneur Generaal. Nog een Misive."}
+
+    def test_index_exact_match_ranges(self):
+        exact_matches = self.searcher.find_exact_matches(self.text)
+        exact_match_ranges = index_exact_match_ranges(exact_matches)
+        self.assertEqual(exact_match_ranges["Missive"], ([14], [21]))
+
+    def test_skipgram_scan_skips_exact_match_ranges(self):
+        exact_match_ranges = index_exact_match_ranges(self.searcher.find_exact_matches(self.text))
+        skip_matches = self.searcher.find_skipgram_matches(self.text, exact_match_ranges=exact_match_ranges)
+        missive = self.searcher.phrase_model.phrase_index["Missive"]
+        self.assertEqual(all(offset >= 21 for offset in skip_matches.match_offsets[missive]), True)
+
+    def test_find_matches_merges_exact_and_fuzzy_matches(self):
+        matches = self.searcher.find_matches(self.text)
+        self.assertEqual([match.string for match in matches], ["Missive", "Gouverneur Generaal", "Misive"])
+
+
+class TestSearcherProximity(TestCase):
+
+    def setUp(self) -> None:
+        self.searcher = FuzzyPhraseSearcher({"max_length_variance": 1})
+        self.searcher.index_phrase_model([{"phrase": "Missive"}, {"phrase": "Gouverneur Generaal"},
+                                          {"phrase": "Resolutie"}])
+        self.text = "Resolutie op een Misive van den Gouverneur Generael. Nog een Missive."
+
+    def test_find_near_finds_target_after_anchor(self):
+        near = self.searcher.find_near(self.text, ["Missive"], ["Gouverneur Generaal"], max_distance=10)
+        self.assertEqual(len(near), 1)
+        self.assertEqual(near[0].anchor.string, "Misive")
+        self.assertEqual(near[0].target.string, "Gouverneur Generael")
+        self.assertEqual(near[0].distance, 9)
+        self.assertEqual(near[0].direction, "after")
+
+    def test_find_near_respects_max_distance(self):
+        near = self.searcher.find_near(self.text, ["Missive"], ["Gouverneur Generaal"], max_distance=5)
+        self.assertEqual(near, [])
+
+    def test_find_near_finds_target_before_anchor(self):
+        near = self.searcher.find_near(self.text, ["Missive"], ["Resolutie"], max_distance=10,
+                                       direction="before")
+        self.assertEqual([(match.anchor.offset, match.distance) for match in near], [(17, 8)])
+        near = self.searcher.find_near(self.text, ["Missive"], ["Resolutie"], max_distance=10)
+        self.assertEqual(near, [])
+
+    def test_find_near_finds_targets_on_both_sides(self):
+        near = self.searcher.find_near(self.text, ["Gouverneur Generaal"], ["Missive"], max_distance=10,
+                                       direction="both")
+        self.assertEqual([(match.target.string, match.direction) for match in near],
+                         [("Misive", "before"), ("Missive", "after")])
+
+    def test_find_near_accepts_indexed_text(self):
+        indexed_text = self.searcher.index_text(self.text)
+        near = self.searcher.find_near(indexed_text, ["Missive"], ["Gouverneur Generaal"], max_distance=10)
+        self.assertEqual(len(near), 1)
+
+    def test_find_near_rejects_unknown_phrase(self):
+        self.assertRaises(ValueError, self.searcher.find_near, self.text, ["Missive"], ["Brief"], 10)
+
+
+class TestSearcherPickling(TestCase):
+
+    def setUp(self) -> None:
+        self.searcher = FuzzyPhraseSearcher({"max_length_variance": 1, "include_variants": True})
+        self.searcher.index_phrase_model([{"phrase": "Makelaars", "variants": ["Makelaers"]},
+                                          {"phrase": "Rotterdam", "distractors": ["Rotterdamsche"]}])
+        self.text = "Adriaen Bosman, Makelaers tot Roterdam, prefenteren"
+
+    def test_unpickled_searcher_finds_same_matches(self):
+        unpickled = pickle.loads(pickle.dumps(self.searcher))
+        self.assertEqual([(match.phrase.phrase_string, match.offset) for match in unpickled.find_matches(self.text)],
+                         [(match.phrase.phrase_string, match.offset) for match in self.searcher.find_matches(self.text)])
+        self.assertEqual(dict(unpickled.skipgram_index).keys(), dict(self.searcher.skipgram_index).keys())
+
+    def test_unpickled_searcher_shares_phrase_objects_with_its_model(self):
+        unpickled = pickle.loads(pickle.dumps(self.searcher))
+        for phrase in unpickled.phrases:
+            self.assertIs(unpickled.phrase_model.phrase_index[phrase.phrase_string], phrase)
+
+    def test_unpickled_frozen_searcher_stays_frozen(self):
+        self.searcher.freeze()
+        unpickled = pickle.loads(pickle.dumps(self.searcher))
+        self.assertTrue(unpickled.frozen)
+        self.assertIsInstance(unpickled.skipgram_index, dict)
+        self.assertRaises(ValueError, unpickled.index_phrases, ["Amsterdam"])
+
+    def test_unpickled_flat_searcher_stays_flat(self):
+        self.searcher.freeze(flat=True)
+        unpickled = pickle.loads(pickle.dumps(self.searcher))
+        self.assertIsInstance(unpickled.skipgram_index, FlatPostingsIndex)
+        self.assertEqual([match.json() for match in unpickled.find_matches(self.text)],
+                         [match.json() for match in self.searcher.find_matches(self.text)])
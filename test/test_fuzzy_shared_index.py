@@ -0,0 +1,99 @@
+from unittest import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+import multiprocessing
+import pickle
+import sys
+
+from fuzzy_search.fuzzy_async import run_searcher_method
+from fuzzy_search.fuzzy_phrase import Phrase
+from fuzzy_search.fuzzy_phrase_model import PhraseModel
+from fuzzy_search.fuzzy_phrase_searcher import FuzzyPhraseSearcher
+from fuzzy_search.fuzzy_shared_index import SharedPhrase, SharedSearcherIndex, attach_searcher
+from fuzzy_search.fuzzy_template import FuzzyTemplate
+from fuzzy_search.fuzzy_template_searcher import FuzzyTemplateSearcher
+
+
+class TestSharedSearcherIndex(TestCase):
+
+    def setUp(self) -> None:
+        self.searcher = FuzzyPhraseSearcher({"max_length_variance": 1, "include_variants": True,
+                                             "filter_distractors": True})
+        self.searcher.index_phrase_model([{"phrase": "Makelaars", "variants": ["Makelaers"]},
+                                          {"phrase": "Rotterdam", "distractors": ["Rotterdamsche"]},
+                                          {"phrase": "Adriaen Bosman"}])
+        self.text = {"id": "text1", "text": "Adriaen Bosman, Makelaers tot Roterdam, prefenteren"}
+
+    def get_json(self, matches):
+        return [match.json() for match in matches]
+
+    def test_attached_searcher_finds_same_matches(self):
+        expected = self.get_json(self.searcher.find_matches(self.text))
+        with SharedSearcherIndex(self.searcher) as shared_index:
+            attached = attach_searcher(shared_index.name)
+            self.assertTrue(attached.frozen)
+            self.assertEqual(self.get_json(attached.find_matches(self.text)), expected)
+
+    def test_attached_phrases_are_loaded_when_used(self):
+        with SharedSearcherIndex(self.searcher) as shared_index:
+            attached = attach_searcher(shared_index.name)
+            phrase = attached.phrase_model.phrase_index["Rotterdam"]
+            self.assertIsInstance(phrase, SharedPhrase)
+            self.assertIn("_shared_location", phrase.__dict__)
+            self.assertEqual(phrase.num_skipgrams, self.searcher.phrase_model.phrase_index["Rotterdam"].num_skipgrams)
+            self.assertNotIn("_shared_location", phrase.__dict__)
+            self.assertIn(phrase, attached.phrases)
+
+    def test_attached_phrases_are_loaded_safely_from_threads(self):
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            searcher = FuzzyPhraseSearcher({"max_length_variance": 1})
+            searcher.index_phrase_model([f"phrase {number}" for number in range(500)])
+            with SharedSearcherIndex(searcher) as shared_index:
+                attached = attach_searcher(shared_index.name)
+                phrases = list(attached.phrase_model.phrase_index.values())
+                with ThreadPoolExecutor(max_workers=8) as executor:
+                    results = list(executor.map(lambda _: [phrase.phrase_string for phrase in phrases], range(8)))
+        finally:
+            sys.setswitchinterval(switch_interval)
+        for phrase_strings in results:
+            self.assertEqual(phrase_strings, [f"phrase {number}" for number in range(500)])
+
+    def test_matches_of_attached_searcher_pickle_with_regular_phrases(self):
+        with SharedSearcherIndex(self.searcher) as shared_index:
+            attached = attach_searcher(shared_index.name)
+            matches = pickle.loads(pickle.dumps(attached.find_matches(self.text)))
+        self.assertEqual({type(match.phrase) for match in matches}, {Phrase})
+        self.assertEqual(self.get_json(matches), self.get_json(self.searcher.find_matches(self.text)))
+
+    def test_attach_rejects_other_segment(self):
+        shared_memory = SharedMemory(create=True, size=64)
+        try:
+            self.assertRaises(ValueError, attach_searcher, shared_memory.name)
+        finally:
+            shared_memory.close()
+            shared_memory.unlink()
+
+    def test_spawned_workers_attach_searcher(self):
+        expected = self.get_json(self.searcher.find_matches(self.text))
+        with SharedSearcherIndex(self.searcher) as shared_index:
+            with shared_index.make_executor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                results = executor.submit(run_searcher_method, None, "find_matches", [self.text], {}).result()
+        self.assertEqual(self.get_json(results[0]), expected)
+
+    def test_attached_template_searcher_finds_same_template_matches(self):
+        phrase_model = PhraseModel([{"phrase": "Makelaars", "label": "occupation"},
+                                    {"phrase": "Rotterdam", "label": "place"}])
+        template = FuzzyTemplate(phrase_model, template_json=["occupation", "place"])
+        searcher = FuzzyTemplateSearcher(template=template, config={"max_length_variance": 1})
+        expected = [[match.phrase.phrase_string for match in template_match.phrase_matches]
+                    for template_match in searcher.search_text(self.text)]
+        with SharedSearcherIndex(searcher) as shared_index:
+            attached = attach_searcher(shared_index.name)
+            self.assertIsInstance(attached, FuzzyTemplateSearcher)
+            self.assertIs(attached.template.phrase_model, attached.phrase_model)
+            template_matches = attached.search_text(self.text)
+        self.assertEqual([[match.phrase.phrase_string for match in template_match.phrase_matches]
+                          for template_match in template_matches], expected)
+        self.assertNotEqual(expected, [])
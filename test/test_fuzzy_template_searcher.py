@@ -4,6 +4,8 @@ from fuzzy_search.fuzzy_phrase_model import PhraseModel
 from fuzzy_search.fuzzy_phrase import Phrase
 from fuzzy_search.fuzzy_template import FuzzyTemplate
 from fuzzy_search.fuzzy_template_searcher import FuzzyTemplateSearcher, get_phrase_match_list_labels
+from fuzzy_search.fuzzy_template_searcher import TemplateMatchSequence, find_next_element_start_index
+from fuzzy_search.fuzzy_template_searcher import find_next_element_end_index, MultiTemplateSearcher
 from fuzzy_search.fuzzy_match import PhraseMatch
 
 from data.demo_data import DemoData
@@ -121,3 +123,92 @@ class TestFuzzyTemplateSearcherWithRealData(TestCase):
         searcher = FuzzyTemplateSearcher(template=self.template)
         template_matches = searcher.find_template_matches(test_matches)
         self.assertEqual(len(template_matches), test_data["num_template_matches"])
+
+    def test_compiled_sequence_finds_same_element_indexes(self):
+        test_matches, _ = self.prep_test("test2")
+        test_matches = test_matches * 20
+        compiled_matches = TemplateMatchSequence(test_matches, self.template)
+        for element in self.template.elements:
+            for start_index in range(len(test_matches)):
+                start = find_next_element_start_index(test_matches, element, start_index)
+                self.assertEqual(find_next_element_start_index(compiled_matches, element, start_index), start)
+                self.assertEqual(find_next_element_end_index(compiled_matches, element, start),
+                                 find_next_element_end_index(test_matches, element, start))
+
+    def test_template_match_contains_template_phrase_matches(self):
+        test_matches, _ = self.prep_test("test1")
+        searcher = FuzzyTemplateSearcher(template=self.template)
+        template_matches = searcher.find_template_matches(test_matches)
+        for template_match in template_matches:
+            for phrase_match in template_match.phrase_matches:
+                self.assertEqual(self.template.has_label(phrase_match.label), True)
+
+
+class TestFuzzyTemplateSearcherRequiredLabels(TestCase):
+
+    def setUp(self) -> None:
+        self.phrase_model = PhraseModel([{"phrase": "verkopen", "label": "auction"},
+                                         {"phrase": "Rotterdam", "label": "location"},
+                                         {"phrase": "Makelaers", "label": "broker"}])
+        self.template = FuzzyTemplate(self.phrase_model, template_json={
+            "type": "group",
+            "elements": [{"label": "broker"}, {"label": "location"}, {"label": "auction", "required": True}]
+        })
+        self.text = "Makelaers tot Rotterdam, prefenteren uyt de Hint te verkopen. " + "x " * 100 + "Rotterdam"
+
+    def test_search_stops_without_required_match(self):
+        searcher = FuzzyTemplateSearcher(template=self.template)
+        self.assertEqual(searcher.find_template_phrase_matches("Makelaers tot Rotterdam"), [])
+        self.assertEqual(searcher.search_text("Makelaers tot Rotterdam"), [])
+
+    def test_search_finds_other_labels_in_whole_text(self):
+        searcher = FuzzyTemplateSearcher(template=self.template)
+        phrase_matches = searcher.find_template_phrase_matches(self.text)
+        self.assertEqual([match.string for match in phrase_matches],
+                         ["Makelaers", "Rotterdam", "verkopen", "Rotterdam"])
+
+    def test_search_finds_other_labels_in_windows(self):
+        searcher = FuzzyTemplateSearcher(template=self.template, config={"template_window_size": 40})
+        phrase_matches = searcher.find_template_phrase_matches(self.text)
+        self.assertEqual([match.string for match in phrase_matches], ["Rotterdam", "verkopen"])
+        self.assertEqual(phrase_matches[0].offset, 14)
+        self.assertEqual(phrase_matches[0].context.startswith("Makelaers"), True)
+
+
+class TestMultiTemplateSearcher(TestCase):
+
+    def setUp(self) -> None:
+        auction_model = PhraseModel([{"phrase": "verkopen", "label": "auction"},
+                                     {"phrase": "Rotterdam", "label": "location"}])
+        departure_model = PhraseModel([{"phrase": "vertrekken", "label": "departure"},
+                                       {"phrase": "Rotterdam", "label": "port"}])
+        self.templates = {
+            "auction": FuzzyTemplate(auction_model, template_json={
+                "type": "group", "elements": [{"label": "location"}, {"label": "auction", "required": True}]
+            }),
+            "departure": FuzzyTemplate(departure_model, template_json={
+                "type": "group", "elements": [{"label": "port"}, {"label": "departure", "required": True}]
+            })
+        }
+        self.text = "Te Rotterdam verkopen een curieuse Party Schalyen."
+
+    def test_search_text_returns_matches_per_template(self):
+        searcher = MultiTemplateSearcher(self.templates)
+        template_matches = searcher.search_text(self.text)
+        self.assertEqual(len(template_matches["auction"]), 1)
+        self.assertEqual(len(template_matches["departure"]), 0)
+
+    def test_search_text_matches_single_template_searchers(self):
+        searcher = MultiTemplateSearcher(self.templates)
+        template_matches = searcher.search_text(self.text)
+        for template_name, template in self.templates.items():
+            single_searcher = FuzzyTemplateSearcher(template=template)
+            single_matches = single_searcher.search_text(self.text)
+            self.assertEqual([[match.string for match in template_match.phrase_matches]
+                              for template_match in template_matches[template_name]],
+                             [[match.string for match in template_match.phrase_matches]
+                              for template_match in single_matches])
+
+    def test_shared_phrase_has_labels_of_all_templates(self):
+        searcher = MultiTemplateSearcher(self.templates)
+        self.assertEqual(searcher.phrase_model.has_labels["Rotterdam"], {"location", "port"})
@@ -0,0 +1,61 @@
+from unittest import TestCase
+import threading
+
+from fuzzy_search.fuzzy_phrase_searcher import FuzzyPhraseSearcher
+from fuzzy_search.fuzzy_versioned_searcher import VersionedSearcher
+
+
+class BlockingSearcher(FuzzyPhraseSearcher):
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def find_matches(self, text, **kwargs):
+        self.started.set()
+        self.release.wait(5)
+        return super().find_matches(text, **kwargs)
+
+
+class TestVersionedSearcher(TestCase):
+
+    def setUp(self) -> None:
+        self.text = {"id": "text1", "text": "Ontfangen een Missive van den Gouverneur Generaal."}
+        self.handle = VersionedSearcher(config={"max_length_variance": 1})
+        self.handle.update([{"phrase": "Missive"}])
+
+    def tearDown(self) -> None:
+        self.handle.close()
+
+    def test_matches_are_tagged_with_version(self):
+        matches = self.handle.find_matches(self.text)
+        self.assertEqual(matches[0].model_version, 1)
+        self.assertEqual(matches[0].json()["model_version"], 1)
+
+    def test_update_swaps_phrase_model(self):
+        version = self.handle.update([{"phrase": "Gouverneur Generaal"}], version="v2")
+        self.assertEqual(version, "v2")
+        matches = self.handle.find_matches(self.text)
+        self.assertEqual([match.phrase.phrase_string for match in matches], ["Gouverneur Generaal"])
+        self.assertEqual(matches[0].model_version, "v2")
+
+    def test_update_in_background(self):
+        future = self.handle.update_in_background([{"phrase": "Gouverneur Generaal"}])
+        self.assertEqual(future.result(timeout=5), 2)
+        self.assertEqual(self.handle.version, 2)
+
+    def test_in_flight_search_finishes_on_old_version(self):
+        searcher = BlockingSearcher({"max_length_variance": 1})
+        searcher.index_phrase_model([{"phrase": "Missive"}])
+        self.handle.swap(searcher, version="old")
+        results = []
+        thread = threading.Thread(target=lambda: results.extend(self.handle.find_matches(self.text)))
+        thread.start()
+        searcher.started.wait(5)
+        self.handle.update([{"phrase": "Gouverneur Generaal"}], version="new")
+        searcher.release.set()
+        thread.join(5)
+        self.assertEqual([match.phrase.phrase_string for match in results], ["Missive"])
+        self.assertEqual(results[0].model_version, "old")
+        self.assertEqual(self.handle.find_matches(self.text)[0].model_version, "new")